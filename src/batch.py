@@ -0,0 +1,179 @@
+import os
+import io
+import time
+import contextlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import pandas as pd
+import dataset
+import instrument
+import sqlite_store
+import storage
+import optimize
+from indicators import Indicators
+
+########## Rulare pe toata flota de case, in paralel ##########
+
+# Fiecare casa este analizata intr-un proces separat (incarcare, indicatori, optimizare panouri).
+# Workerii citesc doar partitia casei lor din store, iar rezultatele sunt adaugate in fisierul
+# de rezultate pe masura ce se termina, astfel incat o rulare intrerupta poate fi reluata.
+# Casele cu aceeasi statie meteo sunt trimise in grup aceluiasi worker, ca radiatia si productia pe panou
+# ale statiei sa fie calculate o singura data (cache-ul de date al workerului).
+
+RESULTS_FILE = "Results/fleet_results.csv"
+WORKER_CACHE_BYTES = 256 * 1024 ** 2  # Limita cache-ului de date in fiecare worker
+TASKS_PER_WORKER = 20  # Dupa atatea grupuri de case workerul e inlocuit, ca memoria sa nu creasca in timp
+STATION_GROUP_SIZE = 8  # Cel mult atatea case cu aceeasi statie intr-un grup, ca paralelismul sa ramana
+
+RESULT_COLUMNS = ['house_id', 'status', 'hours', 'n', 'SS', 'SC', 'NEEG', 'NPV', 'best_n', 'best_score', 'best_SS',
+                  'best_SC', 'best_n_NEEG', 'best_NEEG', 'seconds', 'error']
+
+worker_profile = False  # True in workerii unei rulari cu profile = True
+
+def init_worker(cache_bytes, profile = False, sqlite_path = None):  # Ruleaza o data in fiecare proces worker
+    global worker_profile
+    dataset.cache.max_bytes = cache_bytes
+
+    if sqlite_path is not None:  # Workerii citesc din aceeasi baza SQLite ca procesul principal
+        sqlite_store.enable(sqlite_path)
+
+    if profile:
+        worker_profile = True
+        instrument.enable()
+
+def analyze_house(house_id, n = 10, n_min = 1, n_max = 40, w_sc = 0.5, w_ss = 0.5, Pm = 575, f = 0.8, GTSTC = 1000.0):  # Analiza completa a unei case
+    start_time = time.perf_counter()
+    row = {'house_id': house_id, 'status': "ok", 'error': ""}
+
+    try:
+        # Mesajele afisate de clase nu au sens intr-un worker, le ignoram
+        with contextlib.redirect_stdout(io.StringIO()):
+            indicator = Indicators(house_id)
+            indicator.get_consumption()
+            indicator.get_solar_radiation()
+
+            if not indicator.consumption or not indicator.solar_radiation:
+                raise ValueError("Lipsesc datele de consum sau de radiatie.")
+
+            indicator.get_power_estimated(n, Pm = Pm, f = f, GTSTC = GTSTC)
+            current = indicator.calculate_indicators(n = n, Pm = Pm)
+
+            best_ss_sc = optimize.optimize_panels_max_ss_sc(indicator, n_min = n_min, n_max = n_max, w_sc = w_sc, w_ss = w_ss,
+                                                            Pm = Pm, f = f, GTSTC = GTSTC, disp = False, method = "exact")
+            best_neeg = optimize.optimize_panels_min_neeg(indicator, n_min = n_min, n_max = n_max, Pm = Pm, f = f,
+                                                          GTSTC = GTSTC, disp = False, method = "exact")
+
+        row.update({
+            'hours': current['hours'],
+            'n': n,
+            'SS': current['SS'],
+            'SC': current['SC'],
+            'NEEG': current['NEEG'],
+            'NPV': current['NPV'],
+            'best_n': best_ss_sc['best_n'],
+            'best_score': best_ss_sc['best_score'],
+            'best_SS': best_ss_sc['best_SS'],
+            'best_SC': best_ss_sc['best_SC'],
+            'best_n_NEEG': best_neeg['best_n'],
+            'best_NEEG': best_neeg['best_NEEG'],
+        })
+    except Exception as e:
+        row['status'] = "error"
+        row['error'] = type(e).__name__ + ": " + str(e)
+
+    row['seconds'] = time.perf_counter() - start_time
+
+    if worker_profile:  # Masuratorile workerului pentru aceasta casa sunt trimise odata cu rezultatul
+        instrument.record("batch.analyze_house", int(start_time * 1e9), int(row['seconds'] * 1e9))
+        row['profile'] = instrument.snapshot()
+        instrument.reset()
+    return row
+
+def analyze_houses(house_ids, *args):  # Casele unui grup, una dupa alta, in acelasi worker
+    return [analyze_house(house_id, *args) for house_id in house_ids]
+
+def station_groups(house_ids, group_size = STATION_GROUP_SIZE):  # Casele grupate dupa statia meteo
+    df_house = dataset.read_table('House')
+    station_of = dict(zip(df_house['ID'].astype(int).tolist(), df_house['WeatherStationIDREF'].tolist()))
+
+    by_station = {}
+    for house_id in house_ids:
+        by_station.setdefault(station_of.get(int(house_id)), []).append(int(house_id))
+    return [houses[i:i + group_size] for houses in by_station.values() for i in range(0, len(houses), group_size)]
+
+def completed_houses(results_file, retry_errors = True):  # Casele deja procesate intr-o rulare anterioara
+    if not os.path.exists(results_file):
+        return set()
+
+    df = pd.read_csv(results_file)
+    if retry_errors:
+        df = df[df['status'] == "ok"]
+    return set(df['house_id'].astype(int))
+
+def append_result(results_file, row):  # Scrie imediat rezultatul unei case in fisier
+    write_header = not os.path.exists(results_file)
+    pd.DataFrame([row], columns = RESULT_COLUMNS).to_csv(results_file, mode = "a", header = write_header, index = False)
+
+def run_fleet(house_ids = None, workers = None, results_file = RESULTS_FILE, resume = True, retry_errors = True,
+              n = 10, n_min = 1, n_max = 40, w_sc = 0.5, w_ss = 0.5, Pm = 575, f = 0.8, GTSTC = 1000.0,
+              cache_bytes = WORKER_CACHE_BYTES, tasks_per_worker = TASKS_PER_WORKER, profile = False):  # Analiza tuturor caselor (sau a unei liste)
+    if house_ids is None:
+        house_ids = dataset.read_table('House')['ID'].astype(int).tolist()
+
+    if not sqlite_store.ENABLED and not storage.store_available('Consumption'):
+        print("Atentie: store-ul columnar nu e construit (storage.build_store()), fiecare worker va scana tot Consumption.csv.")
+
+    os.makedirs(os.path.dirname(results_file) or ".", exist_ok = True)
+
+    if resume:
+        done = completed_houses(results_file, retry_errors)
+        if retry_errors and os.path.exists(results_file):
+            # Randurile cu eroare vor fi rescrise de noua incercare
+            previous = pd.read_csv(results_file)
+            previous[previous['status'] == "ok"].to_csv(results_file, index = False)
+    else:
+        done = set()
+        if os.path.exists(results_file):
+            os.remove(results_file)
+
+    pending = [h for h in house_ids if int(h) not in done]
+    print(str(len(house_ids) - len(pending)) + " case deja procesate, " + str(len(pending)) + " ramase.")
+
+    if not pending:
+        return pd.read_csv(results_file) if os.path.exists(results_file) else pd.DataFrame()
+
+    start_time = time.perf_counter()
+    failed = 0
+
+    with ProcessPoolExecutor(max_workers = workers, initializer = init_worker, initargs = (cache_bytes, profile, sqlite_store.SQLITE_PATH if sqlite_store.ENABLED else None),
+                             max_tasks_per_child = tasks_per_worker) as executor:
+        futures = [
+            executor.submit(analyze_houses, group, n, n_min, n_max, w_sc, w_ss, Pm, f, GTSTC)
+            for group in station_groups(pending)
+        ]
+
+        finished = 0
+        for future in as_completed(futures):
+            for row in future.result():
+                profile_data = row.pop('profile', None)
+                if profile_data is not None:
+                    instrument.merge(profile_data)
+                append_result(results_file, row)
+                finished += 1
+
+                if row['status'] != "ok":
+                    failed += 1
+                    print("Casa " + str(row['house_id']) + ": " + row['error'])
+
+                print("[" + str(finished) + "/" + str(len(pending)) + "] casa " + str(row['house_id']) + " terminata in " + str(round(row['seconds'], 2)) + " s")
+
+    print("Flota procesata in " + str(round(time.perf_counter() - start_time, 2)) + " s, " + str(failed) + " erori.")
+
+    if profile:  # Etapele adunate din toti workerii
+        instrument.report()
+        base = os.path.splitext(results_file)[0]
+        instrument.export(base + "_profile.json")
+        instrument.export(base + "_profile.trace.json")
+    return pd.read_csv(results_file)
+
+if __name__ == "__main__":
+    run_fleet()
@@ -0,0 +1,235 @@
+import os
+import io
+import sys
+import json
+import time
+import shutil
+import platform
+import contextlib
+import subprocess
+import tracemalloc
+import numpy as np
+import pandas as pd
+import dataset
+import synthetic
+import clean
+import optimize
+from indicators import Indicators
+
+########## Benchmark pe date sintetice, la mai multe scari ##########
+
+# Pentru fiecare scara se genereaza datele (synthetic.generate), apoi se masoara fiecare etapa:
+# generare, curatare, incarcarea consumului / radiatiei, productia, indicatorii, optimizarea.
+# Timpul este minimul din `repeat` rulari fara tracemalloc; memoria este varful alocarilor
+# Python / numpy dintr-o rulare separata cu tracemalloc (alocarile din pyarrow nu sunt vazute).
+# Rezultatele sunt scrise in Benchmarks/results/<eticheta>.json si pot fi comparate cu compare().
+# Se masoara si pornirea fiecarei subcomenzi din main.py; `indicators` are un buget (STARTUP_BUDGET).
+
+BENCH_DIR = "Benchmarks"
+SCALES = {
+    'small': {'houses': 4, 'years': 1.0},
+    'medium': {'houses': 16, 'years': 1.0},
+    'large': {'houses': 32, 'years': 2.0},
+}
+HOUSE_STAGES = ['get_consumption', 'get_solar_radiation', 'get_power_estimated', 'calculate_indicators',
+                'sweep_panels', 'optimize_de']
+STARTUP_BUDGET = 1.0  # Secunde: pornirea `main.py indicators` (interpretor + importuri) trebuie sa ramana sub atat
+STARTUP_COMMANDS = {  # Subcomanda -> argumentele minime pentru `main.py --imports-only`
+    'indicators': ["indicators"],
+    'optimize': ["optimize"],
+    'plot': ["plot", "0"],
+    'batch': ["batch"],
+}
+
+def measure(function, trace_memory = False):  # (rezultat, secunde, varf de memorie in MB)
+    if trace_memory:
+        tracemalloc.start()
+
+    start = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = function()
+    finally:
+        seconds = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] if trace_memory else 0
+        if trace_memory:
+            tracemalloc.stop()
+
+    return result, seconds, peak / 1024 ** 2
+
+def timed(function, repeat = 3, trace_memory = True):  # Cel mai bun timp din `repeat` rulari + varful de memorie
+    seconds = min(measure(function)[1] for _ in range(repeat))
+    peak = measure(function, trace_memory = True)[2] if trace_memory else None
+    return seconds, peak
+
+def metadata(label):
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output = True, text = True).stdout.strip()
+    except OSError:
+        commit = ""
+
+    return {'label': label, 'time': time.strftime("%Y-%m-%d %H:%M:%S"), 'commit': commit, 'python': platform.python_version(),
+            'numpy': np.__version__, 'pandas': pd.__version__, 'platform': platform.platform(), 'cpus': os.cpu_count()}
+
+def startup_time(command = "indicators", repeat = 5):  # Cel mai bun timp de pornire al unei subcomenzi, intr-un proces nou
+    main_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+    args = [sys.executable, main_path, "--imports-only"] + STARTUP_COMMANDS[command]
+    best = None
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output = subprocess.run(args, capture_output = True, text = True, check = True).stdout
+        seconds = time.perf_counter() - start
+        if best is None or seconds < best['seconds']:
+            best = dict(json.loads(output), seconds = seconds)
+
+    return best
+
+def check_startup(commands = ("indicators",), repeat = 5, budget = STARTUP_BUDGET):  # Pornirea in buget si fara plotly / scipy
+    rows = []
+    for command in commands:
+        result = startup_time(command, repeat)
+        heavy = [name for name in ("plotly", "scipy") if name in result['heavy_modules']]
+        ok = command != "indicators" or (result['seconds'] <= budget and not heavy)
+        rows.append(dict(result, ok = ok))
+
+        print("pornire " + command + ": " + str(round(result['seconds'], 3)) + " s (importuri " +
+              str(round(result['import_seconds'], 3)) + " s), module: " + ", ".join(result['heavy_modules']) +
+              ("" if ok else "  <-- peste bugetul de " + str(budget) + " s sau cu plotly / scipy"))
+
+    return rows
+
+def house_stages(house_id):  # Functiile masurate pentru o casa; fiecare porneste de la aceeasi stare
+    def prepared():
+        indicator = Indicators(house_id)
+        indicator.get_consumption()
+        indicator.get_solar_radiation()
+        indicator.get_power_estimated()
+        return indicator
+
+    def cold(load):  # Fara cache in memorie: masuram citirea de pe disc
+        def run():
+            dataset.invalidate()
+            return load(Indicators(house_id))
+        return run
+
+    indicator = measure(prepared)[0]
+    return {
+        'get_consumption': cold(lambda i: i.get_consumption()),
+        'get_solar_radiation': cold(lambda i: i.get_solar_radiation()),
+        'get_power_estimated': lambda: indicator.get_power_estimated(),
+        'calculate_indicators': lambda: indicator.calculate_indicators(),
+        'sweep_panels': lambda: optimize.sweep_panels(indicator),
+        'optimize_de': lambda: optimize.optimize_panels_max_ss_sc(indicator, seed = 42, disp = False),
+    }
+
+def run_scale(scale, config, work_dir, seed = 0, sample_houses = 3, repeat = 3, trace_memory = True, stages = None):
+    raw_dir = os.path.join(work_dir, "raw", "Database")
+    run_dir = os.path.join(work_dir, "run")
+    rows = []
+
+    def add(stage, seconds, peak, calls = 1, **extra):
+        rows.append(dict({'scale': scale, 'stage': stage, 'seconds': seconds, 'peak_mb': peak, 'calls': calls}, **extra))
+        print(scale + " / " + stage + ": " + str(round(seconds, 4)) + " s" +
+              ("" if peak is None else ", " + str(round(peak, 1)) + " MB"))
+
+    # Generare (o data pentru timp, o data cu tracemalloc intr-un director separat)
+    info, seconds, _ = measure(lambda: synthetic.generate(raw_dir, seed = seed, **config))
+    peak = None
+    if trace_memory:
+        scratch = os.path.join(work_dir, "scratch")
+        peak = measure(lambda: synthetic.generate(scratch, seed = seed, **config), trace_memory = True)[2]
+        shutil.rmtree(scratch)
+    add('generate', seconds, peak, rows_consumption = info['consumption_rows'], rows_weather = info['weather_rows'])
+
+    def fresh_copy():  # Curatarea modifica fisierele, deci fiecare rulare porneste de la datele generate
+        if os.path.exists(run_dir):
+            shutil.rmtree(run_dir)
+        shutil.copytree(raw_dir, os.path.join(run_dir, "Database"))
+        os.makedirs(os.path.join(run_dir, "Plots"))
+
+    previous_dir = os.getcwd()
+    try:
+        peak = None
+        if trace_memory:
+            fresh_copy()
+            os.chdir(run_dir)
+            dataset.invalidate()
+            peak = measure(clean.clean_files, trace_memory = True)[2]
+            os.chdir(previous_dir)
+
+        fresh_copy()
+        os.chdir(run_dir)
+        dataset.invalidate()
+        seconds = measure(clean.clean_files)[1]
+        add('clean', seconds, peak, rows_consumption = info['consumption_rows'], rows_weather = info['weather_rows'])
+
+        # Etapele pe casa: media pe primele sample_houses case ramase dupa curatare
+        house_ids = dataset.read_table('House')['ID'].astype(int).tolist()[:sample_houses]
+        results = {stage: [] for stage in HOUSE_STAGES if stages is None or stage in stages}
+
+        for house_id in house_ids:
+            functions = house_stages(house_id)
+            for stage in results:
+                results[stage].append(timed(functions[stage], repeat = 1 if stage == 'optimize_de' else repeat,
+                                            trace_memory = trace_memory))
+
+        for stage, values in results.items():
+            if values:
+                peaks = [p for _, p in values if p is not None]
+                add(stage, float(np.mean([s for s, _ in values])), max(peaks) if peaks else None, calls = len(values))
+    finally:
+        os.chdir(previous_dir)
+        dataset.invalidate()
+
+    return rows
+
+def run_benchmarks(scales = None, label = None, output_dir = BENCH_DIR, seed = 0, sample_houses = 3, repeat = 3,
+                   trace_memory = True, keep_data = False, stages = None):  # Ruleaza toate scarile si scrie rezultatele JSON
+    scales = scales or list(SCALES)
+    label = label or time.strftime("%Y%m%d-%H%M%S")
+    output_dir = os.path.abspath(output_dir)
+    results = []
+
+    for scale in scales:
+        config = SCALES[scale] if isinstance(scale, str) else scale
+        name = scale if isinstance(scale, str) else "custom-" + "-".join(str(v) for v in config.values())
+        work_dir = os.path.join(output_dir, "work", name)
+
+        if os.path.exists(work_dir):
+            shutil.rmtree(work_dir)
+        try:
+            results.extend(run_scale(name, config, work_dir, seed, sample_houses, repeat, trace_memory, stages))
+        finally:
+            if not keep_data and os.path.exists(work_dir):
+                shutil.rmtree(work_dir)
+
+    for row in check_startup(STARTUP_COMMANDS, repeat):
+        results.append({'scale': "startup", 'stage': row['command'], 'seconds': row['seconds'], 'peak_mb': None, 'calls': 1,
+                        'ok': row['ok']})
+
+    os.makedirs(os.path.join(output_dir, "results"), exist_ok = True)
+    path = os.path.join(output_dir, "results", label + ".json")
+    with open(path, "w") as fh:
+        json.dump({'meta': dict(metadata(label), seed = seed, scales = {s: SCALES.get(s, s) for s in scales if isinstance(s, str)}),
+                   'results': results}, fh, indent = 2)
+
+    print("Rezultate scrise in " + path)
+    return path
+
+def load_results(path):
+    with open(path) as fh:
+        return pd.DataFrame(json.load(fh)['results'])
+
+def compare(baseline_path, current_path):  # Raportul timpilor / memoriei intre doua rulari, pe scara si etapa
+    baseline = load_results(baseline_path).set_index(['scale', 'stage'])
+    current = load_results(current_path).set_index(['scale', 'stage'])
+    joined = baseline[['seconds', 'peak_mb']].join(current[['seconds', 'peak_mb']], lsuffix = '_base', rsuffix = '_new', how = 'inner')
+
+    joined['speedup'] = joined['seconds_base'] / joined['seconds_new']
+    joined['memory_ratio'] = joined['peak_mb_new'] / joined['peak_mb_base']
+    print(joined.round(4).to_string())
+    return joined
+
+if __name__ == "__main__":
+    run_benchmarks(sys.argv[1:] or None)
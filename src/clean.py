@@ -1,109 +1,150 @@
+import os
+import shutil
+import numpy as np
 import pandas as pd
+import dataset
+import instrument
+import rollup
+import schema
+import sqlite_store
+import stations
+import storage
 
 ########## Corectii ale anomaliilor ##########
 
-def delete_house_less_than_a_year():  # Stergerea caselor cu mai putin de un an de date
-    house_csv = "Database/House.csv"
-
-    df_house = pd.read_csv(house_csv)
+CHUNK_SIZE = 1_000_000  # Randuri citite o data din CSV-urile mari in curatarea pe flux
+SPILL_DIR = "Database/CleanTmp"  # Fisiere temporare pe casa / statie, sterse la final
 
+def houses_less_than_a_year(df_house):  # ID-urile caselor cu mai putin de un an de date
     one_year_seconds = 365 * 24 * 3600  # Durata in secunde pentru un an
-    df_house['Duration'] = df_house['EndingEpochTime'] - df_house['StartingEpochTime']
+    duration = df_house['EndingEpochTime'] - df_house['StartingEpochTime']
+    return df_house[duration < one_year_seconds]['ID'].tolist()
+
+@instrument.profiled("clean.delete_house_less_than_a_year")
+def delete_house_less_than_a_year():  # Stergerea caselor cu mai putin de un an de date
+    df_house = dataset.read_table('House')
 
     # Selecteaza casele cu durata mai mica de un an
-    houses_to_remove = df_house[df_house['Duration'] < one_year_seconds]['ID'].tolist()
+    houses_to_remove = houses_less_than_a_year(df_house)
 
     if not houses_to_remove:
         print("Nu s-au gasit case cu mai putin de un an de date.")
         return
 
-    # Filtreaza doar casele care raman si elimina coloana temporara
-    df_house_cleaned = df_house[df_house['Duration'] >= one_year_seconds].drop(columns = ['Duration'])
-    df_house_cleaned.to_csv(house_csv, index = False)
+    # Filtreaza doar casele care raman
+    df_house_cleaned = df_house[~df_house['ID'].isin(houses_to_remove)]
+    dataset.write_table('House', df_house_cleaned)
 
     print("Case eliminate cu mai putin de un an de date: " + str(houses_to_remove))
 
-def normalize_spikes(): # Normalizarea spike-urilor din 10 in 10 minute
-    csv = "Database/Consumption.csv"
-    threshold = 3
+@instrument.profiled("clean.normalize_spikes_frame")
+def normalize_spikes_frame(df, threshold = 3, window = 1, method = "mean"):  # Normalizeaza spike-urile dintr-un DataFrame sortat dupa casa, aparat, timp
+    # Un punct e spike daca depaseste de threshold ori referinta locala, calculata din cele window
+    # valori din stanga si window valori din dreapta (din acelasi aparat, fara punctul insusi).
+    # method = "mean" (media vecinilor, implicit; cu window = 1 e regula initiala) sau "median".
+    values = df['Value'].to_numpy(dtype = float)
+    n = len(values)
 
-    df = pd.read_csv(csv)
-    df = df.sort_values(by = ['HouseIDREF', 'ApplianceIDREF', 'EpochTime']).reset_index(drop = True)  # Sorteaza pentru a avea valorile in ordine cronologica
-
-    spike_count = 0  # Contor global
-
-    # Grupare pe casa, aparat
-    def fix_spikes(group):
-        nonlocal spike_count
-        values = group['Value'].to_numpy(dtype = float)
-        new_values = values.copy()
+    if n <= 2 * window:
+        return df.assign(Value = values), 0
 
-        for i in range(1, len(values) - 1):
-            left = values[i - 1]
-            right = values[i + 1]
-            local_avg = (left + right) / 2
+    # Identificatorul grupului (casa, aparat) pentru fiecare rand; grupurile sunt contigue dupa sortare
+    house = df['HouseIDREF'].to_numpy()
+    appliance = df['ApplianceIDREF'].to_numpy()
+    group = np.concatenate(([0], np.cumsum((house[1:] != house[:-1]) | (appliance[1:] != appliance[:-1]))))
 
-            if values[i] > local_avg * threshold:
-                new_values[i] = local_avg
-                spike_count += 1
+    # Doar punctele care au window vecini de ambele parti in acelasi grup sunt verificate
+    center = np.arange(window, n - window)
+    checked = (group[center - window] == group[center]) & (group[center + window] == group[center])
 
-        group['Value'] = new_values
-        return group
+    neighbours = np.stack([values[center - k] for k in range(1, window + 1)] +
+                          [values[center + k] for k in range(1, window + 1)], axis = 1)
 
-    df_cleaned = df.groupby(['HouseIDREF', 'ApplianceIDREF'], group_keys = False).apply(fix_spikes)
-    df_cleaned.to_csv(csv, index = False)
-
-    print("Spike-uri normalizate: " + str(spike_count))
+    if method == "mean":
+        local_ref = neighbours[:, 0] + neighbours[:, window] if window == 1 else neighbours.sum(axis = 1)
+        local_ref = local_ref / (2 * window)
+    elif method == "median":
+        local_ref = np.median(neighbours, axis = 1)
+    else:
+        raise ValueError("Metoda necunoscuta pentru spike-uri: " + str(method))
 
-def delete_houses_with_30_days_zero_consumption(): # Stergerea caselor cu 30 de zile consecutive cu 0 consum
-    consumption_file = "Database/Consumption.csv"
-    house_file = "Database/House.csv"
-    threshold = 30
+    spikes = checked & (values[center] > local_ref * threshold)
 
-    df_consumption = pd.read_csv(consumption_file)
-    df_house = pd.read_csv(house_file)
+    new_values = values.copy()
+    new_values[center[spikes]] = local_ref[spikes]
 
-    # Convertim EpochTime in datetime si extragem doar data
-    df_consumption['Datetime'] = pd.to_datetime(df_consumption['EpochTime'], unit = 's')
-    df_consumption['Date'] = df_consumption['Datetime'].dt.date
+    return df.assign(Value = new_values), int(spikes.sum())
 
-    # Calculam consumul total zilnic per casa
-    daily = df_consumption.groupby(['HouseIDREF', 'Date'])['Value'].sum().reset_index()
-    daily = daily.sort_values(by = ['HouseIDREF', 'Date']).reset_index(drop = True)
-
-    houses_to_remove = set()
-
-    # Verificam pentru fiecare casa daca are 30 zile consecutive cu 0 consum
-    for house_id, group in daily.groupby('HouseIDREF'):
-        zero_streak = 0
-        last_day = None
-
-        for _, row in group.iterrows():
-            day = row['Date']
-            consumption = row['Value']
+@instrument.profiled("clean.normalize_spikes")
+def normalize_spikes(threshold = 3, window = 1, method = "mean"): # Normalizarea spike-urilor din 10 in 10 minute
+    df = dataset.read_table('Consumption')
+    df = df.sort_values(by = ['HouseIDREF', 'ApplianceIDREF', 'EpochTime']).reset_index(drop = True)  # Sorteaza pentru a avea valorile in ordine cronologica
 
-            if consumption == 0.0:
-                if last_day is None or (day - last_day).days == 1:
-                    zero_streak += 1
-                else:
-                    zero_streak = 1
+    df_cleaned, spike_count = normalize_spikes_frame(df, threshold, window, method)
+    dataset.write_table('Consumption', df_cleaned)
 
-                if zero_streak >= threshold:
-                    houses_to_remove.add(house_id)
-                    break
-            else:
-                zero_streak = 0
+    print("Spike-uri normalizate: " + str(spike_count))
 
-            last_day = day
+def daily_consumption(df_consumption):  # Consumul zilnic per casa; ziua e EpochTime // 86400 (UTC), fara conversii datetime
+    day = (df_consumption['EpochTime'] // 86400).rename('Day')
+    return df_consumption.groupby([df_consumption['HouseIDREF'], day])['Value'].sum().reset_index()
+
+def zero_consumption_streaks(daily, threshold = 30):  # Raport per casa cu cea mai lunga serie de zile consecutive cu 0 consum
+    # daily: HouseIDREF, Day (intreg), Value. O zi lipsa intrerupe seria, la fel ca o zi cu consum.
+    daily = daily.sort_values(by = ['HouseIDREF', 'Day']).reset_index(drop = True)
+
+    house = daily['HouseIDREF'].to_numpy()
+    day = daily['Day'].to_numpy(dtype = np.int64)
+    zero = daily['Value'].to_numpy() == 0
+
+    # O zi continua seria daca e tot 0, e a aceleiasi case si urmeaza imediat unei zile cu 0
+    continues = np.zeros(len(daily), dtype = bool)
+    continues[1:] = zero[1:] & zero[:-1] & (house[1:] == house[:-1]) & (day[1:] == day[:-1] + 1)
+    starts = zero & ~continues
+
+    # Run-length encoding: lungimea fiecarei serii de zile cu 0
+    run_id = np.cumsum(starts) - 1
+    run_start = np.flatnonzero(starts)
+    runs = pd.DataFrame({
+        'HouseIDREF': house[run_start],
+        'StartDay': day[run_start],
+        'LongestZeroStreak': np.bincount(run_id[zero], minlength = len(run_start)),
+    })
+
+    # Cea mai lunga serie pe casa (la egalitate, prima)
+    longest = runs.sort_values(by = ['HouseIDREF', 'LongestZeroStreak', 'StartDay'], ascending = [True, False, True])
+    longest = longest.drop_duplicates('HouseIDREF')
+
+    report = pd.DataFrame({'HouseIDREF': pd.unique(house)}).merge(longest, on = 'HouseIDREF', how = 'left')
+    report['LongestZeroStreak'] = report['LongestZeroStreak'].fillna(0).astype('int64')
+    report['StartDay'] = report['StartDay'].astype('Int64')
+    report['StartDate'] = pd.to_datetime(report['StartDay'] * 86400, unit = 's').dt.date
+    report['Remove'] = report['LongestZeroStreak'] >= threshold
+
+    return report[['HouseIDREF', 'LongestZeroStreak', 'StartDay', 'StartDate', 'Remove']]
+
+def houses_with_zero_streak(daily, threshold = 30):  # Casele cu cel putin threshold zile consecutive cu 0 consum
+    report = zero_consumption_streaks(daily, threshold)
+    return set(int(h) for h in report.loc[report['Remove'], 'HouseIDREF'])
+
+@instrument.profiled("clean.delete_houses_with_30_days_zero_consumption")
+def delete_houses_with_30_days_zero_consumption(threshold = 30): # Stergerea caselor cu 30 de zile consecutive cu 0 consum
+    df_consumption = dataset.read_table('Consumption')
+    df_house = dataset.read_table('House')
+
+    # Calculam consumul total zilnic per casa si seriile de zile cu 0 consum
+    report = zero_consumption_streaks(daily_consumption(df_consumption), threshold)
+    houses_to_remove = set(int(h) for h in report.loc[report['Remove'], 'HouseIDREF'])
 
     df_house_cleaned = df_house[~df_house['ID'].isin(houses_to_remove)]
-    df_house_cleaned.to_csv(house_file, index = False)
+    dataset.write_table('House', df_house_cleaned)
 
     print("Case eliminate cu " + str(threshold) + " zile consecutive cu 0 consum: " + str(houses_to_remove))
+    return report
 
+@instrument.profiled("clean.correct_negative_weather_values")
 def correct_negative_weather_values(): # Corectarea valorilor din statiile meteo cu valori sub 0
-    csv_file = "Database/WeatherData.csv"
-    df = pd.read_csv(csv_file)
+    df = dataset.read_table('WeatherData')
 
     negative_count = (df['Value'] < 0).sum()
 
@@ -111,77 +152,298 @@ def correct_negative_weather_values(): # Corectarea valorilor din statiile meteo
         print("Nu au fost gasite valori negative in fisier.")
         return
 
-    df.loc[df['Value'] < 0, 'Value'] = 0
-    df.to_csv(csv_file, index = False)
+    df['Value'] = df['Value'].clip(lower = 0)  # Inlocuim coloana, nu modificam in loc datele din cache
+    dataset.write_table('WeatherData', df)
 
     print("Au fost corectate " + str(negative_count) + " valori negative din WeatherData.")
 
-def remove_houses_with_no_radiation_data(): # Sterge casele care nu au asociata o statie meteo cu radiatia inregistrata
-    house_file = 'Database/House.csv'
-    weather_file = 'Database/WeatherData.csv'
+def filter_houses_by_radiation(df_house, stations_with_radiation):  # Casele cu radiatie proprie sau interpolata din statii apropiate
+    if not stations.RADIATION_FALLBACK:
+        df_filtered = df_house[df_house['WeatherStationIDREF'].isin(stations_with_radiation)]
+        print(str(len(df_house) - len(df_filtered)) + " case eliminate care nu au valori pentru radiatie la statia meteo.")
+        return df_filtered
 
-    df_house = pd.read_csv(house_file)
-    df_weather = pd.read_csv(weather_file)
+    house_stations = df_house['WeatherStationIDREF'].dropna().astype(int)
+    lookup = stations.build_lookup(house_stations, dataset.read_table('WeatherStation'), stations_with_radiation)
+    df_filtered = df_house[df_house['WeatherStationIDREF'].isin(lookup['StationID'])]
+
+    interpolated = (~df_filtered['WeatherStationIDREF'].isin(stations_with_radiation)).sum()
+    print(str(interpolated) + " case fara radiatie la statia meteo folosesc radiatia interpolata din statiile apropiate.")
+    print(str(len(df_house) - len(df_filtered)) + " case eliminate care nu au radiatie nici la statiile apropiate.")
+    return df_filtered
+
+@instrument.profiled("clean.remove_houses_with_no_radiation_data")
+def remove_houses_with_no_radiation_data(): # Sterge casele care nu au asociata o statie meteo cu radiatia inregistrata (sau apropiata)
+    df_house = dataset.read_table('House')
+    df_weather = dataset.read_table('WeatherData')
 
     radiation_data = df_weather[df_weather['WeatherVariableIDREF'] == 4]
     stations_with_radiation = set(radiation_data['WeatherStationIDREF'])
 
-    df_house_filtered = df_house[df_house['WeatherStationIDREF'].isin(stations_with_radiation)]
+    df_house_filtered = filter_houses_by_radiation(df_house, stations_with_radiation)
 
-    df_house_filtered.to_csv(house_file, index = False)
-
-    print(str(len(df_house) - len(df_house_filtered)) + " case eliminate care nu au valori pentru radiatie la statia meteo.")
+    dataset.write_table('House', df_house_filtered)
     return df_house_filtered   
 
-def clean_all_tables():  # Filtrare in toate csv-urile dupa casele care au ramas in House.csv
-    house_file = "Database/House.csv"
-    appliance_file = "Database/Appliance.csv"
-    consumption_file = "Database/Consumption.csv"
-    weather_station_file = "Database/WeatherStation.csv"
-    weather_data_file = "Database/WeatherData.csv"
-    record_file = "Database/Record.csv"
+def filter_table(table, column, valid_ids, label = "randuri"):  # Pastreaza doar randurile cu ID valid si afiseaza cate s-au sters
+    df = dataset.read_table(table)
+    initial_rows = len(df)
+    df = df[df[column].isin(valid_ids)]
+    dataset.write_table(table, df)
+    print(str(initial_rows - len(df)) + " " + label + " eliminate din " + storage.csv_path(table))
 
-    # Citire House.csv si extragere ID-uri valide
-    df_house = pd.read_csv(house_file)
+def valid_ids_from_houses(stations_with_radiation = None):  # ID-urile caselor si statiilor ramase in House.csv (plus statiile folosite la interpolarea radiatiei)
+    if stations_with_radiation is None:
+        stations_with_radiation = stations.radiation_stations()
+
+    df_house = dataset.read_table('House')
     valid_house_ids = set(df_house['ID'])
     valid_station_ids = set(df_house['WeatherStationIDREF'].dropna().astype(int))
 
-    # Appliance.csv
-    df_appliance = pd.read_csv(appliance_file)
-    initial_appliance_rows = len(df_appliance)
-    df_appliance = df_appliance[df_appliance['HouseIDREF'].isin(valid_house_ids)]
-    df_appliance.to_csv(appliance_file, index = False)
-    print(str(initial_appliance_rows - len(df_appliance)) + " randuri eliminate din " + appliance_file)
-
-    # Consumption.csv
-    df_consumption = pd.read_csv(consumption_file)
-    initial_consumption_rows = len(df_consumption)
-    df_consumption = df_consumption[df_consumption['HouseIDREF'].isin(valid_house_ids)]
-    df_consumption.to_csv(consumption_file, index = False)
-    print(str(initial_consumption_rows - len(df_consumption)) + " randuri eliminate din " + consumption_file)
-
-    # WeatherStation.csv
-    df_station = pd.read_csv(weather_station_file)
-    initial_station_count = len(df_station)
-    df_station = df_station[df_station['ID'].isin(valid_station_ids)]
-    df_station.to_csv(weather_station_file, index = False)
-    print(str(initial_station_count - len(df_station)) + " statii meteo eliminate din " + weather_station_file)
-
-    # WeatherData.csv
-    df_weather_data = pd.read_csv(weather_data_file)
-    initial_weather_data_rows = len(df_weather_data)
-    df_weather_data = df_weather_data[df_weather_data['WeatherStationIDREF'].isin(valid_station_ids)]
-    df_weather_data.to_csv(weather_data_file, index = False)
-    print(str(initial_weather_data_rows - len(df_weather_data)) + " randuri eliminate din " + weather_data_file)
-
-    # Record.csv
-    df_record = pd.read_csv(record_file)
-    initial_record_rows = len(df_record)
-    df_record = df_record[df_record['WeatherStationIDREF'].isin(valid_station_ids)]
-    df_record.to_csv(record_file, index = False)
-    print(str(initial_record_rows - len(df_record)) + " randuri eliminate din " + record_file)
-
-def clean_files(): # Apelez toate functiile de filtrare
+    if stations.RADIATION_FALLBACK:
+        lookup = stations.build_lookup(valid_station_ids, dataset.read_table('WeatherStation'), stations_with_radiation)
+        valid_station_ids |= set(lookup['DonorID'].astype(int))
+    return valid_house_ids, valid_station_ids
+
+@instrument.profiled("clean.clean_all_tables")
+def clean_all_tables():  # Filtrare in toate csv-urile dupa casele care au ramas in House.csv
+    # Citire House.csv si extragere ID-uri valide
+    valid_house_ids, valid_station_ids = valid_ids_from_houses()
+
+    filter_table('Appliance', 'HouseIDREF', valid_house_ids)
+    filter_table('Consumption', 'HouseIDREF', valid_house_ids)
+    filter_table('WeatherStation', 'ID', valid_station_ids, "statii meteo")
+    filter_table('WeatherData', 'WeatherStationIDREF', valid_station_ids)
+    filter_table('Record', 'WeatherStationIDREF', valid_station_ids)
+
+########## Curatare pe flux (fiecare CSV mare e citit si scris o singura data) ##########
+
+def spill_chunk(directory, key, chunk, chunk_index):  # Imparte o bucata pe case / statii, in fisiere temporare
+    for key_value, group in chunk.groupby(key, sort = False):
+        target = os.path.join(directory, str(int(key_value)))
+        os.makedirs(target, exist_ok = True)
+        group.to_parquet(os.path.join(target, "chunk-" + str(chunk_index).zfill(6) + ".parquet"), index = False)
+
+def read_spilled(directory, key_value):  # Toate bucatile unei case / statii, in ordinea din CSV
+    target = os.path.join(directory, str(int(key_value)))
+    parts = sorted(os.listdir(target))
+    return pd.concat([pd.read_parquet(os.path.join(target, f)) for f in parts], ignore_index = True)
+
+def spilled_keys(directory):
+    if not os.path.exists(directory):
+        return []
+    return sorted(int(d) for d in os.listdir(directory))
+
+@instrument.profiled("clean.scan_consumption")
+def scan_consumption(directory, chunksize = CHUNK_SIZE):  # Pas unic peste Consumption.csv: consum zilnic per casa + impartire pe case
+    daily_parts = []
+    rows = 0
+    columns = None
+
+    for chunk_index, chunk in enumerate(pd.read_csv(storage.csv_path('Consumption'), dtype = schema.read_dtypes('Consumption'), chunksize = chunksize)):
+        chunk['Value'] = chunk['Value'].astype('float64')
+        columns = list(chunk.columns)
+        rows += len(chunk)
+
+        daily_parts.append(daily_consumption(chunk).set_index(['HouseIDREF', 'Day'])['Value'])
+
+        spill_chunk(directory, 'HouseIDREF', chunk, chunk_index)
+
+    if daily_parts:
+        daily = pd.concat(daily_parts).groupby(level = [0, 1]).sum().reset_index()
+    else:
+        daily = pd.DataFrame({'HouseIDREF': [], 'Day': [], 'Value': []})
+
+    return daily, rows, columns
+
+@instrument.profiled("clean.scan_weather")
+def scan_weather(directory, chunksize = CHUNK_SIZE):  # Pas unic peste WeatherData.csv: statii cu radiatie, valori negative, impartire pe statii
+    stations_with_radiation = set()
+    negative_counts = pd.Series(dtype = 'int64')
+    rows = 0
+    columns = None
+
+    for chunk_index, chunk in enumerate(pd.read_csv(storage.csv_path('WeatherData'), dtype = schema.read_dtypes('WeatherData'), chunksize = chunksize)):
+        chunk['Value'] = chunk['Value'].astype('float64')
+        columns = list(chunk.columns)
+        rows += len(chunk)
+
+        stations_with_radiation.update(chunk.loc[chunk['WeatherVariableIDREF'] == 4, 'WeatherStationIDREF'].unique().tolist())
+
+        # Corectarea valorilor negative se face in acelasi pas
+        negative = (chunk['Value'] < 0).groupby(chunk['WeatherStationIDREF']).sum()
+        negative_counts = negative_counts.add(negative, fill_value = 0)
+        chunk['Value'] = chunk['Value'].clip(lower = 0)
+
+        spill_chunk(directory, 'WeatherStationIDREF', chunk, chunk_index)
+
+    return stations_with_radiation, negative_counts, rows, columns
+
+@instrument.profiled("clean.write_partitioned_table")
+def write_partitioned_table(table, directory, valid_ids, columns, transform = None):  # Scrie CSV-ul final si store-ul, o partitie odata
+    output = storage.csv_path(table) + ".tmp"
+    pd.DataFrame(columns = columns).to_csv(output, index = False)
+
+    store_tmp = storage.begin_store(table)
+    partitions = []
+    rows = 0
+
+    for key_value in spilled_keys(directory):
+        if key_value not in valid_ids:
+            continue
+
+        df = read_spilled(directory, key_value)
+        if transform is not None:
+            df = transform(df)
+
+        df.to_csv(output, mode = "a", header = False, index = False)
+        storage.write_partition(store_tmp, table, key_value, df)
+        partitions.append(key_value)
+        rows += len(df)
+
+    os.replace(output, storage.csv_path(table))
+    storage.commit_store(table, store_tmp, partitions, rows)
+    dataset.invalidate(table)
+    return rows
+
+@instrument.profiled("clean.clean_files_streaming")
+def clean_files_streaming(chunksize = CHUNK_SIZE, zero_days_threshold = 30, spike_threshold = 3, # Curatarea completa, pe flux
+                            spike_window = 1, spike_method = "mean"):
+    consumption_dir = os.path.join(SPILL_DIR, "Consumption")
+    weather_dir = os.path.join(SPILL_DIR, "WeatherData")
+
+    if os.path.exists(SPILL_DIR):
+        shutil.rmtree(SPILL_DIR)
+
+    try:
+        # Pas 1: cate o singura citire a fiecarui CSV mare; memoria e limitata de chunksize
+        daily, consumption_rows, consumption_columns = scan_consumption(consumption_dir, chunksize)
+        stations_with_radiation, negative_counts, weather_rows, weather_columns = scan_weather(weather_dir, chunksize)
+
+        # Pas 2: deciziile despre case se iau pe tabelele mici
+        df_house = dataset.read_table('House')
+
+        houses_to_remove = houses_with_zero_streak(daily, zero_days_threshold)
+        df_house = df_house[~df_house['ID'].isin(houses_to_remove)]
+        print("Case eliminate cu " + str(zero_days_threshold) + " zile consecutive cu 0 consum: " + str(houses_to_remove))
+
+        short_houses = houses_less_than_a_year(df_house)
+        df_house = df_house[~df_house['ID'].isin(short_houses)]
+        if short_houses:
+            print("Case eliminate cu mai putin de un an de date: " + str(short_houses))
+        else:
+            print("Nu s-au gasit case cu mai putin de un an de date.")
+
+        df_house = filter_houses_by_radiation(df_house, stations_with_radiation)
+
+        dataset.write_table('House', df_house)
+        valid_house_ids, valid_station_ids = valid_ids_from_houses(stations_with_radiation)
+
+        filter_table('Appliance', 'HouseIDREF', valid_house_ids)
+        filter_table('WeatherStation', 'ID', valid_station_ids, "statii meteo")
+        filter_table('Record', 'WeatherStationIDREF', valid_station_ids)
+
+        # Pas 3: fiecare CSV mare e scris o singura data, casa cu casa / statie cu statie
+        spike_count = 0
+
+        def fix_house_spikes(df):
+            nonlocal spike_count
+            df = df.sort_values(by = ['ApplianceIDREF', 'EpochTime'], kind = 'stable').reset_index(drop = True)
+            df, count = normalize_spikes_frame(df, spike_threshold, spike_window, spike_method)
+            spike_count += count
+            return df
+
+        kept = write_partitioned_table('Consumption', consumption_dir, valid_house_ids, consumption_columns, fix_house_spikes)
+        print(str(consumption_rows - kept) + " randuri eliminate din " + storage.csv_path('Consumption'))
+
+        kept = write_partitioned_table('WeatherData', weather_dir, valid_station_ids, weather_columns)
+        print(str(weather_rows - kept) + " randuri eliminate din " + storage.csv_path('WeatherData'))
+
+        print("Spike-uri normalizate: " + str(spike_count))
+
+        negative_count = int(negative_counts[negative_counts.index.isin(valid_station_ids)].sum())
+        if negative_count == 0:
+            print("Nu au fost gasite valori negative in fisier.")
+        else:
+            print("Au fost corectate " + str(negative_count) + " valori negative din WeatherData.")
+    finally:
+        if os.path.exists(SPILL_DIR):
+            shutil.rmtree(SPILL_DIR)
+
+########## Curatare in baza SQLite (DELETE / UPDATE pe index, fara rescrierea fisierelor) ##########
+
+def delete_invalid(table, column, valid_ids, label = "randuri"):  # Sterge randurile cu ID-uri care nu mai sunt valide
+    invalid_ids = set(sqlite_store.distinct(table, column)) - set(int(i) for i in valid_ids)
+    deleted = sqlite_store.delete_rows(table, column, sorted(invalid_ids))
+    dataset.invalidate(table)
+    print(str(deleted) + " " + label + " eliminate din tabelul " + table + " (SQLite)")
+
+@instrument.profiled("clean.clean_database_sqlite")
+def clean_database_sqlite(zero_days_threshold = 30, spike_threshold = 3, spike_window = 1, spike_method = "mean"):  # Aceiasi pasi ca pe flux, in baza SQLite
+    # Deciziile despre case se iau pe agregari calculate in SQL
+    daily = sqlite_store.query("SELECT HouseIDREF, EpochTime / 86400 AS Day, SUM(Value) AS Value FROM Consumption "
+                               "GROUP BY HouseIDREF, Day")
+    stations_with_radiation = stations.radiation_stations()
+    df_house = dataset.read_table('House')
+    initial_house_ids = set(df_house['ID'].astype(int))
+
+    houses_to_remove = houses_with_zero_streak(daily, zero_days_threshold)
+    df_house = df_house[~df_house['ID'].isin(houses_to_remove)]
+    print("Case eliminate cu " + str(zero_days_threshold) + " zile consecutive cu 0 consum: " + str(houses_to_remove))
+
+    short_houses = houses_less_than_a_year(df_house)
+    df_house = df_house[~df_house['ID'].isin(short_houses)]
+    if short_houses:
+        print("Case eliminate cu mai putin de un an de date: " + str(short_houses))
+    else:
+        print("Nu s-au gasit case cu mai putin de un an de date.")
+
+    df_house = filter_houses_by_radiation(df_house, stations_with_radiation)
+
+    sqlite_store.delete_rows('House', 'ID', sorted(initial_house_ids - set(df_house['ID'].astype(int))))
+    dataset.invalidate('House')
+    valid_house_ids, valid_station_ids = valid_ids_from_houses(stations_with_radiation)
+
+    delete_invalid('Appliance', 'HouseIDREF', valid_house_ids)
+    delete_invalid('Consumption', 'HouseIDREF', valid_house_ids)
+    delete_invalid('WeatherStation', 'ID', valid_station_ids, "statii meteo")
+    delete_invalid('WeatherData', 'WeatherStationIDREF', valid_station_ids)
+    delete_invalid('Record', 'WeatherStationIDREF', valid_station_ids)
+
+    # Spike-urile: fiecare casa e citita prin index si doar valorile schimbate sunt scrise inapoi
+    spike_count = 0
+    for house_id in sorted(valid_house_ids):
+        df = sqlite_store.query("SELECT rowid AS RowID, HouseIDREF, ApplianceIDREF, EpochTime, Value FROM Consumption "
+                                "WHERE HouseIDREF = ? ORDER BY EpochTime", (int(house_id),))
+        df = df.sort_values(by = ['ApplianceIDREF', 'EpochTime'], kind = 'stable').reset_index(drop = True)  # Sortat aici: cu ORDER BY pe aparat SQLite ar parcurge tot indexul aparatelor
+        df_fixed, count = normalize_spikes_frame(df, spike_threshold, spike_window, spike_method)
+        if count:
+            changed = df_fixed['Value'].to_numpy() != df['Value'].to_numpy(dtype = float)
+            sqlite_store.update_values('Consumption', df['RowID'].to_numpy()[changed], df_fixed['Value'].to_numpy()[changed])
+            spike_count += count
+    dataset.invalidate('Consumption')
+    print("Spike-uri normalizate: " + str(spike_count))
+
+    negative_count = sqlite_store.execute("UPDATE WeatherData SET Value = 0 WHERE Value < 0")
+    dataset.invalidate('WeatherData')
+    if negative_count == 0:
+        print("Nu au fost gasite valori negative in fisier.")
+    else:
+        print("Au fost corectate " + str(negative_count) + " valori negative din WeatherData.")
+
+@instrument.profiled("clean.clean_files")
+def clean_files(streaming = True, chunksize = CHUNK_SIZE): # Apelez toate functiile de filtrare
+    if sqlite_store.ENABLED:  # Datele sunt in baza SQLite: stergeri pe index, CSV-urile raman neatinse
+        clean_database_sqlite()
+        rollup.build_rollups()
+        return
+
+    if streaming:
+        clean_files_streaming(chunksize)
+        rollup.build_rollups()  # Agregarile pentru grafice, din store-ul proaspat scris
+        return
+
+    # Varianta initiala, pas cu pas, cu tabelele mari incarcate complet in memorie
     # Functii de stergere
     delete_houses_with_30_days_zero_consumption()
     delete_house_less_than_a_year()
@@ -191,3 +453,7 @@ def clean_files(): # Apelez toate functiile de filtrare
     # Functii de corectare valori
     normalize_spikes()
     correct_negative_weather_values()
+
+    # Reconstruirea store-ului columnar si a agregarilor din CSV-urile curatate
+    storage.build_store()
+    rollup.build_rollups()
@@ -0,0 +1,167 @@
+import os
+from collections import OrderedDict
+import instrument
+import schema
+import sqlite_store
+import storage
+
+########## Acces centralizat la date, cu cache LRU in memorie ##########
+
+# Toate modulele (House, EnergyProcessing, plot, clean) citesc tabelele prin acest modul,
+# astfel incat un fisier este parsat o singura data pe proces.
+# Cache-ul este limitat in bytes (memoria reala a DataFrame-urilor), nu in numar de intrari.
+# Se intorc copii superficiale: apelantii pot adauga / inlocui coloane, dar nu modifica valori in loc.
+# Cu baza SQLite activa (sqlite_store.ENABLED) tabelele sunt citite / scrise in baza, iar versiunea
+# intrarilor din cache e cea a fisierului bazei.
+
+MAX_CACHE_BYTES = 2 * 1024 ** 3  # 2 GB
+
+class DatasetCache:
+    def __init__(self, max_bytes = MAX_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # cheie -> (DataFrame, bytes, versiunea sursei)
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def contains(self, key, version = None):
+        if key not in self.entries:
+            return False
+        return version is None or self.entries[key][2] == version
+
+    def get(self, key, loader, version = None):  # Intoarce intrarea din cache sau o incarca cu loader()
+        entry = self.entries.get(key)
+
+        if entry is not None and entry[2] == version:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+        if entry is not None:  # Fisierul sursa s-a schimbat pe disc
+            self.remove(key)
+
+        self.misses += 1
+        df = loader()
+        self.put(key, df, version)
+        return df
+
+    def put(self, key, df, version = None):
+        size = int(df.memory_usage(index = True, deep = True).sum())
+
+        if key in self.entries:
+            self.remove(key)
+
+        if size > self.max_bytes:  # Prea mare pentru cache, nu il pastram
+            return
+
+        while self.entries and self.current_bytes + size > self.max_bytes:
+            _, (_, old_size, _) = self.entries.popitem(last = False)
+            self.current_bytes -= old_size
+
+        self.entries[key] = (df, size, version)
+        self.current_bytes += size
+
+    def remove(self, key):
+        _, size, _ = self.entries.pop(key)
+        self.current_bytes -= size
+
+    def invalidate(self, table = None):  # Sterge toate intrarile unui tabel (sau tot cache-ul)
+        for key in list(self.entries):
+            if table is None or key[0] == table:
+                self.remove(key)
+
+    def info(self):
+        return {
+            'entries': len(self.entries),
+            'bytes': self.current_bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+cache = DatasetCache()
+
+def source_version(path):  # Versiunea fisierului pe disc (mtime, dimensiune)
+    if not os.path.exists(path):
+        return None
+    stat = os.stat(path)
+    return (stat.st_mtime, stat.st_size)
+
+def select_columns(df, columns):
+    if columns is None:
+        return df.copy(deep = False)
+    return df[list(columns)]
+
+@instrument.profiled("load.read_table")
+def read_table(table, columns = None):  # Tabelul complet, parsat o singura data
+    if sqlite_store.ENABLED:
+        loader = lambda: sqlite_store.read_table(table)
+    else:
+        loader = lambda: schema.read_csv(storage.csv_path(table), table)
+
+    df = cache.get((table, None), loader, storage.table_version(table))
+    return select_columns(df, columns)
+
+@instrument.profiled("load.write_table")
+def write_table(table, df):  # Rescrie CSV-ul (sau tabelul din baza SQLite) si invalideaza tot ce era in cache pentru el
+    if sqlite_store.ENABLED:
+        sqlite_store.write_table(table, df)
+    else:
+        df.to_csv(storage.csv_path(table), index = False)
+    cache.invalidate(table)
+
+    # Tabelul scris e deja in memorie, nu e nevoie sa fie parsat din nou
+    cache.put((table, None), schema.apply_schema(df.reset_index(drop = True), table), storage.table_version(table))
+
+def append_rows(table, df):  # Adauga randuri noi in tabel; intrarile vechi din cache nu mai sunt valabile
+    rows = storage.append_rows(table, df)
+    cache.invalidate(table)
+    return rows
+
+def invalidate(table = None):
+    cache.invalidate(table)
+
+@instrument.profiled("load.partition")
+def load_partition(table, key_value, columns = None):  # Partitia unei case / statii, din cache
+    version = storage.table_version(table)
+    key = storage.PARTITION_KEYS[table]
+
+    def loader():
+        # Daca tabelul complet e deja in memorie, nu mai citim nimic de pe disc
+        if cache.contains((table, None), version):
+            full = cache.get((table, None), None, version)
+            part = full[full[key] == key_value].reset_index(drop = True)
+            return storage.cast_columns(part, table)
+        return storage.load_partition(table, key_value)
+
+    df = cache.get((table, int(key_value)), loader, version)
+    return select_columns(df, columns)
+
+def house_consumption(house_id, columns = None):  # Consumul unei case
+    return load_partition('Consumption', house_id, columns)
+
+def station_weather(station_id, columns = None, variable_id = None):  # Datele meteo ale unei statii
+    if sqlite_store.ENABLED and variable_id is not None:  # Doar randurile variabilei, prin index
+        df = cache.get(('WeatherData', int(station_id), 'variable', int(variable_id)),
+                       lambda: sqlite_store.load_weather(station_id, variable_id), storage.table_version('WeatherData'))
+        return select_columns(df, columns)
+
+    df = load_partition('WeatherData', station_id)
+
+    if variable_id is not None:
+        df = df[df['WeatherVariableIDREF'] == variable_id].reset_index(drop = True)
+
+    return select_columns(df, columns)
+
+def house_hourly_consumption(house_id):  # Consumul orar (kWh) al unei case, agregat in SQLite: HourEpoch, Value
+    return cache.get(('Consumption', int(house_id), 'hourly'), lambda: sqlite_store.hourly_consumption(house_id),
+                     storage.table_version('Consumption'))
+
+def house_row(house_id):  # Randul din House.csv pentru o casa
+    df_house = read_table('House')
+    house_data = df_house[df_house['ID'] == house_id]
+
+    if house_data.empty:
+        raise ValueError("Casa " + str(house_id) + " nu exista in House.csv.")
+
+    return house_data.iloc[0]
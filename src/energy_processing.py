@@ -1,69 +1,208 @@
+import numpy as np
 import pandas as pd
+from datetime import datetime, time, timedelta, timezone
+import dataset
+import instrument
+import sqlite_store
+import stations
 from house import House
 
 ########## Functii pentru calculul energiei produse / consumate ##########
 
+def hourly_consumption(df):  # Consumul orar in kWh dintr-un DataFrame cu EpochTime si Value (W / 10 min)
+    df = df.astype({'EpochTime': 'int64', 'Value': 'float64'})
+
+    # Convertim EpochTime la inceputul orei (rotunjire in jos la multiplu de 3600)
+    hour_epoch = (df['EpochTime'] - df['EpochTime'] % 3600).rename('HourEpoch')
+
+    return df.groupby(hour_epoch)['Value'].sum() / 6000
+
+def rows_for(df, column, key_value):  # Doar randurile unei case / statii; coloana cheie e adaugata daca lipseste
+    if column not in df.columns:
+        return df.assign(**{column: key_value})
+    return df[df[column] == key_value]
+
+def dict_to_arrays(data):  # {epoch: valoare} -> (timpi int64, valori float64)
+    times = np.fromiter(data.keys(), dtype = np.int64, count = len(data))
+    values = np.fromiter(data.values(), dtype = np.float64, count = len(data))
+    return times, values
+
+def day_bounds(day, local = False):  # [inceput, sfarsit) al unei zile ca epoch; implicit UTC, ca pd.to_datetime(..., unit = 's')
+    if isinstance(day, str):  # Aceleasi formate ca pd.to_datetime (ex. "2015-03-14", "2015/03/14")
+        day = pd.Timestamp(day).date()
+    if isinstance(day, datetime):
+        day = day.date()
+
+    start = datetime.combine(day, time())
+    end = datetime.combine(day + timedelta(days = 1), time())
+    if not local:
+        start = start.replace(tzinfo = timezone.utc)
+        end = end.replace(tzinfo = timezone.utc)
+    return int(start.timestamp()), int(end.timestamp())
+
+class TimeIndex:  # Epoch-uri sortate si valorile lor, cu cautare binara pe intervale
+    def __init__(self, times, values):
+        if len(times) > 1 and np.any(times[1:] < times[:-1]):  # De ex. date ingerate in alta ordine
+            order = np.argsort(times, kind = 'stable')
+            times = times[order]
+            values = values[order]
+        self.times = times
+        self.values = values
+
+    def bounds(self, start = None, end = None):  # Pozitiile [i, j) ale intervalului [start, end)
+        i = 0 if start is None else int(np.searchsorted(self.times, start, side = 'left'))
+        j = len(self.times) if end is None else int(np.searchsorted(self.times, end, side = 'left'))
+        return i, max(i, j)
+
+    def slice(self, start = None, end = None):  # View-uri pe array-uri, fara copii
+        i, j = self.bounds(start, end)
+        return self.times[i:j], self.values[i:j]
+
 class EnergyProcessing(House):
     def __init__(self, house_id):
         super().__init__(house_id)
         self.consumption = {} #Puterea consumata pe ora
         self.production = {} # Puterea produsa pe ora
         self.solar_radiation = {} # Radiatia solara pe ora
+        self.series_arrays = {} # Forma vectoriala a seriilor de mai sus: nume -> (dict sursa, timpi, valori)
+        self.daily = {} # Totalurile pe zile ale seriilor, calculate la cerere: nume -> {inceputul zilei: valoare}
+        self.production_params = None # (n, Pm, f, GTSTC) de la ultima estimare a productiei
+        self.time_indexes = {} # Indexul de timp al fiecarei serii: nume -> (timpii din care a fost construit, TimeIndex)
+        self.station_radiation_times = None # Timpii seriei de radiatie a statiei, cat timp radiatia nu e modificata local
+
+    def set_series(self, name, times, values):  # Seteaza seria ca dict si pastreaza si forma de array-uri
+        data = dict(zip(times.tolist(), values.tolist()))
+        setattr(self, name, data)
+        self.series_arrays[name] = (data, times, values)
+        self.daily.pop(name, None)
+        return data
+
+    def update_series(self, name, updates):  # Modifica doar orele atinse de date noi: {epoch: valoare noua}
+        data = getattr(self, name)
+        daily = self.daily.get(name)
+
+        for key, value in updates.items():
+            if daily is not None:
+                day = key - key % 86400
+                daily[day] = daily.get(day, 0.0) + value - data.get(key, 0.0)
+            data[key] = value
+
+        self.series_arrays.pop(name, None)  # Array-urile se refac doar la urmatorul calcul complet
+
+    def time_index(self, name):  # Indexul de timp al unei serii, refacut doar cand array-urile ei se schimba
+        times, values = self.get_arrays(name)
+        cached = self.time_indexes.get(name)
+
+        if cached is None or cached[0] is not times:
+            cached = (times, TimeIndex(times, values))
+            self.time_indexes[name] = cached
+        return cached[1]
+
+    def slice_range(self, start = None, end = None, name = 'consumption'):  # (timpi, valori) cu epoch in [start, end), O(log n)
+        return self.time_index(name).slice(start, end)
+
+    def slice_day(self, day, name = 'consumption', local = False):  # (timpi, valori) dintr-o zi (data, datetime sau "YYYY-MM-DD")
+        start, end = day_bounds(day, local)
+        return self.slice_range(start, end, name)
+
+    def daily_totals(self, name):  # Totalul pe zile (UTC) al unei serii; dupa prima calculare e doar actualizat
+        if name not in self.daily:
+            times, values = self.get_arrays(name)
+            days, inverse = np.unique(times - times % 86400, return_inverse = True)
+            totals = np.bincount(inverse, weights = values, minlength = len(days))
+            self.daily[name] = dict(zip(days.tolist(), totals.tolist()))
+        return self.daily[name]
+
+    def get_arrays(self, name):  # Array-urile (timpi, valori) pentru o serie, reconstruite doar daca dict-ul s-a schimbat
+        data = getattr(self, name)
+        cached = self.series_arrays.get(name)
+
+        if cached is not None and cached[0] is data and len(cached[1]) == len(data):
+            return cached[1], cached[2]
+
+        times, values = dict_to_arrays(data)
+        self.series_arrays[name] = (data, times, values)
+        return times, values
     
+    @instrument.profiled("get_consumption")
     def get_consumption(self):  # Calculeaza consumul total al casei per ora din csv
-        consumption_file = "Database/Consumption.csv"
-        df = pd.read_csv(consumption_file)
+        if sqlite_store.ENABLED:  # Agregarea pe ore e facuta de SQLite, pe indexul (HouseIDREF, EpochTime)
+            df_hourly = dataset.house_hourly_consumption(self.house_id).set_index('HourEpoch')['Value']
+        else:
+            # Citim doar partitia casei si coloanele necesare
+            df = dataset.house_consumption(self.house_id, columns = ['EpochTime', 'Value'])
+            df_hourly = hourly_consumption(df)
 
-        df = df[df['HouseIDREF'] == self.house_id]
+        return self.set_series('consumption', df_hourly.index.to_numpy(dtype = np.int64), df_hourly.to_numpy(dtype = np.float64))
 
-        # Convertim EpochTime la inceputul orei (rotunjire in jos la multiplu de 3600)
-        def fix_hour(x):
-            return x - (x % 3600)
-        df['HourEpoch'] = df['EpochTime'].apply(fix_hour)
-    
-        df_hourly = df.groupby('HourEpoch')['Value'].sum()
+    @instrument.profiled("get_solar_radiation")
+    def get_solar_radiation(self): # Ia radiatia solara din WeatherData
+        station_id = self.weather_station_id  # Deja citit din House.csv in constructor
 
-        self.consumption = (df_hourly / 6000).to_dict()
+        # Seria statiei (variabila 4, sau interpolata din statiile apropiate) e calculata o data si partajata de casele ei
+        df = stations.station_radiation(station_id)
 
-        return self.consumption
+        if df.empty:
+            instrument.log("Nu s-au gasit date meteo pentru statia " + str(station_id))
+            return {}
 
-    def get_solar_radiation(self): # Ia radiatia solara din WeatherData
-        house_file = "Database/House.csv"
-        weather_file = "Database/WeatherData.csv"
+        times = df['EpochTime'].to_numpy(dtype = np.int64)
+        self.station_radiation_times = times
+        return self.set_series('solar_radiation', times, df['Value'].to_numpy(dtype = np.float64))
 
-        df_house = pd.read_csv(house_file)
-        df_weather = pd.read_csv(weather_file)
+    @instrument.profiled("get_power_estimated")
+    def get_power_estimated(self, n = 10, Pm = 575, f = 0.8, GTSTC = 1000):  # Calculeaza puterea produsa estimata pentru n panouri
+        if not self.solar_radiation:
+            instrument.log("Radiatia solara nu este incarcata.")
+            return {}
 
-        station_row = df_house[df_house['ID'] == self.house_id]
+        times, radiation = self.get_arrays('solar_radiation')
+        panel = None
+        if times is self.station_radiation_times:  # Radiatia nemodificata a statiei: productia pe panou din cache, scalata
+            panel = stations.panel_production(self.weather_station_id, Pm, f, GTSTC)['Value'].to_numpy(dtype = np.float64)
 
-        station_id = station_row.iloc[0]['WeatherStationIDREF']
+        if panel is not None and len(panel) == len(times):  # Lungimi diferite: WeatherData s-a schimbat intre timp
+            values = n * panel
+        else:
+            values = Pm * n * f * radiation / GTSTC / 6000  # W*10min -> kWh
+        self.production_params = (n, Pm, f, GTSTC)
 
-        df_filtered = df_weather[
-            (df_weather['WeatherStationIDREF'] == station_id) &
-            (df_weather['WeatherVariableIDREF'] == 4)
-        ]
+        return self.set_series('production', times, values)
 
-        if df_filtered.empty:
-            print("Nu s-au gasit date meteo pentru statia " + str(station_id))
+    @instrument.profiled("ingest_consumption")
+    def ingest_consumption(self, df, persist = True):  # Citiri noi de consum (10 min): se actualizeaza doar orele si zilele atinse
+        df = rows_for(df, 'HouseIDREF', self.house_id)
+        if df.empty:
             return {}
 
-        df_grouped = df_filtered.groupby('EpochTime')['Value'].sum()
-        self.solar_radiation = df_grouped.to_dict()
+        if persist:
+            dataset.append_rows('Consumption', df)
 
-        return self.solar_radiation
+        hourly = hourly_consumption(df)
+        updates = {hour: self.consumption.get(hour, 0.0) + value for hour, value in zip(hourly.index.tolist(), hourly.tolist())}
+        self.update_series('consumption', updates)
+        return updates
 
-    def get_power_estimated(self, n = 10, Pm = 575, f = 0.8, GTSTC = 1000):  # Calculeaza puterea produsa estimata pentru n panouri
-        if not self.solar_radiation:
-            print("Radiatia solara nu este incarcata.")
+    @instrument.profiled("ingest_weather")
+    def ingest_weather(self, df, persist = True):  # Date meteo noi pentru statia casei; radiatia si productia se actualizeaza pe epoch-urile atinse
+        df = rows_for(df, 'WeatherStationIDREF', self.weather_station_id)
+        if df.empty:
             return {}
 
-        production_data = {
-            t: (Pm * n * f * G / GTSTC) / 6000  # W*10min -> kWh
-            for t, G in self.solar_radiation.items()
-        }
+        df = df.assign(Value = df['Value'].clip(lower = 0))  # Aceeasi corectie ca la curatare
+
+        if persist:
+            dataset.append_rows('WeatherData', df)
+
+        radiation = df[df['WeatherVariableIDREF'] == 4].astype({'EpochTime': 'int64', 'Value': 'float64'})
+        radiation = radiation.groupby('EpochTime')['Value'].sum()
+        updates = {epoch: self.solar_radiation.get(epoch, 0.0) + value for epoch, value in zip(radiation.index.tolist(), radiation.tolist())}
+        self.update_series('solar_radiation', updates)
 
-        self.production = production_data
-        return self.production
+        if self.production_params is not None:
+            n, Pm, f, GTSTC = self.production_params
+            self.update_series('production', {epoch: Pm * n * f * value / GTSTC / 6000 for epoch, value in updates.items()})
+        return updates
 
     def print_consumption(self):  # Printeaza consumul
         for i, (key, value) in enumerate(self.consumption.items()):
@@ -0,0 +1,149 @@
+import numpy as np
+import pandas as pd
+import instrument
+from optimize import MAX_SWEEP_CELLS, aligned_radiation
+
+########## Analiza de sensibilitate financiara: NPV, an de recuperare si IRR pe o grila de scenarii ##########
+
+# Energia anuala autoconsumata depinde doar de instalatie (n, Pm, f), deci se calculeaza o singura data pe
+# fiecare pereche (n, Pm). Restul parametrilor (Cwp, Y, r, pret) doar scaleaza fluxurile, iar fluxul anual
+# este constant pe durata de viata, deci NPV are forma inchisa:
+#   NPV = -CapEX + (G - OpEX) * A(r, Y), cu A(r, Y) = sum 1 / (1 + r)^t, t = 1..Y = (1 - (1 + r)^-Y) / r
+# Aceeasi formula ca npv_from_totals, fara bucla pe ani. Toata grila e evaluata prin broadcast NumPy,
+# cu axele (n, Pm) x Cwp x Y x r x pret.
+
+IRR_ITERATIONS = 60  # Pasi de bisectie pentru IRR (intervalul se injumatateste la fiecare pas)
+IRR_MIN = -0.99
+
+def as_values(value, dtype = np.float64):  # Un parametru poate fi scalar sau lista de valori
+    values = np.unique(np.atleast_1d(np.asarray(value, dtype = dtype)))
+    if len(values) == 0:
+        raise ValueError("Lista de valori pentru grila este goala.")
+    return values
+
+def annuity(r, Y):  # Suma factorilor de actualizare pe Y ani; stabila si pentru r apropiat de 0
+    r = np.asarray(r, dtype = np.float64)
+    Y = np.asarray(Y, dtype = np.float64)
+    safe_r = np.where(r == 0, 1.0, r)
+    return np.where(r == 0, Y, -np.expm1(-Y * np.log1p(safe_r)) / safe_r)
+
+def payback_year(capex, cash_flow, r, Y):  # Primul an in care fluxurile actualizate acopera investitia (NaN daca nu in Y ani)
+    capex, cash_flow, r, Y = np.broadcast_arrays(*(np.asarray(v, dtype = np.float64) for v in (capex, cash_flow, r, Y)))
+    years = np.full(capex.shape, np.nan)
+
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        # A(r, t) >= CapEX / CF  <=>  t >= -ln(1 - r * CapEX / CF) / ln(1 + r)
+        ratio = capex / cash_flow
+        remaining = 1 - r * ratio
+        exact = np.where(r == 0, ratio, -np.log(remaining) / np.log1p(np.where(r == 0, 1.0, r)))
+        possible = (cash_flow > 0) & ((r == 0) | (remaining > 0))
+
+    years[possible] = np.maximum(1, np.ceil(exact[possible] - 1e-9))
+    years[years > Y] = np.nan
+    return years
+
+def irr(capex, cash_flow, Y, iterations = IRR_ITERATIONS):  # Rata pentru care NPV = 0, prin bisectie vectorizata
+    capex, cash_flow, Y = np.broadcast_arrays(*(np.asarray(v, dtype = np.float64) for v in (capex, cash_flow, Y)))
+    result = np.full(capex.shape, np.nan)
+
+    # A(x, Y) scade cu x, deci radacina e unica; fara flux pozitiv nu exista IRR
+    valid = (cash_flow > 0) & (capex > 0)
+    ratio = capex[valid] / cash_flow[valid]
+    years = Y[valid]
+
+    low = np.full(ratio.shape, IRR_MIN)
+    high = 1 / ratio + 1  # A(x, Y) < 1 / x, deci radacina e sub 1 / ratio
+    for _ in range(iterations):
+        middle = (low + high) / 2
+        above = annuity(middle, years) > ratio  # Rata prea mica
+        low = np.where(above, middle, low)
+        high = np.where(above, high, middle)
+
+    # Sub IRR_MIN radacina nu e gasita (investitia nu se recupera nici cu pierderi extreme)
+    found = annuity(low, years) >= ratio
+    values = (low + high) / 2
+    values[~found] = np.nan
+    result[valid] = values
+    return result
+
+def annual_self_consumption(indicator_obj, n = 10, Pm = 575, f = 0.8, GTSTC = 1000.0, max_cells = MAX_SWEEP_CELLS):
+    # Consumul anual si autoconsumul anual pentru fiecare pereche (n, Pm), extinse la 8760 de ore
+    if not indicator_obj.consumption:
+        raise ValueError("indicator_obj.consumption gol.")
+    if not indicator_obj.solar_radiation:
+        raise ValueError("indicator_obj.solar_radiation gol.")
+
+    radiation, consumption = aligned_radiation(indicator_obj)
+    if len(radiation) == 0:
+        raise ValueError("Nu exista ore comune intre consum si radiatie.")
+
+    n_values, Pm_values = np.meshgrid(as_values(n, np.int64), as_values(Pm), indexing = 'ij')
+    n_values = n_values.ravel()
+    Pm_values = Pm_values.ravel()
+    installed = Pm_values * n_values
+
+    # Aceeasi formula ca get_power_estimated; perechile sunt evaluate in blocuri (perechi x ore)
+    rows_per_chunk = max(1, max_cells // len(radiation))
+    self_consumption = np.empty(len(installed))
+    for start in range(0, len(installed), rows_per_chunk):
+        production = (installed[start:start + rows_per_chunk, None] * f) * radiation / GTSTC / 6000
+        self_consumption[start:start + rows_per_chunk] = np.minimum(production, consumption).sum(axis = -1)
+
+    scale = 8760 / len(radiation)
+    return {
+        'n': n_values,
+        'Pm': Pm_values,
+        'annual_consumption': consumption.sum() * scale,
+        'annual_self_consumption': self_consumption * scale,
+    }
+
+@instrument.profiled("finance.scenario_grid")
+def scenario_grid(indicator_obj = None, Cwp = 0.11, Pm = 575, n = 10, Y = 20, r = 0.05, price_per_kWh = 0.2, f = 0.8,
+                    GTSTC = 1000.0, annual = None):  # NPV, an de recuperare si IRR pe produsul cartezian al parametrilor
+    # Fiecare parametru poate fi scalar sau lista. `annual` (rezultatul annual_self_consumption) poate fi
+    # refolosit intre grile; atunci n si Pm sunt cele din `annual`, iar indicator_obj nu mai e necesar.
+    if annual is None:
+        if indicator_obj is None:
+            raise ValueError("Este necesar indicator_obj sau annual.")
+        annual = annual_self_consumption(indicator_obj, n = n, Pm = Pm, f = f, GTSTC = GTSTC)
+
+    Cwp_values = as_values(Cwp)
+    Y_values = as_values(Y, np.int64)
+    r_values = as_values(r)
+    price_values = as_values(price_per_kWh)
+    if Y_values.min() < 1:
+        raise ValueError("Durata de viata Y trebuie sa fie cel putin 1 an.")
+
+    # Axe: (n, Pm) x Cwp x Y x r x pret
+    n_axis = annual['n'][:, None, None, None, None]
+    Pm_axis = annual['Pm'][:, None, None, None, None]
+    self_axis = annual['annual_self_consumption'][:, None, None, None, None]
+    Cwp_axis = Cwp_values[None, :, None, None, None]
+    Y_axis = Y_values[None, None, :, None, None]
+    r_axis = r_values[None, None, None, :, None]
+    price_axis = price_values[None, None, None, None, :]
+
+    annual_consumption = annual['annual_consumption']
+    capex = Cwp_axis * Pm_axis * n_axis
+    opex = 0.03 * capex
+
+    # Castigul anual: factura fara PV minus factura cu PV (ca in npv_from_totals)
+    gain = annual_consumption * price_axis - np.maximum(0, annual_consumption - self_axis) * price_axis
+    cash_flow = gain - opex
+
+    npv = -capex + cash_flow * annuity(r_axis, Y_axis)
+    payback = payback_year(capex, cash_flow, r_axis, Y_axis)
+    irr_values = irr(capex, cash_flow, Y_axis)  # Nu depinde de r: calculat o data si extins pe axa r
+
+    shape = np.broadcast_shapes(npv.shape, payback.shape)
+    columns = {
+        'n': n_axis, 'Pm': Pm_axis, 'Cwp': Cwp_axis, 'Y': Y_axis, 'r': r_axis, 'price_per_kWh': price_axis,
+        'annual_self_consumption': self_axis, 'NPV': npv, 'payback_year': payback, 'IRR': irr_values,
+    }
+    return pd.DataFrame({name: np.broadcast_to(values, shape).ravel() for name, values in columns.items()})
+
+def sensitivity_table(grid, index = 'r', columns = 'price_per_kWh', value = 'NPV', **fixed):  # Tabel pivot pe doi parametri, ceilalti fixati
+    selected = grid
+    for name, target in fixed.items():
+        selected = selected[np.isclose(selected[name], target)]
+    return selected.pivot_table(index = index, columns = columns, values = value)
@@ -1,14 +1,10 @@
-import pandas as pd
+import dataset
 
 class House:
     def __init__(self, house_id):
         self.house_id = house_id
 
-        house_df = pd.read_csv("Database/House.csv")
-
-        house_data = house_df[house_df['ID'] == house_id]
-
-        row = house_data.iloc[0]
+        row = dataset.house_row(house_id)  # House.csv e parsat o singura data pe proces
         self.zipcode = row['ZIPcode']
         self.location = row['Location']
         self.weather_station_id = row['WeatherStationIDREF']
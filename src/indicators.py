@@ -1,117 +1,308 @@
+import numpy as np
+import pandas as pd
 from energy_processing import EnergyProcessing
+import instrument
 
 ########## Calculul indicatorilor SS, SC, NEEG, NPV ##########
 
+def as_result(value):  # Scalar Python pentru o singura configuratie, array pentru un lot
+    return float(value) if np.ndim(value) == 0 else value
+
+def npv_from_totals(total_consumption, total_self_consumption, hours_available, Cwp = 0.11, Pm = 575, n = 1,
+                    Y = 20, r = 0.05, price_per_kWh = 0.2, extra_capex = 0.0):  # NPV pornind de la totalurile pe perioada disponibila (merge si pe array-uri)
+    CapEX = Cwp * Pm * np.asarray(n) + extra_capex  # extra_capex: ex. costul bateriei
+    OpEX = 0.03 * CapEX
+
+    # Extindem pe un an intreg (8760 ore)
+    annual_consumption = (np.asarray(total_consumption) / hours_available) * 8760
+    annual_self_consumption = (np.asarray(total_self_consumption) / hours_available) * 8760
+
+    # Factura fara PV / cu PV
+    B_ref = annual_consumption * price_per_kWh
+    energy_from_grid = np.maximum(0, annual_consumption - annual_self_consumption)
+    B_new = energy_from_grid * price_per_kWh
+
+    # Castig anual
+    G = B_ref - B_new
+
+    # NPV: suma fluxurilor actualizate pe Y ani
+    discount = (1 + r) ** np.arange(1, Y + 1)
+    return as_result(-CapEX + np.sum(np.divide.outer(G - OpEX, discount), axis = -1))
+
+def compute_indicators(production, consumption, Cwp = 0.11, Pm = 575, n = 1, Y = 20, r = 0.05, price_per_kWh = 0.2):
+    # Kernel comun pentru SS, SC, NEEG si NPV, pe array-uri deja aliniate pe aceleasi ore.
+    # production poate fi si o matrice (configuratii x ore): indicatorii se calculeaza pe fiecare rand.
+    production = np.asarray(production, dtype = np.float64)
+    consumption = np.asarray(consumption, dtype = np.float64)
+
+    self_consumption = np.minimum(production, consumption)  # Energia produsa si consumata local
+
+    total_production = production.sum(axis = -1)
+    total_consumption = np.broadcast_to(consumption.sum(axis = -1), total_production.shape)
+    total_self_consumption = self_consumption.sum(axis = -1)
+    hours_available = production.shape[-1]
+
+    result = {
+        'SS': as_result(np.divide(total_self_consumption, total_consumption,
+                                  out = np.zeros(total_production.shape), where = total_consumption != 0)),
+        'SC': as_result(np.divide(total_self_consumption, total_production,
+                                  out = np.zeros(total_production.shape), where = total_production != 0)),
+        'NEEG': as_result(np.abs(production - consumption).sum(axis = -1)),  # Import + export
+        'NPV': None,
+        'total_production': as_result(total_production),
+        'total_consumption': as_result(total_consumption),
+        'total_self_consumption': as_result(total_self_consumption),
+        'hours': hours_available,
+    }
+
+    if hours_available:
+        result['NPV'] = npv_from_totals(total_consumption, total_self_consumption, hours_available,
+                                        Cwp = Cwp, Pm = Pm, n = n, Y = Y, r = r, price_per_kWh = price_per_kWh)
+    return result
+
+def battery_dispatch(production, consumption, capacity, charge_power = None, discharge_power = None, efficiency = 0.9):
+    # Simularea orara a unei baterii pentru mai multe configuratii deodata.
+    # production: (configuratii x ore) in kWh; capacity / charge_power / discharge_power: kWh, kW (scalar sau pe configuratie).
+    # Surplusul orar incarca bateria (limitat de putere si de spatiul liber), deficitul o descarca; restul se
+    # exporta / importa. Randamentul dus-intors e impartit egal intre incarcare si descarcare.
+    # Starea de incarcare depinde de ora anterioara, deci bucla e pe ore, dar fiecare pas e vectorizat pe configuratii.
+    production = np.atleast_2d(np.asarray(production, dtype = np.float64))
+    consumption = np.asarray(consumption, dtype = np.float64)
+    configurations = production.shape[0]
+
+    capacity = np.broadcast_to(np.asarray(capacity, dtype = np.float64), (configurations,))
+    charge_limit = np.broadcast_to(np.asarray(capacity if charge_power is None else charge_power, dtype = np.float64), (configurations,))
+    discharge_limit = np.broadcast_to(np.asarray(capacity if discharge_power is None else discharge_power, dtype = np.float64), (configurations,))
+    if (capacity < 0).any() or (charge_limit < 0).any() or (discharge_limit < 0).any():
+        raise ValueError("Capacitatea si puterile bateriei trebuie sa fie pozitive.")
+    if not 0 < efficiency <= 1:
+        raise ValueError("Randamentul bateriei trebuie sa fie in (0, 1].")
+
+    eta = np.sqrt(efficiency)
+    surplus = np.ascontiguousarray((production - consumption).T)  # (ore x configuratii): un rand pe pas
+
+    soc = np.zeros(configurations)
+    charged = np.zeros(configurations)
+    discharged = np.zeros(configurations)
+    charge = np.empty(configurations)
+    discharge = np.empty(configurations)
+
+    for step in surplus:
+        np.clip(step, 0, charge_limit, out = charge)
+        np.minimum(charge, (capacity - soc) / eta, out = charge)  # Cat mai incape
+        np.clip(-step, 0, discharge_limit, out = discharge)
+        np.minimum(discharge, soc * eta, out = discharge)  # Cat se poate livra
+
+        soc += charge * eta - discharge / eta
+        charged += charge
+        discharged += discharge
+
+    return {'charged': charged, 'discharged': discharged, 'final_soc': soc}
+
 class Indicators(EnergyProcessing):
     def __init__(self, house_id):
         super().__init__(house_id)
         self.SC = 0
         self.SS = 0
         self.NPV = 0
-        self.NEEG = 0  
+        self.NEEG = 0
+        self.alignment = None # Indicii orelor comune productie / consum, refolositi cat timp orele nu se schimba
+        self.running = None # Totalurile pe orele comune, actualizate la ingestie fara recalcul pe tot istoricul
 
     def is_production_available(self):
         if not self.production:
-            print("Productia nu este disponibila.")
+            instrument.log("Productia nu este disponibila.")
             return False
         return True
 
     def is_consumption_available(self):
         if not self.consumption:
-            print("Consumul nu este disponibil.")
+            instrument.log("Consumul nu este disponibil.")
             return False
         return True
 
-    def calculate_indicator(self, indicator_type): # Calculeaza SS sau SC, se dau ca parametru in functie
+    def aligned_arrays(self):  # Productia si consumul pe orele comune, ca array-uri
+        prod_times, prod_values = self.get_arrays('production')
+        cons_times, cons_values = self.get_arrays('consumption')
+
+        if self.alignment is None or self.alignment[0] is not prod_times or self.alignment[1] is not cons_times:
+            _, prod_index, cons_index = np.intersect1d(prod_times, cons_times, assume_unique = True, return_indices = True)
+            self.alignment = (prod_times, cons_times, prod_index, cons_index)
+
+        return prod_values[self.alignment[2]], cons_values[self.alignment[3]]
+
+    @instrument.profiled("indicators.calculate_indicators")
+    def calculate_indicators(self, Cwp = 0.11, Pm = 575, n = 1, Y = 20, r = 0.05, price_per_kWh = 0.2):  # Toti indicatorii dintr-o singura trecere
         if not self.is_production_available() or not self.is_consumption_available():
-            return 0
+            return None
+
+        production, consumption = self.aligned_arrays()
+        return compute_indicators(production, consumption, Cwp = Cwp, Pm = Pm, n = n, Y = Y, r = r, price_per_kWh = price_per_kWh)
+
+    def set_series(self, name, times, values):  # O serie recalculata complet invalideaza totalurile curente
+        if name in ('production', 'consumption'):
+            self.running = None
+        return super().set_series(name, times, values)
 
-        numerator = 0
-        denominator = 0
+    def update_series(self, name, updates):  # Scadem contributia veche a orelor atinse si o adaugam pe cea noua
+        if self.running is None or name not in ('production', 'consumption'):
+            return super().update_series(name, updates)
 
-        common_times = set(self.production.keys()) & set(self.consumption.keys())
+        self.add_contributions(updates, -1)
+        super().update_series(name, updates)
+        self.add_contributions(updates, 1)
 
-        for t in common_times:
-            prod = self.production[t]
-            cons = self.consumption[t]
-            numerator += min(prod, cons)
+    def add_contributions(self, hours, sign):  # Contributia unor ore la totaluri (doar orele cu productie si consum)
+        running = self.running
+        for hour in hours:
+            production = self.production.get(hour)
+            consumption = self.consumption.get(hour)
+            if production is None or consumption is None:
+                continue
 
-            if indicator_type == "SC":
-                denominator += prod
-            elif indicator_type == "SS":
-                denominator += cons
+            running['total_production'] += sign * production
+            running['total_consumption'] += sign * consumption
+            running['total_self_consumption'] += sign * min(production, consumption)
+            running['NEEG'] += sign * abs(production - consumption)
+            running['hours'] += sign
 
-        if denominator == 0:
-            print(str(indicator_type) + ": Numitorul este 0. Nu poate fi calculat.")
+    def running_totals(self):  # Calculate o singura data din istoric, apoi doar actualizate la ingestie
+        if self.running is None:
+            production, consumption = self.aligned_arrays()
+            self.running = {
+                'total_production': float(production.sum()),
+                'total_consumption': float(consumption.sum()),
+                'total_self_consumption': float(np.minimum(production, consumption).sum()),
+                'NEEG': float(np.abs(production - consumption).sum()),
+                'hours': len(production),
+            }
+        return self.running
+
+    @instrument.profiled("indicators.running_indicators")
+    def running_indicators(self, Cwp = 0.11, Pm = 575, n = 1, Y = 20, r = 0.05, price_per_kWh = 0.2):  # Indicatorii din totalurile curente, in timp constant
+        if not self.is_production_available() or not self.is_consumption_available():
+            return None
+
+        totals = self.running_totals()
+        result = {
+            'SS': totals['total_self_consumption'] / totals['total_consumption'] if totals['total_consumption'] != 0 else 0.0,
+            'SC': totals['total_self_consumption'] / totals['total_production'] if totals['total_production'] != 0 else 0.0,
+            'NEEG': totals['NEEG'],
+            'NPV': None,
+            'total_production': totals['total_production'],
+            'total_consumption': totals['total_consumption'],
+            'total_self_consumption': totals['total_self_consumption'],
+            'hours': totals['hours'],
+        }
+
+        if totals['hours']:
+            result['NPV'] = npv_from_totals(totals['total_consumption'], totals['total_self_consumption'], totals['hours'],
+                                            Cwp = Cwp, Pm = Pm, n = n, Y = Y, r = r, price_per_kWh = price_per_kWh)
+            self.NPV = result['NPV']
+
+        self.SS = result['SS']
+        self.SC = result['SC']
+        self.NEEG = result['NEEG']
+        return result
+
+    def calculate_indicator(self, indicator_type): # Calculeaza SS sau SC, se dau ca parametru in functie
+        result = self.calculate_indicators()
+        if result is None:
+            return 0
+
+        denominator = result['total_production'] if indicator_type == "SC" else result['total_consumption']
+
+        if indicator_type not in ("SS", "SC") or denominator == 0:
+            instrument.log(str(indicator_type) + ": Numitorul este 0. Nu poate fi calculat.")
             setattr(self, indicator_type, 0)
             return 0
 
-        value = numerator / denominator
+        value = result[indicator_type]
         setattr(self, indicator_type, value)
-        print(str(indicator_type) + ": " + str(round(value, 3)))
+        instrument.log(str(indicator_type) + ": " + str(round(value, 3)))
         return value
 
     def calculate_NEEG(self): # Calculul NEEG
-        if not self.is_production_available() or not self.is_consumption_available():
+        result = self.calculate_indicators()
+        if result is None:
             return
-        
-        imported_energy = 0
-        exported_energy = 0
-        
-        common_times = set(self.production.keys()) & set(self.consumption.keys())
-
-        for t in common_times:
-            prod = self.production[t]
-            cons = self.consumption[t]
-            
-            if cons > prod:
-                imported_energy += (cons - prod)
-            elif prod > cons:
-                exported_energy += (prod - cons)
-
-        self.NEEG = imported_energy + exported_energy
-
-        print("NEEG: " + str(round(self.NEEG, 3)) + " kWh")
+
+        self.NEEG = result['NEEG']
+
+        instrument.log("NEEG: " + str(round(self.NEEG, 3)) + " kWh")
         return self.NEEG
 
     def calculate_NPV(self, Cwp = 0.11, Pm = 575, n = 1, Y = 20, r = 0.05, price_per_kWh = 0.2): # Calculul NPV
+        result = self.calculate_indicators(Cwp = Cwp, Pm = Pm, n = n, Y = Y, r = r, price_per_kWh = price_per_kWh)
+        if result is None:
+            return
+
+        if result['NPV'] is None:
+            instrument.log("Nu exista date comune pentru calculul NPV.")
+            return 0
 
+        self.NPV = result['NPV']
+        instrument.log("NPV: " + str(round(self.NPV, 3)))
+        return self.NPV
+
+    @instrument.profiled("indicators.simulate_battery")
+    def simulate_battery(self, capacity = 5.0, n = None, charge_power = None, discharge_power = None, efficiency = 0.9,
+                            Cwp = 0.11, Pm = 575, Y = 20, r = 0.05, price_per_kWh = 0.2, battery_cost_per_kWh = 300.0):
+        # SS, SC, NEEG si NPV cu baterie, pentru toate combinatiile capacitate (kWh) x numar de panouri.
+        # n = None pastreaza productia curenta (get_power_estimated); pentru alt n productia e recalculata din radiatie
+        # (productia unui panou inmultita cu n), cu Pm, f si GTSTC de la ultima estimare. Argumentul Pm e folosit doar daca
+        # productia nu are parametri; altfel NPV e calculat pentru panoul simulat.
         if not self.is_production_available() or not self.is_consumption_available():
-            return
+            return None
 
-        CapEX = Cwp * Pm * n
-        OpEX = 0.03 * CapEX
+        n_current, panel_Pm, f, GTSTC = self.production_params if self.production_params else (1, Pm, 0.8, 1000)
+        n_values = np.atleast_1d(np.asarray(n_current if n is None else n, dtype = np.float64))
+        capacities = np.atleast_1d(np.asarray(capacity, dtype = np.float64))
 
-        common_times = set(self.production.keys()) & set(self.consumption.keys())
-        
-        if not common_times:
-            print("Nu exista date comune pentru calculul NPV.")
-            return 0
-        
-        # Calculam energiile pentru perioada disponibila
-        total_consumption = sum(self.consumption[t] for t in common_times)
-        total_self_consumption = sum(min(self.production[t], self.consumption[t]) for t in common_times)
-        
-        # Extindem pe un an intreg (8760 ore)
-        hours_available = len(common_times)
-        annual_consumption = (total_consumption / hours_available) * 8760
-        annual_self_consumption = (total_self_consumption / hours_available) * 8760
-
-        # Factura fara PV
-        B_ref = annual_consumption * price_per_kWh
-
-        # Factura cu PV
-        energy_from_grid = max(0, annual_consumption - annual_self_consumption)
-        B_new = energy_from_grid * price_per_kWh
-
-        # Castig anual
-        G = B_ref - B_new
-
-        # NPV
-        npv = -CapEX
-        for t in range(1, Y + 1):
-            npv += (G - OpEX) / ((1 + r) ** t)
-
-        self.NPV = npv
-        print("NPV: " + str(round(self.NPV, 3)))
-        return self.NPV
\ No newline at end of file
+        # Configuratiile: fiecare capacitate cu fiecare numar de panouri
+        n_grid, capacity_grid = (values.ravel() for values in np.meshgrid(n_values, capacities, indexing = 'ij'))
+
+        if n is None:
+            production, consumption = self.aligned_arrays()
+            production = np.tile(production, (len(n_grid), 1))
+        else:
+            if not self.solar_radiation:
+                raise ValueError("Radiatia solara nu este incarcata; productia pentru alt numar de panouri nu poate fi calculata.")
+
+            rad_times, radiation = self.get_arrays('solar_radiation')
+            cons_times, consumption = self.get_arrays('consumption')
+            _, rad_index, cons_index = np.intersect1d(rad_times, cons_times, assume_unique = True, return_indices = True)
+            panel = panel_Pm * f * radiation[rad_index] / GTSTC / 6000  # W*10min -> kWh, aceeasi formula ca get_power_estimated
+            production = n_grid[:, None] * panel[None, :]
+            consumption = consumption[cons_index]
+
+        def per_capacity(power):  # Puterile pot fi date pe capacitate (aceeasi ordine ca `capacity`)
+            if power is None or np.ndim(power) == 0:
+                return power
+            return np.tile(np.asarray(power, dtype = np.float64), len(n_values))
+
+        battery = battery_dispatch(production, consumption, capacity_grid, per_capacity(charge_power),
+                                   per_capacity(discharge_power), efficiency)
+
+        direct = np.minimum(production, consumption).sum(axis = -1)  # Autoconsum fara baterie
+        total_production = production.sum(axis = -1)
+        total_consumption = consumption.sum()
+        total_self_consumption = direct + battery['discharged']
+        grid_import = total_consumption - total_self_consumption
+        grid_export = total_production - direct - battery['charged']
+
+        hours = production.shape[-1]
+        return pd.DataFrame({
+            'capacity': capacity_grid,
+            'n': n_grid,
+            'SS': total_self_consumption / total_consumption if total_consumption else np.zeros(len(n_grid)),
+            'SC': np.divide(total_production - grid_export, total_production, out = np.zeros(len(n_grid)),
+                            where = total_production != 0),
+            'NEEG': grid_import + grid_export,
+            'NPV': npv_from_totals(total_consumption, total_self_consumption, hours, Cwp = Cwp, Pm = panel_Pm, n = n_grid, Y = Y,
+                                   r = r, price_per_kWh = price_per_kWh, extra_capex = battery_cost_per_kWh * capacity_grid),
+            'charged': battery['charged'],
+            'discharged': battery['discharged'],
+            'import': grid_import,
+            'export': grid_export,
+        })
@@ -0,0 +1,173 @@
+import os
+import csv
+import json
+import time
+import threading
+import functools
+import tracemalloc
+from contextlib import contextmanager
+
+########## Instrumentare: timp, numar de apeluri si memorie pe etape ##########
+
+# Etapele (incarcare, curatare, consum, radiatie, indicatori, optimizare, plotare) sunt marcate cu
+# @profiled("nume") sau cu `with stage("nume"):`. Cat timp ENABLED este False, decoratorul doar apeleaza
+# functia (o verificare de variabila globala), deci costul este neglijabil.
+# Cu enable() se aduna pe etapa: apeluri, timp total / minim / maxim si, optional (trace_memory = True),
+# varful de memorie alocata in etapa (tracemalloc). Rezultatele se exporta in JSON, CSV sau Chrome trace
+# (chrome://tracing sau https://ui.perfetto.dev).
+# Mesajele per apel ale claselor (rezultate, avertismente) trec prin log(), tacut implicit.
+
+ENABLED = False
+TRACE_MEMORY = False
+VERBOSE = False  # log() afiseaza mesajele doar daca este True
+MAX_EVENTS = 1_000_000  # Limita evenimentelor pastrate pentru Chrome trace
+
+stats = {}  # etapa -> {'calls', 'total', 'min', 'max', 'peak_bytes'}
+events = []  # (etapa, start in ns, durata in ns, pid, thread)
+local = threading.local()
+
+def log(message):  # Inlocuieste print() in codul apelat des
+    if VERBOSE:
+        print(message)
+
+def enable(trace_memory = False):
+    global ENABLED, TRACE_MEMORY
+    ENABLED = True
+    TRACE_MEMORY = trace_memory
+    if trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+def disable():
+    global ENABLED, TRACE_MEMORY
+    ENABLED = False
+    if TRACE_MEMORY and tracemalloc.is_tracing():
+        tracemalloc.stop()
+    TRACE_MEMORY = False
+
+def reset():
+    stats.clear()
+    events.clear()
+
+def memory_stack():
+    if not hasattr(local, 'stack'):
+        local.stack = []
+    return local.stack
+
+def record(name, start, duration, peak_bytes = None):
+    entry = stats.get(name)
+    if entry is None:
+        entry = stats[name] = {'calls': 0, 'total': 0.0, 'min': float('inf'), 'max': 0.0, 'peak_bytes': 0}
+
+    seconds = duration / 1e9
+    entry['calls'] += 1
+    entry['total'] += seconds
+    entry['min'] = min(entry['min'], seconds)
+    entry['max'] = max(entry['max'], seconds)
+    if peak_bytes is not None:
+        entry['peak_bytes'] = max(entry['peak_bytes'], peak_bytes)
+
+    if len(events) < MAX_EVENTS:
+        events.append((name, start, duration, os.getpid(), threading.get_ident()))
+
+@contextmanager
+def stage(name):  # Masoara un bloc de cod ca etapa `name`
+    if not ENABLED:
+        yield
+        return
+
+    tracing = TRACE_MEMORY and tracemalloc.is_tracing()
+    if tracing:
+        # Varful global e resetat la intrarea in etapa; varful etapelor interioare e pastrat pe stiva
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        memory_stack().append([current, 0])
+
+    start = time.perf_counter_ns()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter_ns() - start
+        peak_bytes = None
+
+        if tracing:
+            base, inner_peak = memory_stack().pop()
+            peak = max(tracemalloc.get_traced_memory()[1], inner_peak)
+            peak_bytes = peak - base
+            if memory_stack():
+                memory_stack()[-1][1] = max(memory_stack()[-1][1], peak)
+
+        record(name, start, duration, peak_bytes)
+
+def profiled(name = None):  # Decorator: functia este masurata ca etapa `name` cand instrumentarea e activa
+    def decorator(function):
+        label = name or function.__module__ + "." + function.__qualname__
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return function(*args, **kwargs)
+            with stage(label):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def snapshot():  # Starea curenta (pentru a fi trimisa dintr-un proces worker)
+    return {'stats': {k: dict(v) for k, v in stats.items()}, 'events': list(events)}
+
+def merge(other):  # Adauga rezultatele unui alt proces
+    for name, entry in other['stats'].items():
+        current = stats.get(name)
+        if current is None:
+            stats[name] = dict(entry)
+            continue
+        current['calls'] += entry['calls']
+        current['total'] += entry['total']
+        current['min'] = min(current['min'], entry['min'])
+        current['max'] = max(current['max'], entry['max'])
+        current['peak_bytes'] = max(current['peak_bytes'], entry['peak_bytes'])
+
+    events.extend(other['events'][:max(0, MAX_EVENTS - len(events))])
+
+def rows():  # Etapele ordonate dupa timpul total
+    result = []
+    for name, entry in sorted(stats.items(), key = lambda item: -item[1]['total']):
+        result.append({
+            'stage': name,
+            'calls': entry['calls'],
+            'total_s': entry['total'],
+            'mean_s': entry['total'] / entry['calls'] if entry['calls'] else 0.0,
+            'min_s': entry['min'] if entry['calls'] else 0.0,
+            'max_s': entry['max'],
+            'peak_mb': entry['peak_bytes'] / 1024 ** 2,
+        })
+    return result
+
+def report(limit = 30):  # Tabel cu cele mai costisitoare etape
+    print("Etapa".ljust(45) + "apeluri".rjust(10) + "total (s)".rjust(12) + "medie (ms)".rjust(12) + "varf (MB)".rjust(11))
+    for row in rows()[:limit]:
+        print(row['stage'][:44].ljust(45) + str(row['calls']).rjust(10) + str(round(row['total_s'], 4)).rjust(12) +
+              str(round(row['mean_s'] * 1000, 3)).rjust(12) + str(round(row['peak_mb'], 1)).rjust(11))
+
+def export_json(path):
+    with open(path, "w") as fh:
+        json.dump({'stats': rows(), 'trace_memory': TRACE_MEMORY}, fh, indent = 2)
+
+def export_csv(path):
+    with open(path, "w", newline = "") as fh:
+        writer = csv.DictWriter(fh, fieldnames = ['stage', 'calls', 'total_s', 'mean_s', 'min_s', 'max_s', 'peak_mb'])
+        writer.writeheader()
+        writer.writerows(rows())
+
+def export_chrome_trace(path):  # Format "Trace Event": un eveniment complet (ph = X) pe apel, in microsecunde
+    trace = [{'name': name, 'cat': name.split(".")[0], 'ph': "X", 'ts': start / 1000, 'dur': duration / 1000,
+              'pid': pid, 'tid': tid} for name, start, duration, pid, tid in events]
+    with open(path, "w") as fh:
+        json.dump({'traceEvents': trace, 'displayTimeUnit': "ms"}, fh)
+
+def export(path):  # Formatul dupa extensie: .json, .csv sau .trace.json (Chrome trace)
+    if path.endswith(".trace.json"):
+        export_chrome_trace(path)
+    elif path.endswith(".csv"):
+        export_csv(path)
+    else:
+        export_json(path)
@@ -0,0 +1,182 @@
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+import dataset
+import instrument
+from indicators import compute_indicators
+
+########## Mutarea consumatorilor flexibili in orele cu productie solara ##########
+
+# Aparatele flexibile sunt recunoscute dupa nume (TypeIDREF din Appliance.csv nu e consecvent intre case).
+# Pe profilul de 10 minute al fiecarui aparat se detecteaza ciclurile de functionare (pasi peste un prag,
+# cu pauze scurte permise), apoi fiecare ciclu e mutat in fereastra permisa a zilei lui, la ora in care
+# consuma cel mai mult din surplusul de productie ramas. Scorul tuturor pozitiilor candidate se calculeaza
+# deodata, ca o corelatie a profilului ciclului cu surplusul (fereastra glisanta peste curba de productie).
+# Ciclurile din zile diferite nu se influenteaza, deci sunt plasate in loturi: toate ciclurile cu acelasi rang
+# in ziua lor sunt plasate simultan; in aceeasi zi ciclurile mari sunt plasate primele.
+# SS, SC si NEEG inainte / dupa sunt calculate pe aceeasi grila de 10 minute ca plasarea (pasii cu productie din
+# perioada cu masuratori de consum), nu pe orele din calculate_indicators: acolo consumul orar e pus langa un singur
+# pas de productie pe ora, iar castigul mutarii s-ar putea sa nu se vada.
+
+SHIFTABLE_APPLIANCES = ('washing machine', 'dish washer', 'clothes drier', 'clothes dryer', 'water heater')
+SLOT = 600  # Pas de 10 minute
+SLOTS_PER_HOUR = 3600 // SLOT
+SLOTS_PER_DAY = 86400 // SLOT
+
+def shiftable_appliances(house_id, names = SHIFTABLE_APPLIANCES):  # ID-urile si numele aparatelor flexibile ale casei
+    df_appliance = dataset.read_table('Appliance')
+    df_appliance = df_appliance[df_appliance['HouseIDREF'] == house_id]
+    lowered = df_appliance['Name'].str.lower()
+    return df_appliance[lowered.apply(lambda name: any(name.startswith(prefix) for prefix in names))][['ID', 'Name']]
+
+def detect_cycles(appliance_ids, slots, values, threshold = 20, max_gap = 2, min_energy = 0.05, max_length = 6 * SLOTS_PER_HOUR):
+    # Ciclurile tuturor aparatelor deodata. slots: EpochTime // 600; values: W / 10 min.
+    # Un ciclu nou incepe la schimbarea aparatului sau dupa mai mult de max_gap pasi sub prag.
+    on = values > threshold
+    appliance_ids, slots, values = appliance_ids[on], slots[on], values[on]
+    order = np.lexsort((slots, appliance_ids))
+    appliance_ids, slots, energy = appliance_ids[order], slots[order], values[order] / 6000  # kWh pe pas
+
+    if len(slots) == 0:
+        return pd.DataFrame(columns = ['appliance_id', 'start', 'length', 'energy']), np.zeros((0, 1))
+
+    new_cycle = np.ones(len(slots), dtype = bool)
+    new_cycle[1:] = (appliance_ids[1:] != appliance_ids[:-1]) | (np.diff(slots) > max_gap + 1)
+    first = np.flatnonzero(new_cycle)
+    cycle_of = np.cumsum(new_cycle) - 1
+
+    start = slots[first]
+    length = np.maximum.reduceat(slots, first) - start + 1
+    cycle_energy = np.add.reduceat(energy, first)
+
+    # Profilul fiecarui ciclu pe pasii lui (cu zerouri in pauze), ca matrice cicluri x lungime maxima
+    keep = (cycle_energy >= min_energy) & (length <= max_length)
+    profiles = np.zeros((len(first), int(length[keep].max()) if keep.any() else 1))
+    in_kept = keep[cycle_of]
+    profiles[cycle_of[in_kept], (slots - start[cycle_of])[in_kept]] = energy[in_kept]
+
+    cycles = pd.DataFrame({'appliance_id': appliance_ids[first], 'start': start, 'length': length, 'energy': cycle_energy})
+    return cycles[keep].reset_index(drop = True), profiles[keep]
+
+def slot_series(epochs, values, first_slot, count):  # Valori pe pasi de 10 minute, ca array dens
+    return np.bincount((np.asarray(epochs) // SLOT - first_slot).astype(np.int64), weights = values, minlength = count)[:count]
+
+def best_starts(surplus, profiles, low, high):  # Pozitia cu cel mai mare autoconsum pentru fiecare ciclu
+    # Candidatii fiecarui ciclu sunt low..high; scorul e suma min(profil, surplus) pe pasii ciclului
+    width = int((high - low).max()) + 1
+    span = width + profiles.shape[1] - 1
+    index = np.minimum(low[:, None] + np.arange(span), len(surplus) - 1)
+
+    windows = sliding_window_view(surplus[index], profiles.shape[1], axis = 1)  # cicluri x candidati x pasi
+    scores = np.minimum(windows, profiles[:, None, :]).sum(axis = -1)
+    scores[np.arange(width)[None, :] > (high - low)[:, None]] = -np.inf
+
+    best = np.argmax(scores, axis = 1)
+    return low + best, scores[np.arange(len(low)), best]
+
+@instrument.profiled("load_shifting.shift_loads")
+def shift_loads(indicator_obj, window = (8, 20), max_shift_hours = 12, threshold = 20, max_gap = 2, min_energy = 0.05,
+                    max_cycle_hours = 6, names = SHIFTABLE_APPLIANCES):
+    # Reprogrameaza ciclurile aparatelor flexibile in intervalul orar `window` (UTC) al zilei lor, cel mult
+    # max_shift_hours fata de ora initiala. Productia e cea din get_power_estimated (apelat inainte).
+    if not indicator_obj.production:
+        raise ValueError("Productia nu este calculata (get_power_estimated).")
+
+    df = dataset.house_consumption(indicator_obj.house_id, columns = ['ApplianceIDREF', 'EpochTime', 'Value'])
+    if df.empty:
+        raise ValueError("Casa " + str(indicator_obj.house_id) + " nu are date de consum.")
+
+    epochs = df['EpochTime'].to_numpy(np.int64)
+    values = df['Value'].to_numpy(np.float64)
+    appliance_ids = df['ApplianceIDREF'].to_numpy(np.int64)
+
+    # Grila de 10 minute, pe zile intregi (UTC)
+    first_slot = (int(epochs.min()) // 86400) * SLOTS_PER_DAY
+    count = ((int(epochs.max()) // SLOT - first_slot) // SLOTS_PER_DAY + 1) * SLOTS_PER_DAY
+    load = slot_series(epochs, values / 6000, first_slot, count)
+    load_before = load.copy()
+
+    # Productia are pasii radiatiei (10 minute), in kWh pe pas
+    prod_times, prod_values = indicator_obj.get_arrays('production')
+    prod_slots = prod_times // SLOT - first_slot
+    in_range = (prod_slots >= 0) & (prod_slots < count)
+    production = slot_series(prod_times[in_range], prod_values[in_range], first_slot, count)
+
+    # Pasii evaluati: cei cu productie, intre prima si ultima masuratoare de consum
+    evaluated = np.zeros(count, dtype = bool)
+    evaluated[prod_slots[in_range]] = True
+    evaluated[:int(epochs.min()) // SLOT - first_slot] = False
+    evaluated[int(epochs.max()) // SLOT - first_slot + 1:] = False
+
+    # Ciclurile aparatelor flexibile sunt scoase din consum si apoi plasate din nou
+    appliances = shiftable_appliances(indicator_obj.house_id, names)
+    flexible = np.isin(appliance_ids, appliances['ID'].to_numpy())
+    cycles, profiles = detect_cycles(appliance_ids[flexible], epochs[flexible] // SLOT - first_slot, values[flexible],
+                                     threshold, max_gap, min_energy, max_cycle_hours * SLOTS_PER_HOUR)
+
+    starts = cycles['start'].to_numpy(np.int64)
+    lengths = cycles['length'].to_numpy(np.int64)
+    positions = starts[:, None] + np.arange(profiles.shape[1])
+    inside = positions < count
+    np.subtract.at(load, positions[inside], profiles[inside])
+    load = np.maximum(load, 0)  # Erori de rotunjire
+
+    # Fereastra permisa: in ziua ciclului, intre orele din `window`, la cel mult max_shift_hours distanta
+    day_start = starts // SLOTS_PER_DAY * SLOTS_PER_DAY
+    max_shift = max_shift_hours * SLOTS_PER_HOUR
+    low = np.maximum(day_start + window[0] * SLOTS_PER_HOUR, starts - max_shift)
+    high = np.minimum(day_start + window[1] * SLOTS_PER_HOUR - lengths, starts + max_shift)
+    movable = high >= low
+
+    new_starts = starts.copy()
+    gains = np.zeros(len(starts))
+    rank = cycles.assign(day = day_start).sort_values(['day', 'energy'], ascending = [True, False]).groupby('day').cumcount()
+    rank = rank.sort_index().to_numpy()
+
+    for level in range(int(rank.max()) + 1 if len(rank) else 0):
+        batch = np.flatnonzero(rank == level)
+        surplus = np.maximum(production - load, 0)
+
+        # Scorul pozitiei initiale; ciclul e mutat doar daca o pozitie din fereastra e mai buna
+        original = np.minimum(surplus[np.minimum(positions[batch], count - 1)], profiles[batch]).sum(axis = 1)
+        chosen = starts[batch].copy()
+        can_move = batch[movable[batch]]
+        if len(can_move):
+            best, score = best_starts(surplus, profiles[can_move], low[can_move], high[can_move])
+            better = score > original[movable[batch]] + 1e-12
+            chosen[movable[batch]] = np.where(better, best, starts[can_move])
+            gains[can_move] = np.where(better, score - original[movable[batch]], 0.0)
+
+        new_starts[batch] = chosen
+        placed = chosen[:, None] + np.arange(profiles.shape[1])
+        fits = placed < count
+        np.add.at(load, placed[fits], profiles[batch][fits])
+
+    # Indicatorii inainte / dupa, pe grila de 10 minute a plasarii
+    before = compute_indicators(production[evaluated], load_before[evaluated])
+    after = compute_indicators(production[evaluated], load[evaluated])
+
+    # Consumul orar dupa mutare, pe orele comune productie / consum (ca in calculate_indicators)
+    common = np.intersect1d(prod_times, indicator_obj.get_arrays('consumption')[0], assume_unique = True)
+    hourly_load = load.reshape(-1, SLOTS_PER_HOUR).sum(axis = 1)
+    consumption_after = hourly_load[(common // 3600 - first_slot // SLOTS_PER_HOUR).astype(np.int64)]
+
+    cycles = cycles.assign(
+        name = cycles['appliance_id'].map(appliances.set_index('ID')['Name'].astype(str)),
+        start_epoch = (starts + first_slot) * SLOT,
+        new_start_epoch = (new_starts + first_slot) * SLOT,
+        shifted = new_starts != starts,
+        gain_kWh = gains,
+    ).drop(columns = ['start'])
+
+    summary = {
+        'cycles': len(cycles),
+        'shifted': int(cycles['shifted'].sum()),
+        'shifted_energy': float(cycles.loc[cycles['shifted'], 'energy'].sum()),
+        'SS_before': before['SS'], 'SC_before': before['SC'], 'NEEG_before': before['NEEG'],
+        'SS_after': after['SS'], 'SC_after': after['SC'], 'NEEG_after': after['NEEG'],
+    }
+    instrument.log("Cicluri mutate: " + str(summary['shifted']) + " din " + str(summary['cycles']) + ", SS " +
+                   str(round(before['SS'], 3)) + " -> " + str(round(after['SS'], 3)) + ", SC " + str(round(before['SC'], 3)) +
+                   " -> " + str(round(after['SC'], 3)))
+    return {'summary': summary, 'cycles': cycles, 'consumption': dict(zip(common.tolist(), consumption_after.tolist()))}
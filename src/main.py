@@ -1,45 +1,299 @@
-from house import House
-import clean
-import plot
-from energy_processing import EnergyProcessing
-from indicators import Indicators
-import optimize
-
-h = House(2000938)
-
-# Curatare date
-# clean.clean_files()
-
-indicator = Indicators(h.house_id)
-
-# Obtinerea inndicatorilor
-indicator.get_consumption()
-indicator.get_solar_radiation()
-indicator.get_power_estimated()
-# indicator.print_consumption()
-# indicator.print_solar_radiation()
-# indicator.print_power_estimated()
-
-indicator.calculate_indicator("SS")
-indicator.calculate_indicator("SC")
-indicator.calculate_NEEG()
-indicator.calculate_NPV()
-
-# Plotari
-plot.plot_10min_consumption_for_day(h, "1998-03-20")
-plot.plot_hourly_consumption_for_day(h, "1998-03-20")
-plot.plot_daily_consumption_in_a_year(h)
-plot.plot_appliance_hourly_consumption_for_day(h, "Fridge (220l)", "1998-03-20")
-plot.plot_hourly_production_for_day(indicator, "1998-03-20") # Trebuie apelat cu indicator pentru ca altfel nu imi vede productia din cauza mostenirii
-plot.plot_hourly_consumption_and_production_for_day(indicator, "1998-03-20")
-
-# Optimizare
-res = optimize.optimize_panels_max_ss_sc(indicator_obj = indicator, seed = 42)
-result_ss = optimize.optimize_panels_max_ss(indicator)
-result_sc = optimize.optimize_panels_max_sc(indicator)
-result_min_neeg = optimize.optimize_panels_min_neeg(indicator)
-
-print("Rezultat maximizare SS si SC:", res)
-print("Rezultat maximizare SC:", result_sc)
-print("Rezultat maximizare SS:", result_ss)
-print("Rezultat minimizare NEEG:", result_min_neeg)
\ No newline at end of file
+import os
+import sys
+import json
+import time
+import argparse
+import importlib
+import contextlib
+import instrument
+
+########## Linia de comanda: clean, indicators, optimize, plot, batch, import-sqlite ##########
+
+# Exemple (din directorul proiectului):
+#   python src/main.py clean
+#   python src/main.py indicators 2000938 --n 10 --json Results/indicatori.json
+#   python src/main.py optimize 2000938 --objective neeg --method exact
+#   python src/main.py optimize 2000938 --objective npv --Pm-range 300 700 --f-range 0.7 0.9
+#   python src/main.py plot 2000938 --date 1998-03-20 --plots hourly production
+#   python src/main.py --profile Results/profil.trace.json batch --workers 4
+#   python src/main.py import-sqlite && python src/main.py --sqlite clean
+# Modulele grele (pandas, plotly, scipy) sunt importate doar de subcomenzile care le folosesc:
+# `indicators` nu incarca plotly sau scipy. Timpul de pornire e verificat cu benchmark.check_startup().
+
+COMMAND_MODULES = {  # Subcomanda -> modulele importate inainte de rulare
+    'clean': ['clean'],
+    'indicators': ['indicators'],
+    'optimize': ['indicators', 'optimize'],
+    'plot': ['indicators', 'plot'],
+    'batch': ['batch'],
+    'import-sqlite': ['sqlite_store'],
+}
+HEAVY_MODULES = ['pandas', 'pyarrow', 'scipy', 'plotly']
+PLOT_KINDS = ['10min', 'hourly', 'daily', 'appliance', 'production', 'consumption_production']
+
+def to_json(value):  # Scalarii / array-urile numpy nu sunt serializabili direct
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    raise TypeError("Valoare neserializabila in JSON: " + type(value).__name__)
+
+def write_json(result, path):  # "-" inseamna stdout
+    if path == "-":
+        json.dump(result, sys.stdout, indent = 2, default = to_json)
+        print()
+        return
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok = True)
+    with open(path, "w") as fh:
+        json.dump(result, fh, indent = 2, default = to_json)
+    print("Rezultate scrise in " + path, file = sys.stderr)
+
+def house_ids(args):  # Casele date ca argumente, altfel toate casele din House.csv
+    if args.houses:
+        return args.houses
+
+    import dataset
+    return dataset.read_table('House')['ID'].astype(int).tolist()
+
+def load_house(house_id, production = False, n = 10, Pm = 575, f = 0.8):  # Indicators cu consumul (si productia) incarcate
+    from indicators import Indicators
+
+    indicator = Indicators(house_id)
+    indicator.get_consumption()
+    if production:
+        indicator.get_solar_radiation()
+        indicator.get_power_estimated(n, Pm = Pm, f = f)
+    return indicator
+
+def run_clean(args):
+    import clean
+    import dataset
+
+    start_time = time.perf_counter()
+    clean.clean_files(streaming = not args.in_memory, chunksize = args.chunksize)
+    return {'houses': len(dataset.read_table('House')), 'seconds': time.perf_counter() - start_time}
+
+def run_indicators(args):
+    results = []
+    for house_id in house_ids(args):
+        indicator = load_house(house_id, True, args.n, args.Pm, args.f)
+        if not indicator.production or not indicator.consumption:
+            results.append({'house_id': house_id, 'error': "Lipsesc datele de consum sau de radiatie."})
+            continue
+
+        values = indicator.calculate_indicators(Cwp = args.Cwp, Pm = args.Pm, n = args.n, Y = args.Y, r = args.r,
+                                                price_per_kWh = args.price)
+        results.append(dict({'house_id': house_id, 'n': args.n}, **values))
+
+        npv = "-" if values['NPV'] is None else str(round(values['NPV'], 2))  # None: fara ore comune productie / consum
+        instrument.log("Casa " + str(house_id) + ": SS = " + str(round(values['SS'], 4)) + ", SC = " + str(round(values['SC'], 4)) +
+                       ", NEEG = " + str(round(values['NEEG'], 2)) + " kWh, NPV = " + npv)
+    return results
+
+def run_optimize(args):
+    import optimize
+
+    functions = {
+        'ss_sc': optimize.optimize_panels_max_ss_sc,
+        'ss': optimize.optimize_panels_max_ss,
+        'sc': optimize.optimize_panels_max_sc,
+        'neeg': optimize.optimize_panels_min_neeg,
+    }
+    options = {'n_min': args.n_min, 'n_max': args.n_max, 'Pm': args.Pm, 'f': args.f, 'maxiter': args.maxiter,
+               'popsize': args.popsize, 'seed': args.seed, 'disp': args.verbose, 'method': args.method}
+    if args.objective == 'ss_sc':
+        options.update(w_sc = args.w_sc, w_ss = args.w_ss)
+
+    sizing = args.objective == 'npv' or bool(args.Pm_range) or bool(args.f_range)  # Dimensionare pe mai multe variabile, mereu cu DE
+    if sizing and args.method == "exact":
+        raise ValueError("--method exact nu e disponibil pentru npv, --Pm-range sau --f-range (dimensionarea foloseste DE).")
+
+    results = []
+    for house_id in house_ids(args):
+        indicator = load_house(house_id)
+        indicator.get_solar_radiation()
+        if not indicator.consumption or not indicator.solar_radiation:
+            results.append({'house_id': house_id, 'error': "Lipsesc datele de consum sau de radiatie."})
+            continue
+
+        if sizing:
+            method = "de"
+            result = optimize.optimize_sizing(indicator, args.objective, n = (args.n_min, args.n_max), Pm = args.Pm_range or args.Pm,
+                                              f = args.f_range or args.f, w_sc = args.w_sc, w_ss = args.w_ss, maxiter = args.maxiter,
+                                              popsize = args.popsize, seed = args.seed, disp = args.verbose, workers = args.workers)
+        else:
+            method = args.method
+            result = functions[args.objective](indicator, **options)
+        results.append(dict({'house_id': house_id, 'objective': args.objective, 'method': method}, **result))
+    return results
+
+def run_plot(args):
+    import plot
+
+    needs_date = {'10min', 'hourly', 'appliance', 'production', 'consumption_production'}
+    if needs_date & set(args.plots) and args.date is None:
+        raise ValueError("Graficele " + ", ".join(sorted(needs_date & set(args.plots))) + " au nevoie de --date.")
+    if 'appliance' in args.plots and args.appliance is None:
+        raise ValueError("Graficul appliance are nevoie de --appliance.")
+
+    production = bool({'production', 'consumption_production'} & set(args.plots))
+    indicator = load_house(args.house, production, args.n)
+    os.makedirs(args.output_dir, exist_ok = True)
+
+    results = []
+    for kind in args.plots:
+        output = os.path.join(args.output_dir, str(args.house) + "_" + kind + ("_" + args.date if kind in needs_date else "") + ".html")
+        options = {'output': output, 'auto_open': args.open, 'show': False}
+
+        if kind == '10min':
+            fig = plot.plot_10min_consumption_for_day(indicator, args.date, **options)
+        elif kind == 'hourly':
+            fig = plot.plot_hourly_consumption_for_day(indicator, args.date, **options)
+        elif kind == 'daily':
+            fig = plot.plot_daily_consumption_in_a_year(indicator, **options)
+        elif kind == 'appliance':
+            fig = plot.plot_appliance_hourly_consumption_for_day(indicator, args.appliance, args.date, **options)
+        elif kind == 'production':
+            fig = plot.plot_hourly_production_for_day(indicator, args.date, **options)
+        else:
+            fig = plot.plot_hourly_consumption_and_production_for_day(indicator, args.date, **options)
+
+        results.append({'plot': kind, 'file': output if fig is not None else None})
+    return results
+
+def run_batch(args):
+    import batch
+
+    results = batch.run_fleet(args.houses or None, workers = args.workers, results_file = args.results, resume = not args.fresh,
+                              n = args.n, n_min = args.n_min, n_max = args.n_max, Pm = args.Pm, f = args.f,
+                              profile = args.profile is not None)
+    return json.loads(results.to_json(orient = "records"))  # NaN devine null
+
+def run_import_sqlite(args):
+    import sqlite_store
+
+    start_time = time.perf_counter()
+    counts = sqlite_store.import_csv(args.database_dir, args.sqlite_file, args.chunksize)
+    return {'tables': counts, 'seconds': time.perf_counter() - start_time}
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog = "main.py", description = "Analiza consumului si optimizarea panourilor solare.")
+    parser.add_argument("--json", metavar = "FISIER", help = "scrie rezultatul in JSON (- pentru stdout)")
+    parser.add_argument("--verbose", action = "store_true", help = "afiseaza mesajele per apel ale claselor")
+    parser.add_argument("--profile", metavar = "FISIER", help = "masoara etapele; .json, .csv sau .trace.json (Chrome trace)")
+    parser.add_argument("--trace-memory", action = "store_true", help = "cu --profile, masoara si varful de memorie pe etapa")
+    parser.add_argument("--sqlite", action = "store_true", help = "citeste si curata datele din baza SQLite (creata cu import-sqlite)")
+    parser.add_argument("--sqlite-file", default = "Database/database.sqlite", metavar = "FISIER", help = "fisierul bazei SQLite")
+    parser.add_argument("--imports-only", action = "store_true", help = "doar importa modulele subcomenzii (timpul de pornire)")
+    commands = parser.add_subparsers(dest = "command", required = True)
+
+    def houses(sub, many = True):
+        if many:
+            sub.add_argument("houses", nargs = "*", type = int, help = "ID-urile caselor (implicit toate)")
+        else:
+            sub.add_argument("house", type = int, help = "ID-ul casei")
+
+    def pv(sub):  # Parametrii panourilor
+        sub.add_argument("--n", type = int, default = 10, help = "numarul de panouri")
+        sub.add_argument("--Pm", type = float, default = 575, help = "puterea unui panou (W)")
+        sub.add_argument("--f", type = float, default = 0.8, help = "factorul de performanta")
+
+    def search(sub):  # Intervalul numarului de panouri
+        sub.add_argument("--n-min", type = int, default = 1)
+        sub.add_argument("--n-max", type = int, default = 40)
+
+    sub = commands.add_parser("clean", help = "curata baza de date si reconstruieste store-ul si agregarile")
+    sub.add_argument("--in-memory", action = "store_true", help = "varianta initiala, cu tabelele incarcate complet")
+    sub.add_argument("--chunksize", type = int, default = 1_000_000, help = "randuri citite odata (curatarea pe flux)")
+    sub.set_defaults(handler = run_clean)
+
+    sub = commands.add_parser("indicators", help = "SS, SC, NEEG si NPV pentru una sau mai multe case")
+    houses(sub)
+    pv(sub)
+    sub.add_argument("--Cwp", type = float, default = 0.11, help = "costul pe W instalat")
+    sub.add_argument("--Y", type = int, default = 20, help = "durata de viata (ani)")
+    sub.add_argument("--r", type = float, default = 0.05, help = "rata de actualizare")
+    sub.add_argument("--price", type = float, default = 0.2, help = "pretul energiei (pe kWh)")
+    sub.set_defaults(handler = run_indicators)
+
+    sub = commands.add_parser("optimize", help = "numarul optim de panouri")
+    houses(sub)
+    pv(sub)
+    search(sub)
+    sub.add_argument("--objective", choices = ["ss_sc", "ss", "sc", "neeg", "npv"], default = "ss_sc")
+    sub.add_argument("--Pm-range", nargs = 2, type = float, metavar = ("MIN", "MAX"), help = "optimizeaza si puterea panoului")
+    sub.add_argument("--f-range", nargs = 2, type = float, metavar = ("MIN", "MAX"), help = "optimizeaza si factorul de performanta")
+    sub.add_argument("--workers", type = int, default = 1, help = "procese pentru evaluarea DE (dimensionare)")
+    sub.add_argument("--method", choices = ["de", "exact"], default = "de")
+    sub.add_argument("--w-sc", type = float, default = 0.5)
+    sub.add_argument("--w-ss", type = float, default = 0.5)
+    sub.add_argument("--maxiter", type = int, default = 40)
+    sub.add_argument("--popsize", type = int, default = 15)
+    sub.add_argument("--seed", type = int, default = None)
+    sub.set_defaults(handler = run_optimize)
+
+    sub = commands.add_parser("plot", help = "graficele unei case, scrise ca HTML")
+    houses(sub, many = False)
+    pv(sub)
+    sub.add_argument("--date", help = "ziua (YYYY-MM-DD) pentru graficele pe zi")
+    sub.add_argument("--plots", nargs = "+", choices = PLOT_KINDS, default = ["10min", "hourly", "daily"])
+    sub.add_argument("--appliance", help = "numele aparatului pentru graficul appliance")
+    sub.add_argument("--output-dir", default = "Plots")
+    sub.add_argument("--open", action = "store_true", help = "deschide graficele in browser")
+    sub.set_defaults(handler = run_plot)
+
+    sub = commands.add_parser("batch", help = "analiza in paralel a tuturor caselor (sau a celor date)")
+    houses(sub)
+    pv(sub)
+    search(sub)
+    sub.add_argument("--workers", type = int, default = None)
+    sub.add_argument("--results", default = "Results/fleet_results.csv")
+    sub.add_argument("--fresh", action = "store_true", help = "ignora rezultatele unei rulari anterioare")
+    sub.set_defaults(handler = run_batch)
+
+    sub = commands.add_parser("import-sqlite", help = "importa CSV-urile din Database/ intr-o baza SQLite indexata")
+    sub.add_argument("--database-dir", default = "Database", help = "directorul cu CSV-uri")
+    sub.add_argument("--chunksize", type = int, default = 1_000_000, help = "randuri citite odata din fiecare CSV")
+    sub.set_defaults(handler = run_import_sqlite)
+
+    return parser
+
+def main(argv = None):
+    args = build_parser().parse_args(argv)
+    instrument.VERBOSE = args.verbose
+
+    start_time = time.perf_counter()
+    for name in COMMAND_MODULES[args.command]:
+        importlib.import_module(name)
+
+    if args.imports_only:  # Folosit de benchmark.check_startup()
+        loaded = sorted(name for name in HEAVY_MODULES if name in sys.modules)
+        write_json({'command': args.command, 'import_seconds': time.perf_counter() - start_time, 'heavy_modules': loaded}, "-")
+        return 0
+
+    if args.profile:
+        instrument.enable(trace_memory = args.trace_memory)
+
+    # Cu --json - rezultatul e singurul text de pe stdout; mesajele merg pe stderr
+    output = contextlib.redirect_stdout(sys.stderr) if args.json == "-" else contextlib.nullcontext()
+    with output:
+        try:
+            if args.sqlite:
+                import sqlite_store
+                sqlite_store.enable(args.sqlite_file)
+            result = args.handler(args)
+        except ValueError as e:  # Argumente sau date invalide: mesaj scurt, fara traceback
+            print("Eroare: " + str(e), file = sys.stderr)
+            return 1
+
+        if args.profile:
+            instrument.report()
+            instrument.export(args.profile)
+
+    if args.json:
+        write_json(result, args.json)
+    elif args.command != "batch":
+        print(json.dumps(result, indent = 2, default = to_json))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,124 @@
+import os
+import json
+import numpy as np
+import dataset
+import storage
+from energy_processing import hourly_consumption
+
+########## Matricea densa case x ore a consumului, memory-mapped ##########
+
+# Consumul orar (kWh) al tuturor caselor pe o grila comuna de ore, float32, cu NaN unde lipsesc date.
+# Matricea e un fisier .npy deschis cu mmap, plus un fisier JSON cu indexul (case, prima ora, numar de ore).
+# Randurile si intervalele de ore sunt view-uri, nu copii; procesele dintr-un pool pot deschide acelasi
+# fisier si impart paginile prin cache-ul sistemului de operare.
+
+MATRIX_FILE = "Database/Store/consumption_matrix.npy"
+INDEX_FILE = "Database/Store/consumption_matrix.json"
+HOUR = 3600
+
+def matrix_available(matrix_file = MATRIX_FILE, index_file = INDEX_FILE):  # Matricea exista si e construita din CSV-ul curent
+    if not os.path.exists(matrix_file) or not os.path.exists(index_file):
+        return False
+
+    with open(index_file) as fh:
+        index = json.load(fh)
+    return index.get('source_version') == consumption_version()
+
+def consumption_version():
+    version = storage.table_version('Consumption')
+    return list(version) if version is not None else None
+
+def build_consumption_matrix(house_ids = None, matrix_file = MATRIX_FILE, index_file = INDEX_FILE):  # Agregarea consumului curatat in matrice
+    if house_ids is None:
+        house_ids = storage.list_partitions('Consumption') or dataset.read_table('House')['ID'].tolist()
+    house_ids = sorted(int(h) for h in house_ids)
+
+    # Pas 1: intervalul comun de ore, citind doar coloana EpochTime
+    first_hour = None
+    last_hour = None
+    for house_id in house_ids:
+        epochs = storage.load_consumption(house_id, columns = ['EpochTime'])['EpochTime']
+        if epochs.empty:
+            continue
+        low = int(epochs.min()) // HOUR * HOUR
+        high = int(epochs.max()) // HOUR * HOUR
+        first_hour = low if first_hour is None else min(first_hour, low)
+        last_hour = high if last_hour is None else max(last_hour, high)
+
+    n_hours = 0 if first_hour is None else (last_hour - first_hour) // HOUR + 1
+
+    os.makedirs(os.path.dirname(matrix_file), exist_ok = True)
+    tmp_file = matrix_file + ".tmp.npy"
+    data = np.lib.format.open_memmap(tmp_file, mode = "w+", dtype = np.float32, shape = (len(house_ids), n_hours))
+    data[:] = np.nan
+
+    # Pas 2: fiecare casa e agregata pe ore si scrisa direct in randul ei
+    for row, house_id in enumerate(house_ids):
+        hourly = hourly_consumption(storage.load_consumption(house_id, columns = ['EpochTime', 'Value']))
+        if hourly.empty:
+            continue
+        columns = (hourly.index.to_numpy(dtype = np.int64) - first_hour) // HOUR
+        data[row, columns] = hourly.to_numpy(dtype = np.float32)
+
+    data.flush()
+    del data
+    os.replace(tmp_file, matrix_file)
+
+    with open(index_file, "w") as fh:
+        json.dump({'house_ids': house_ids, 'start_epoch': first_hour or 0, 'n_hours': n_hours, 'step': HOUR,
+                   'source_version': consumption_version()}, fh)
+
+    print("Matrice de consum construita: " + str(len(house_ids)) + " case x " + str(n_hours) + " ore.")
+
+class ConsumptionMatrix:  # Citire zero-copy din matricea case x ore
+    def __init__(self, matrix_file = MATRIX_FILE, index_file = INDEX_FILE):
+        self.matrix_file = matrix_file
+        self.index_file = index_file
+        self.open()
+
+    def open(self):
+        with open(self.index_file) as fh:
+            index = json.load(fh)
+
+        self.house_ids = index['house_ids']
+        self.start_epoch = index['start_epoch']
+        self.step = index['step']
+        self.position = {house_id: row for row, house_id in enumerate(self.house_ids)}
+        self.data = np.load(self.matrix_file, mmap_mode = "r")
+
+    # La trimiterea catre un proces din pool se transmit doar caile; workerul redeschide mmap-ul
+    def __getstate__(self):
+        return {'matrix_file': self.matrix_file, 'index_file': self.index_file}
+
+    def __setstate__(self, state):
+        self.matrix_file = state['matrix_file']
+        self.index_file = state['index_file']
+        self.open()
+
+    @property
+    def shape(self):
+        return self.data.shape
+
+    @property
+    def epochs(self):  # Inceputul fiecarei ore din grila
+        return self.start_epoch + self.step * np.arange(self.data.shape[1], dtype = np.int64)
+
+    def hour_index(self, epoch):  # Coloana corespunzatoare unui epoch (rotunjit in jos la ora)
+        return int((int(epoch) - self.start_epoch) // self.step)
+
+    def hour_range(self, start_epoch = None, end_epoch = None):  # Intervalul de coloane [start, end)
+        n_hours = self.data.shape[1]
+        first = 0 if start_epoch is None else min(max(self.hour_index(start_epoch), 0), n_hours)
+        last = n_hours if end_epoch is None else min(max(self.hour_index(end_epoch - 1) + 1, 0), n_hours)
+        return first, max(first, last)
+
+    def house(self, house_id, start_epoch = None, end_epoch = None):  # Randul unei case (view), optional doar un interval
+        if house_id not in self.position:
+            raise KeyError("Casa " + str(house_id) + " nu exista in matricea de consum.")
+
+        first, last = self.hour_range(start_epoch, end_epoch)
+        return self.data[self.position[house_id], first:last]
+
+    def hours(self, start_epoch = None, end_epoch = None):  # Toate casele pe un interval de ore (view)
+        first, last = self.hour_range(start_epoch, end_epoch)
+        return self.data[:, first:last]
@@ -1,82 +1,282 @@
-from scipy.optimize import differential_evolution
+import time
+import numpy as np
+import pandas as pd
+from indicators import compute_indicators
+import instrument
 
 ########## Optimizarea panourilor solare in functie de indicatori ##########
 
-def objective_max_sc_ss(x, indicator_obj, w_sc = 0.5, w_ss = 0.5, Pm = 575, f = 0.8, # Calculare functie obiectiv (scor maxim) pentru optimizarea SS si SC
-                            GTSTC = 1000.0, round_panels = True, quiet = True): 
-    n_panels = x[0]
-    if round_panels:
-        n_panels = max(1, int(round(n_panels)))
+MAX_SWEEP_CELLS = 5_000_000  # Numarul maxim de celule (candidati x ore) evaluate intr-un singur bloc
+
+def aligned_radiation(indicator_obj):  # Radiatia si consumul pe orele comune, ca array-uri
+    rad_times, radiation = indicator_obj.get_arrays('solar_radiation')
+    cons_times, consumption = indicator_obj.get_arrays('consumption')
+    _, rad_index, cons_index = np.intersect1d(rad_times, cons_times, assume_unique = True, return_indices = True)
+    return radiation[rad_index], consumption[cons_index]
 
-    # Salveaza productia curenta
-    prod_backup = indicator_obj.production
+@instrument.profiled("optimize.sweep_panels")
+def sweep_panels(indicator_obj, n_min = 1, n_max = 40, Pm = 575, f = 0.8, GTSTC = 1000.0, # Evaluare exacta a tuturor numerelor de panouri
+                    max_cells = MAX_SWEEP_CELLS, Cwp = 0.11, Y = 20, r = 0.05, price_per_kWh = 0.2, candidates = None):
+    if not indicator_obj.consumption:
+        raise ValueError("indicator_obj.consumption gol.")
+    if not indicator_obj.solar_radiation:
+        raise ValueError("indicator_obj.solar_radiation gol.")
+
+    # Implicit toti intregii din [n_min, n_max]; altfel lista data de candidati
+    if candidates is None:
+        candidates = np.arange(max(1, int(n_min)), int(n_max) + 1)
+    else:
+        candidates = np.unique(np.asarray(list(candidates), dtype = np.int64))
+    if len(candidates) == 0:
+        raise ValueError("Intervalul de panouri este gol.")
+
+    radiation, consumption = aligned_radiation(indicator_obj)
+
+    # Candidatii sunt evaluati in blocuri (candidati x ore), ca matricea sa ramana in memorie
+    rows_per_chunk = max(1, max_cells // max(1, len(radiation)))
+    chunks = []
+
+    for start in range(0, len(candidates), rows_per_chunk):
+        n = candidates[start:start + rows_per_chunk]
+
+        # Aceeasi formula ca get_power_estimated, pentru toti candidatii deodata
+        production = (Pm * n[:, None] * f) * radiation / GTSTC / 6000
+
+        result = compute_indicators(production, consumption, Cwp = Cwp, Pm = Pm, n = n, Y = Y, r = r, price_per_kWh = price_per_kWh)
+        chunks.append(pd.DataFrame({
+            'n': n,
+            'SS': result['SS'],
+            'SC': result['SC'],
+            'NEEG': result['NEEG'],
+            'NPV': result['NPV'] if result['NPV'] is not None else np.nan,
+        }))
+
+    return pd.concat(chunks, ignore_index = True)
+
+SIZING_VARIABLES = ['n', 'Pm', 'f']  # Variabilele de dimensionare; fiecare poate fi fixa sau un interval
+OBJECTIVES = ['ss_sc', 'ss', 'sc', 'neeg', 'npv']
+
+class SizingObjective:  # Functia obiectiv pe array-uri: un candidat (d,) sau o populatie intreaga (d, S)
+    # Productia fiecarui candidat e calculata direct din radiatie (aceeasi formula ca get_power_estimated),
+    # fara a modifica indicator_obj.production. Obiectul poate fi trimis in procesele worker ale DE.
+    def __init__(self, radiation, consumption, objective = "ss_sc", variables = ('n',), fixed = None, GTSTC = 1000.0,
+                    w_sc = 0.5, w_ss = 0.5, Cwp = 0.11, Y = 20, r = 0.05, price_per_kWh = 0.2, round_panels = True,
+                    max_cells = MAX_SWEEP_CELLS):
+        if objective not in OBJECTIVES:
+            raise ValueError("Obiectiv necunoscut: " + str(objective) + ". Disponibile: " + ", ".join(OBJECTIVES))
+
+        self.radiation = np.asarray(radiation, dtype = np.float64)
+        self.consumption = np.asarray(consumption, dtype = np.float64)
+        self.objective = objective
+        self.variables = list(variables)
+        self.fixed = dict(fixed or {})
+        self.GTSTC = GTSTC
+        self.weights = (w_sc, w_ss)
+        self.finance = {'Cwp': Cwp, 'Y': Y, 'r': r, 'price_per_kWh': price_per_kWh}
+        self.round_panels = round_panels
+        self.max_cells = max_cells
+
+    def parameters(self, x):  # n, Pm, f pentru fiecare coloana a lui x
+        count = x.shape[1]
+        params = {name: np.full(count, float(value)) for name, value in self.fixed.items()}
+        for i, name in enumerate(self.variables):
+            params[name] = x[i]
+        if self.round_panels:
+            params['n'] = np.maximum(1, np.round(params['n']))
+        return params
+
+    def indicators(self, n, Pm, f):  # SS, SC, NEEG, NPV pentru fiecare candidat, in blocuri (candidati x ore)
+        rows_per_chunk = max(1, self.max_cells // max(1, len(self.radiation)))
+        chunks = []
+
+        for start in range(0, len(n), rows_per_chunk):
+            part = slice(start, start + rows_per_chunk)
+            production = (Pm[part] * n[part] * f[part])[:, None] * self.radiation / self.GTSTC / 6000
+            chunks.append(compute_indicators(production, self.consumption, Pm = Pm[part], n = n[part], **self.finance))
+
+        return {name: np.concatenate([np.atleast_1d(chunk[name]) for chunk in chunks]) for name in ('SS', 'SC', 'NEEG', 'NPV')}
+
+    def scores(self, values):  # Valoarea minimizata de DE
+        if self.objective == "ss_sc":
+            return -(self.weights[0] * values['SC'] + self.weights[1] * values['SS'])
+        if self.objective == "ss":
+            return -values['SS']
+        if self.objective == "sc":
+            return -values['SC']
+        if self.objective == "neeg":
+            return values['NEEG']
+        return -values['NPV']
+
+    def __call__(self, x):
+        x = np.asarray(x, dtype = np.float64)
+        single = x.ndim == 1
+        params = self.parameters(x[:, None] if single else x)
+        result = self.scores(self.indicators(params['n'], params['Pm'], params['f']))
+        return float(result[0]) if single else result
+
+def sizing_objective(indicator_obj, objective = "ss_sc", n = (1, 40), Pm = 575, f = 0.8, GTSTC = 1000.0, w_sc = 0.5,
+                        w_ss = 0.5, Cwp = 0.11, Y = 20, r = 0.05, price_per_kWh = 0.2, round_panels = True):
+    # n, Pm, f: valoare fixa sau interval (min, max). Intoarce obiectivul si limitele variabilelor optimizate.
+    if not indicator_obj.consumption:
+        raise ValueError("indicator_obj.consumption gol.")
+    if not indicator_obj.solar_radiation:
+        raise ValueError("indicator_obj.solar_radiation gol.")
 
-    # Productie temporara pentru n_panels
-    indicator_obj.get_power_estimated(n_panels, Pm = Pm, f = f, GTSTC = GTSTC)
+    variables, bounds, fixed = [], [], {}
+    for name, value in zip(SIZING_VARIABLES, (n, Pm, f)):
+        if np.ndim(value) == 0:
+            fixed[name] = value
+        else:
+            low, high = value
+            if low > high:
+                raise ValueError("Interval invalid pentru " + name + ": " + str(value))
+            variables.append(name)
+            bounds.append((low, high))
+
+    if not variables:
+        raise ValueError("Cel putin una dintre variabilele n, Pm, f trebuie data ca interval.")
+
+    radiation, consumption = aligned_radiation(indicator_obj)
+    if len(radiation) == 0:
+        raise ValueError("Radiatia si consumul nu au ore comune.")
+
+    function = SizingObjective(radiation, consumption, objective, variables, fixed, GTSTC, w_sc, w_ss, Cwp, Y, r,
+                               price_per_kWh, round_panels)
+    return function, bounds
+
+def run_de(function, bounds, maxiter = 40, popsize = 15, seed = None, disp = True, vectorized = True, workers = 1, tol = 0.01):
+    from scipy.optimize import differential_evolution  # scipy e importat doar cand e folosit (pornire rapida)
+
+    # vectorized: toata populatia e evaluata intr-un singur apel al kernelului (un singur proces).
+    # workers != 1: candidatii sunt evaluati in paralel, cate unul pe apel (scipy nu le combina).
+    options = {'updating': "deferred"} if vectorized or workers != 1 else {}
+    if workers != 1:
+        options['workers'] = workers
+    elif vectorized:
+        options['vectorized'] = True
+
+    integrality = [name == 'n' and function.round_panels for name in function.variables]
+    return differential_evolution(function, bounds = bounds, maxiter = maxiter, popsize = popsize, seed = seed, disp = disp, tol = tol,
+                                  integrality = integrality if any(integrality) else None, polish = False, **options)
+
+@instrument.profiled("optimize.optimize_sizing")
+def optimize_sizing(indicator_obj, objective = "ss_sc", n = (1, 40), Pm = 575, f = 0.8, GTSTC = 1000.0, w_sc = 0.5, # Dimensionare pe n, Pm si f
+                        w_ss = 0.5, Cwp = 0.11, Y = 20, r = 0.05, price_per_kWh = 0.2, maxiter = 40, popsize = 15,
+                        seed = None, disp = True, vectorized = True, workers = 1, tol = 0.01):
+    # Ex.: optimize_sizing(indicator, "npv", n = (1, 40), Pm = (300, 700), f = (0.7, 0.9))
+    # La final productia casei este setata pentru configuratia optima (ca in functiile pe un singur n).
+    function, bounds = sizing_objective(indicator_obj, objective, n, Pm, f, GTSTC, w_sc, w_ss, Cwp, Y, r, price_per_kWh)
+
+    start_time = time.perf_counter()
+    result = run_de(function, bounds, maxiter, popsize, seed, disp, vectorized, workers, tol)
+    elapsed = time.perf_counter() - start_time
+
+    params = function.parameters(np.asarray(result.x, dtype = np.float64)[:, None])
+    values = function.indicators(params['n'], params['Pm'], params['f'])
+    best = {
+        'best_n': int(params['n'][0]),
+        'best_Pm': float(params['Pm'][0]),
+        'best_f': float(params['f'][0]),
+        'objective': objective,
+        'best_score': float(-function.scores(values)[0]) if objective != "neeg" else float(values['NEEG'][0]),
+        'SS': float(values['SS'][0]),
+        'SC': float(values['SC'][0]),
+        'NEEG': float(values['NEEG'][0]),
+        'NPV': float(values['NPV'][0]),
+        'generations': int(result.nit),
+        'seconds': elapsed,
+    }
 
-    sc_val = indicator_obj.calculate_indicator("SC")
-    ss_val = indicator_obj.calculate_indicator("SS")
+    indicator_obj.get_power_estimated(best['best_n'], Pm = best['best_Pm'], f = best['best_f'], GTSTC = GTSTC)
 
-    # Revenire la productia originala
-    indicator_obj.production = prod_backup
+    if disp:
+        print("\n### Rezultate dimensionare (" + objective + ") ###")
+        print("Panouri: " + str(best['best_n']) + ", Pm: " + str(round(best['best_Pm'], 1)) + " W, f: " + str(round(best['best_f'], 3)))
+        print("SS: " + str(round(best['SS'], 3)) + ", SC: " + str(round(best['SC'], 3)) + ", NEEG: " +
+              str(round(best['NEEG'], 3)) + " kWh, NPV: " + str(round(best['NPV'], 2)))
+        print("Generatii: " + str(best['generations']) + ", timp: " + str(round(elapsed, 4)) + " s\n")
 
-    # Penalizare daca nu s-au putut calcula indicatorii
-    if sc_val is None or ss_val is None:
-        return 1e9
+    return best
 
-    score = (w_sc * sc_val) + (w_ss * ss_val)
+objective_cache = {}  # (obiectiv, parametri) -> (timpi radiatie, timpi consum, SizingObjective), refolosit intre apelurile DE
 
-    # DE minimizeaza => intoarcem negativul
-    return -score
+def cached_objective(indicator_obj, objective, Pm, f, GTSTC, w_sc = 0.5, w_ss = 0.5, round_panels = True):
+    # Alinierea radiatiei cu consumul se face o singura data; obiectul e refolosit cat timp seriile casei
+    # sunt aceleasi (get_arrays intoarce aceleasi array-uri pana la modificarea dict-urilor)
+    rad_times, radiation = indicator_obj.get_arrays('solar_radiation')
+    cons_times, consumption = indicator_obj.get_arrays('consumption')
+    key = (objective, Pm, f, GTSTC, w_sc, w_ss, round_panels)
+    cached = objective_cache.get(key)
 
-def objective_min_neeg(x, indicator_obj, Pm = 575, f = 0.8, GTSTC = 1000.0, round_panels = True): # Calculare functie obiectiv pentru optimizarea NEEG
-    n_panels = x[0]
-    if round_panels:
-        n_panels = max(1, int(round(n_panels)))
+    if cached is not None and cached[0] is rad_times and cached[1] is cons_times:
+        return cached[2]
 
-    prod_backup = indicator_obj.production
+    radiation, consumption = aligned_radiation(indicator_obj)
+    if len(radiation) == 0:
+        raise ValueError("Radiatia si consumul nu au ore comune.")
 
-    indicator_obj.get_power_estimated(n_panels, Pm = Pm, f = f, GTSTC = GTSTC)
+    function = SizingObjective(radiation, consumption, objective, ['n'], {'Pm': Pm, 'f': f}, GTSTC, w_sc, w_ss,
+                               round_panels = round_panels)
+    objective_cache[key] = (rad_times, cons_times, function)
+    return function
 
-    neeg_val = indicator_obj.calculate_NEEG()
+@instrument.profiled("optimize.objective_max_sc_ss")
+def objective_max_sc_ss(x, indicator_obj, w_sc = 0.5, w_ss = 0.5, Pm = 575, f = 0.8, # Calculare functie obiectiv (scor maxim) pentru optimizarea SS si SC
+                            GTSTC = 1000.0, round_panels = True, quiet = True):
+    # quiet e pastrat pentru apelurile existente; obiectivul nu mai afiseaza nimic
+    function = cached_objective(indicator_obj, "ss_sc", Pm, f, GTSTC, w_sc, w_ss, round_panels)
+    return function(np.asarray(x, dtype = np.float64)[:1])  # DE minimizeaza => negativul scorului
 
-    indicator_obj.production = prod_backup
+@instrument.profiled("optimize.objective_min_neeg")
+def objective_min_neeg(x, indicator_obj, Pm = 575, f = 0.8, GTSTC = 1000.0, round_panels = True): # Calculare functie obiectiv pentru optimizarea NEEG
+    function = cached_objective(indicator_obj, "neeg", Pm, f, GTSTC, round_panels = round_panels)
+    return function(np.asarray(x, dtype = np.float64)[:1])
 
-    if neeg_val is None:
-        return 1e9  # Penalizare mare
+def legacy_de(objective, bounds, args, maxiter = 40, popsize = 15, seed = None, disp = True):
+    from scipy.optimize import differential_evolution
 
-    return neeg_val  # DE minimizeaza, deci minimizam NEEG direct
+    # Setarile implicite scipy (tol, polish, updating) ca in versiunea initiala: acelasi seed da acelasi rezultat
+    return differential_evolution(objective, bounds = bounds, args = args, maxiter = maxiter, popsize = popsize, seed = seed, disp = disp)
 
 def optimize_panels_max_ss(indicator_obj, n_min = 1, n_max = 40, Pm = 575, f = 0.8, # Differential evolution pentru maximizare SS
-                                GTSTC = 1000.0, maxiter = 40, popsize = 15, seed = None, disp = True):
+                                GTSTC = 1000.0, maxiter = 40, popsize = 15, seed = None, disp = True, method = "de"):
     return optimize_panels_max_ss_sc(
         indicator_obj = indicator_obj, n_min = n_min, n_max = n_max, w_sc = 0.0, w_ss = 1.0,
-        Pm = Pm, f = f, GTSTC = GTSTC, maxiter = maxiter, popsize = popsize, seed = seed, disp = disp
+        Pm = Pm, f = f, GTSTC = GTSTC, maxiter = maxiter, popsize = popsize, seed = seed, disp = disp, method = method
     )
 
 def optimize_panels_max_sc(indicator_obj, n_min = 1, n_max = 40, Pm = 575, f = 0.8, # Differential evolution pentru maximizare SC
-                                GTSTC = 1000.0, maxiter = 40, popsize = 15, seed = None, disp = True):
+                                GTSTC = 1000.0, maxiter = 40, popsize = 15, seed = None, disp = True, method = "de"):
     return optimize_panels_max_ss_sc(
         indicator_obj = indicator_obj, n_min = n_min, n_max = n_max, w_sc = 1.0, w_ss = 0.0,
-        Pm = Pm, f = f, GTSTC = GTSTC, maxiter = maxiter, popsize = popsize, seed = seed, disp = disp
+        Pm = Pm, f = f, GTSTC = GTSTC, maxiter = maxiter, popsize = popsize, seed = seed, disp = disp, method = method
     )
 
+@instrument.profiled("optimize.optimize_panels_max_ss_sc")
 def optimize_panels_max_ss_sc(indicator_obj, n_min = 1, n_max = 40, w_sc = 0.5, w_ss = 0.5, Pm = 575, f = 0.8, # Differential evolution pentru maximizare SS si SC
-                                    GTSTC = 1000.0, maxiter = 40, popsize = 15, seed = None, disp = True):
+                                    GTSTC = 1000.0, maxiter = 40, popsize = 15, seed = None, disp = True, method = "de"):
+    # method = "de": differential evolution, method = "exact": evaluarea tuturor candidatilor
     if not indicator_obj.consumption:
         raise ValueError("indicator_obj.consumption gol.")
     if not indicator_obj.solar_radiation:
         raise ValueError("indicator_obj.solar_radiation gol.")
 
-    bounds = [(n_min, n_max)]
+    start_time = time.perf_counter()
 
-    result = differential_evolution(
-        objective_max_sc_ss, bounds = bounds, args = (indicator_obj, w_sc, w_ss, Pm, f, GTSTC, True, True),
-        maxiter = maxiter, popsize = popsize, seed = seed, disp = disp,
-    )
+    if method == "exact":
+        sweep = sweep_panels(indicator_obj, n_min = n_min, n_max = n_max, Pm = Pm, f = f, GTSTC = GTSTC)
+        scores = (w_sc * sweep['SC'].to_numpy()) + (w_ss * sweep['SS'].to_numpy())
+        n_opt = int(sweep['n'].iloc[int(np.argmax(scores))])  # La egalitate se alege cel mai mic n
+    elif method == "de":
+        cached_objective(indicator_obj, "ss_sc", Pm, f, GTSTC, w_sc, w_ss)  # Alinierea (si verificarea ei) inainte de DE
+        result = legacy_de(objective_max_sc_ss, [(n_min, n_max)], (indicator_obj, w_sc, w_ss, Pm, f, GTSTC, True, True),
+                           maxiter, popsize, seed, disp)
+        n_opt = int(round(result.x[0]))
+    else:
+        raise ValueError("Metoda de optimizare necunoscuta: " + str(method))
 
-    n_opt = int(round(result.x[0]))
     n_opt = max(n_min, min(n_opt, n_max))
+    elapsed = time.perf_counter() - start_time
 
     indicator_obj.get_power_estimated(n_opt, Pm = Pm, f = f, GTSTC = GTSTC)
 
@@ -85,11 +285,12 @@ def optimize_panels_max_ss_sc(indicator_obj, n_min = 1, n_max = 40, w_sc = 0.5,
     best_score = (w_sc * sc_opt) + (w_ss * ss_opt)
 
     if disp:
-        print("\n### Rezultate Differential Evolution ###")
+        print("\n### Rezultate " + ("cautare exacta" if method == "exact" else "Differential Evolution") + " ###")
         print("Panouri optime: " + str(n_opt))
         print("SC: " + str(round(sc_opt, 3)))
         print("SS: " + str(round(ss_opt, 3)))
-        print("Scor combinat: " + str(round(best_score, 3)) + "\n")
+        print("Scor combinat: " + str(round(best_score, 3)))
+        print("Timp optimizare: " + str(round(elapsed, 4)) + " s\n")
 
     return {
         'best_n': n_opt,
@@ -98,22 +299,28 @@ def optimize_panels_max_ss_sc(indicator_obj, n_min = 1, n_max = 40, w_sc = 0.5,
         'best_SS': ss_opt
     }
 
+@instrument.profiled("optimize.optimize_panels_min_neeg")
 def optimize_panels_min_neeg(indicator_obj, n_min = 1, n_max = 40, Pm = 575, f = 0.8, # Differential evolution pentru minimizare NEEG
-                                GTSTC = 1000.0, maxiter = 40, popsize = 15, seed = None, disp = True):
+                                GTSTC = 1000.0, maxiter = 40, popsize = 15, seed = None, disp = True, method = "de"):
     if not indicator_obj.consumption:
         raise ValueError("indicator_obj.consumption gol.")
     if not indicator_obj.solar_radiation:
         raise ValueError("indicator_obj.solar_radiation gol.")
 
-    bounds = [(n_min, n_max)]
+    start_time = time.perf_counter()
 
-    result = differential_evolution(
-        objective_min_neeg, bounds = bounds, args = (indicator_obj, Pm, f, GTSTC, True),
-        maxiter = maxiter, popsize = popsize, seed = seed, disp = disp,
-    )
+    if method == "exact":
+        sweep = sweep_panels(indicator_obj, n_min = n_min, n_max = n_max, Pm = Pm, f = f, GTSTC = GTSTC)
+        n_opt = int(sweep['n'].iloc[int(np.argmin(sweep['NEEG'].to_numpy()))])
+    elif method == "de":
+        cached_objective(indicator_obj, "neeg", Pm, f, GTSTC)
+        result = legacy_de(objective_min_neeg, [(n_min, n_max)], (indicator_obj, Pm, f, GTSTC, True), maxiter, popsize, seed, disp)
+        n_opt = int(round(result.x[0]))
+    else:
+        raise ValueError("Metoda de optimizare necunoscuta: " + str(method))
 
-    n_opt = int(round(result.x[0]))
     n_opt = max(n_min, min(n_opt, n_max))
+    elapsed = time.perf_counter() - start_time
 
     indicator_obj.get_power_estimated(n_opt, Pm = Pm, f = f, GTSTC = GTSTC)
 
@@ -122,9 +329,74 @@ def optimize_panels_min_neeg(indicator_obj, n_min = 1, n_max = 40, Pm = 575, f =
     if disp:
         print("\n### Rezultate Minim NEEG ###")
         print("Panouri optime: " + str(n_opt))
-        print("NEEG minim: " + str(round(neeg_opt, 3)) + " kWh\n")
+        print("NEEG minim: " + str(round(neeg_opt, 3)) + " kWh")
+        print("Timp optimizare: " + str(round(elapsed, 4)) + " s\n")
 
     return {
         'best_n': n_opt,
         'best_NEEG': neeg_opt,
     }
+
+def compare_methods(indicator_obj, n_min = 1, n_max = 40, w_sc = 0.5, w_ss = 0.5, Pm = 575, f = 0.8, # Compara durata si rezultatul DE vs cautare exacta
+                        GTSTC = 1000.0, maxiter = 40, popsize = 15, seed = None):
+    timings = {}
+    results = {}
+
+    for method in ("exact", "de"):
+        start_time = time.perf_counter()
+        results[method] = optimize_panels_max_ss_sc(
+            indicator_obj = indicator_obj, n_min = n_min, n_max = n_max, w_sc = w_sc, w_ss = w_ss, Pm = Pm, f = f,
+            GTSTC = GTSTC, maxiter = maxiter, popsize = popsize, seed = seed, disp = False, method = method
+        )
+        timings[method] = time.perf_counter() - start_time
+
+    speedup = timings['de'] / timings['exact'] if timings['exact'] > 0 else float('inf')
+
+    print("\n### Comparatie DE vs cautare exacta ###")
+    print("DE: n = " + str(results['de']['best_n']) + ", scor = " + str(round(results['de']['best_score'], 4)) + ", timp = " + str(round(timings['de'], 3)) + " s")
+    print("Exact: n = " + str(results['exact']['best_n']) + ", scor = " + str(round(results['exact']['best_score'], 4)) + ", timp = " + str(round(timings['exact'], 3)) + " s")
+    print("Accelerare: " + str(round(speedup, 1)) + "x\n")
+
+    return {
+        'de': results['de'],
+        'exact': results['exact'],
+        'de_time': timings['de'],
+        'exact_time': timings['exact'],
+        'speedup': speedup,
+    }
+
+def non_dominated(values):  # Masca punctelor nedominate; values: (puncte x obiective), toate de maximizat
+    values = np.asarray(values, dtype = np.float64)
+    at_least_as_good = (values[:, None, :] >= values[None, :, :]).all(axis = 2)
+    strictly_better = (values[:, None, :] > values[None, :, :]).any(axis = 2)
+    dominated = (at_least_as_good & strictly_better).any(axis = 0)  # j e dominat daca exista i care il domina
+    return ~dominated
+
+@instrument.profiled("optimize.pareto_front")
+def pareto_front(indicator_obj, n_range = range(1, 41), Pm = 575, f = 0.8, GTSTC = 1000.0, # Frontul Pareto SS / SC pe toate numerele de panouri
+                    objectives = None, Cwp = 0.11, Y = 20, r = 0.05, price_per_kWh = 0.2):
+    # objectives: {coloana: "max" / "min"}, implicit SS si SC maximizate
+    if objectives is None:
+        objectives = {'SS': "max", 'SC': "max"}
+
+    sweep = sweep_panels(indicator_obj, Pm = Pm, f = f, GTSTC = GTSTC, Cwp = Cwp, Y = Y, r = r,
+                         price_per_kWh = price_per_kWh, candidates = n_range)
+
+    signs = np.array([1.0 if direction == "max" else -1.0 for direction in objectives.values()])
+    mask = non_dominated(sweep[list(objectives)].to_numpy() * signs)
+
+    return sweep[mask].reset_index(drop = True)
+
+def best_from_front(front, w_sc = 0.5, w_ss = 0.5): # Raspuns instant pentru o ponderare, fara o noua optimizare
+    if front.empty:
+        raise ValueError("Frontul Pareto este gol.")
+
+    scores = (w_sc * front['SC'].to_numpy()) + (w_ss * front['SS'].to_numpy())
+    best = front.iloc[int(np.argmax(scores))]
+
+    return {
+        'best_n': int(best['n']),
+        'best_score': float(scores.max()),
+        'best_SC': float(best['SC']),
+        'best_SS': float(best['SS'])
+    }
@@ -1,37 +1,41 @@
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
+import dataset
+import instrument
+import rollup
 from datetime import datetime
 
 ########## Plotarea graficelor ##########
 
-def plot_10min_consumption_for_day(house, target_date):  # Plotare pe zi la interval de 10 minute pentru o casa
-    
-    input_csv = "Database/Consumption.csv"
-    df = pd.read_csv(input_csv)
-    df = df[df['HouseIDREF'] == house.house_id]  # Pastreaza doar randurile care apartin casei curente
+# Fiecare functie intoarce figura. Implicit o scrie in Plots/ si o deschide; cu output = None,
+# auto_open = False si show = False nu scrie si nu blocheaza nimic (folosit de report.py).
+
+def save_figure(fig, output, auto_open = True, show = True):  # Scrie si afiseaza figura doar daca e cerut
+    if output is not None:
+        fig.write_html(output, auto_open = auto_open)
+    if show:
+        fig.show()
+    return fig
 
-    if df.empty:
+@instrument.profiled("plot.plot_10min_consumption_for_day")
+def plot_10min_consumption_for_day(house, target_date, output = "Plots/consum_pe_10min_in_zi.html", auto_open = True, show = True):  # Plotare pe zi la interval de 10 minute pentru o casa
+    
+    if rollup.house_rollup(house.house_id, 'daily').empty:
         print("Nu exista date pentru casa " + str(house.house_id))
         return
 
-    # Converteste EpochTime in data-ora si extrage doar data
-    df['Datetime'] = pd.to_datetime(df['EpochTime'], unit = 's')
-    df['Date'] = df['Datetime'].dt.date
-
-    # Verifica daca data introdusa este valida
-    target_day = pd.to_datetime(target_date).date()
-
-    # Cauta ziua ceruta
-    df = df[df['Date'] == target_day]
+    try:
+        interval_total = rollup.query_day(house.house_id, '10min', target_date)  # Intervalele de 10 minute din ziua ceruta
+    except Exception as e:
+        print("Data introdusa este invalida: " + str(e))
+        return
 
-    if df.empty:
+    if interval_total.empty:
         print("Nu exista consum in ziua " + str(target_date) + " pentru casa " + str(house.house_id))
         return
 
-    # Grupare pe intervale de 10 minute
-    df['Interval'] = df['Datetime'].dt.floor('10min')
-    interval_total = df.groupby('Interval')['Value'].sum().reset_index()
+    interval_total['Interval'] = pd.to_datetime(interval_total['Interval'], unit = 's')
 
     fig = px.line(
         interval_total,
@@ -42,38 +46,25 @@ def plot_10min_consumption_for_day(house, target_date):  # Plotare pe zi la inte
         markers = True
     )
     fig.update_layout(xaxis_tickformat = '%H:%M')
-    fig.write_html("Plots/consum_pe_10min_in_zi.html", auto_open = True)
-    fig.show()
-
-def plot_hourly_consumption_for_day(house, target_date):  # Plotare pe zi la interval de o ora pentru o casa
-    input_csv = "Database/Consumption.csv"  # Fisierul cu datele de consum
-
-    df = pd.read_csv(input_csv)
-    df = df[df['HouseIDREF'] == house.house_id]  # Filtrare dupa house_id
+    return save_figure(fig, output, auto_open, show)
 
-    if df.empty:
+@instrument.profiled("plot.plot_hourly_consumption_for_day")
+def plot_hourly_consumption_for_day(house, target_date, output = "Plots/consum_pe_ora_in_zi.html", auto_open = True, show = True):  # Plotare pe zi la interval de o ora pentru o casa
+    if rollup.house_rollup(house.house_id, 'daily').empty:
         print("Nu exista date pentru casa " + str(house.house_id))
         return
 
-    # Conversie EpochTime -> Datetime + extragere zi
-    df['Datetime'] = pd.to_datetime(df['EpochTime'], unit = 's')
-    df['Date'] = df['Datetime'].dt.date
-
     try:
-        target_day = pd.to_datetime(target_date).date()
+        hourly_total = rollup.query_day(house.house_id, 'hourly', target_date)  # Orele din ziua ceruta
     except Exception as e:
         print("Data introdusa este invalida: " + str(e))
         return
 
-    df = df[df['Date'] == target_day]
-
-    if df.empty:
+    if hourly_total.empty:
         print("Nu exista consum in ziua " + str(target_date) + " pentru casa " + str(house.house_id))
         return
 
-    # Grupare pe ore
-    df['Hour'] = df['Datetime'].dt.floor('h')
-    hourly_total = df.groupby('Hour')['Value'].sum().reset_index()
+    hourly_total['Hour'] = pd.to_datetime(hourly_total['Hour'], unit = 's')
     hourly_total['Value'] /= 6000  # Transformare in kWh
 
     fig = px.line(
@@ -85,25 +76,18 @@ def plot_hourly_consumption_for_day(house, target_date):  # Plotare pe zi la int
         markers = True
     )
     fig.update_layout(xaxis_tickformat = '%H:%M')
-    fig.write_html("Plots/consum_pe_ora_in_zi.html", auto_open = True)
-    fig.show()
+    return save_figure(fig, output, auto_open, show)
 
-def plot_daily_consumption_in_a_year(house):  # Plotare pe an la interval de o zi pentru o casa
-    input_csv = "Database/Consumption.csv"
+@instrument.profiled("plot.plot_daily_consumption_in_a_year")
+def plot_daily_consumption_in_a_year(house, output = "Plots/consum_pe_zi_in_an.html", auto_open = True, show = True):  # Plotare pe an la interval de o zi pentru o casa
+    daily_total = rollup.query(house.house_id, 'daily')  # Totalurile zilnice precalculate
 
-    df = pd.read_csv(input_csv)
-    df = df[df['HouseIDREF'] == house.house_id]  # Filtrare dupa ID-ul casei
-
-    if df.empty:
+    if daily_total.empty:
         print("Nu exista date pentru casa " + str(house.house_id))
         return
 
-    # Conversie EpochTime -> Datetime + extragere data
-    df['Datetime'] = pd.to_datetime(df['EpochTime'], unit = 's')
-    df['Date'] = df['Datetime'].dt.date
-
-    # Grupare pe zi si transformare in kWh
-    daily_total = df.groupby('Date')['Value'].sum().reset_index()
+    # Conversie epoch -> data si transformare in kWh
+    daily_total['Date'] = pd.to_datetime(daily_total['Day'], unit = 's').dt.date
     daily_total['Value'] /= 6000
 
     fig = go.Figure()
@@ -125,15 +109,11 @@ def plot_daily_consumption_in_a_year(house):  # Plotare pe an la interval de o z
         hovermode = 'x unified'
     )
 
-    fig.write_html("Plots/consum_pe_zi_in_an.html", auto_open = True)
-    fig.show()
+    return save_figure(fig, output, auto_open, show)
 
-def plot_appliance_hourly_consumption_for_day(house, appliance_name, date_str):  # Plotare pe ora pentru un aparat intr-o zi specifica
-    consumption_csv = "Database/Consumption.csv"
-    appliance_csv = "Database/Appliance.csv"
-
-    df_consumption = pd.read_csv(consumption_csv)
-    df_appliance = pd.read_csv(appliance_csv)
+@instrument.profiled("plot.plot_appliance_hourly_consumption_for_day")
+def plot_appliance_hourly_consumption_for_day(house, appliance_name, date_str, output = "Plots/appliance.html", auto_open = True, show = True):  # Plotare pe ora pentru un aparat intr-o zi specifica
+    df_appliance = dataset.read_table('Appliance')
 
     # Obtine ID-ul aparatului dupa nume si casa
     filtered_appliances = df_appliance[
@@ -147,30 +127,21 @@ def plot_appliance_hourly_consumption_for_day(house, appliance_name, date_str):
 
     appliance_id = filtered_appliances.iloc[0]['ID']
 
-    # Filtrare consum pentru acel aparat
-    df = df_consumption[
-        (df_consumption['HouseIDREF'] == house.house_id) &
-        (df_consumption['ApplianceIDREF'] == appliance_id)
-    ].copy()
+    # Consumul orar precalculat al aparatului
+    df_rollup = rollup.house_rollup(house.house_id, 'appliance_hourly')
 
-    if df.empty:
+    if not (df_rollup['ApplianceIDREF'] == appliance_id).any():
         print("Nu exista date de consum pentru appliance-ul " + appliance_name + " in casa " + str(house.house_id))
         return
 
-    # Conversie si filtrare dupa data
-    df['Datetime'] = pd.to_datetime(df['EpochTime'], unit = 's')
-    df['Date'] = df['Datetime'].dt.date
-    df['Hour'] = df['Datetime'].dt.hour
-
-    target_date = pd.to_datetime(date_str).date()
-    df = df[df['Date'] == target_date]
+    hourly = rollup.query_day(house.house_id, 'appliance_hourly', date_str)
+    hourly = hourly[hourly['ApplianceIDREF'] == appliance_id].reset_index(drop = True)
 
-    if df.empty:
+    if hourly.empty:
         print("Nu exista date pentru appliance-ul " + appliance_name + " in data " + date_str)
         return
 
-    # Agregare pe ora
-    hourly = df.groupby('Hour')['Value'].sum().reset_index()
+    hourly['Hour'] = pd.to_datetime(hourly['Hour'], unit = 's').dt.hour
 
     fig = go.Figure()
     fig.add_trace(go.Scatter(
@@ -191,32 +162,29 @@ def plot_appliance_hourly_consumption_for_day(house, appliance_name, date_str):
         hovermode = 'x unified'
     )
 
-    fig.write_html("Plots/appliance.html", auto_open = True)
-    fig.show()
+    return save_figure(fig, output, auto_open, show)
 
-def plot_hourly_production_for_day(house, day = None):  # Plotare energie produsa pe ora intr-o zi
+@instrument.profiled("plot.plot_hourly_production_for_day")
+def plot_hourly_production_for_day(house, day = None, output = "Plots/productie_zi.html", auto_open = True, show = True):  # Plotare energie produsa pe ora intr-o zi
     if not hasattr(house, 'production') or not house.production:
         print("Datele de productie nu sunt disponibile.")
         return
 
-    # Conversie epochtime -> datetime
-    data = {datetime.fromtimestamp(int(k)): v for k, v in house.production.items()}
-
     # Determinam ziua ceruta
     if day is None:
-        day = next(iter(data)).date()
+        day = datetime.fromtimestamp(int(next(iter(house.production)))).date()
     elif isinstance(day, str):
         day = datetime.fromisoformat(day).date()
 
-    # Filtrare pe zi
-    daily_data = {t: v for t, v in data.items() if t.date() == day}
+    # Orele zilei, prin cautare binara in epoch-urile sortate (zi locala, ca datetime.fromtimestamp)
+    day_times, day_values = house.slice_day(day, 'production', local = True)
 
-    if not daily_data:
+    if len(day_times) == 0:
         print("Nu exista date pentru ziua " + str(day))
         return
     
-    times = sorted(daily_data)
-    values = [daily_data[t] for t in times]
+    times = [datetime.fromtimestamp(int(t)) for t in day_times]
+    values = day_values.tolist()
 
     fig = go.Figure()
     fig.add_trace(go.Scatter(
@@ -242,55 +210,47 @@ def plot_hourly_production_for_day(house, day = None):  # Plotare energie produs
         template = 'plotly_white'
     )
 
-    fig.write_html("Plots/productie_zi.html", auto_open = True)
-    fig.show()
+    return save_figure(fig, output, auto_open, show)
 
-def plot_hourly_consumption_and_production_for_day(house, target_date): # Plotare putere consumata si produsa pe acelasi grafic intr-o zi
+@instrument.profiled("plot.plot_hourly_consumption_and_production_for_day")
+def plot_hourly_consumption_and_production_for_day(house, target_date, output = "Plots/consum_vs_productie_zi.html", auto_open = True, show = True): # Plotare putere consumata si produsa pe acelasi grafic intr-o zi
 
     # Se apeleaza cu puterea neoptimizata, numarul panourilor il dam ca parametru in get_power_estimated
-    consumption_csv = "Database/Consumption.csv"
-    df = pd.read_csv(consumption_csv)
-    df = df[df['HouseIDREF'] == house.house_id]
-
-    if df.empty:
+    if rollup.house_rollup(house.house_id, 'daily').empty:
         print("Nu exista date de consum pentru casa " + str(house.house_id))
         return
 
-    df['Datetime'] = pd.to_datetime(df['EpochTime'], unit='s')
-    df['Date'] = df['Datetime'].dt.date
-
     try:
         target_day = pd.to_datetime(target_date).date()
     except Exception as e:
         print("Data introdusa este invalida: " + str(e))
         return
 
-    df = df[df['Date'] == target_day]
+    # Consumul orar din ziua ceruta, precalculat
+    hourly_consumption = rollup.query_day(house.house_id, 'hourly', target_day)
 
-    if df.empty:
+    if hourly_consumption.empty:
         print("Nu exista consum in ziua " + str(target_date) + " pentru casa " + str(house.house_id))
         return
 
-    # Grupare consum pe ora si transformare in kWh
-    df['Hour'] = df['Datetime'].dt.floor('h')
-    hourly_consumption = df.groupby('Hour')['Value'].sum().reset_index()
+    # Conversie epoch -> ora si transformare in kWh
+    hourly_consumption['Hour'] = pd.to_datetime(hourly_consumption['Hour'], unit = 's')
     hourly_consumption['Value'] /= 6000
 
     if not hasattr(house, 'production') or not house.production:
         print("Datele de productie nu sunt disponibile.")
         return
 
-    # Convertim epochtime -> datetime si filtram ziua
-    production_data = {datetime.fromtimestamp(int(k)): v for k, v in house.production.items()}
-    daily_production = {t: v for t, v in production_data.items() if t.date() == target_day}
+    # Productia din ziua ceruta, prin cautare binara in epoch-urile sortate
+    production_times, production_values = house.slice_day(target_day, 'production', local = True)
 
-    if not daily_production:
+    if len(production_times) == 0:
         print("Nu exista productie pentru ziua " + str(target_day))
         return
 
     production_df = pd.DataFrame({
-        'Datetime': list(daily_production.keys()),
-        'Production': list(daily_production.values())
+        'Datetime': [datetime.fromtimestamp(int(t)) for t in production_times],
+        'Production': production_values
     })
 
     production_df['Hour'] = production_df['Datetime'].dt.floor('h')
@@ -325,5 +285,4 @@ def plot_hourly_consumption_and_production_for_day(house, target_date): # Plotar
         template='plotly_white'
     )
 
-    fig.write_html("Plots/consum_vs_productie_zi.html", auto_open=True)
-    fig.show()
+    return save_figure(fig, output, auto_open, show)
@@ -0,0 +1,186 @@
+import os
+import io
+import time
+import contextlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+from plotly.offline import get_plotlyjs
+import dataset
+import instrument
+import plot
+from indicators import Indicators
+
+########## Rapoarte HTML pentru mai multe case, fara interfata ##########
+
+# Graficele din plot.py sunt generate in paralel, fara auto_open / fig.show(), in fisiere separate
+# pe casa: Reports/<casa>/<grafic>_<data>.html. Toate fisierele folosesc acelasi plotly.min.js,
+# scris o singura data in directorul raportului, in loc sa il includa fiecare (~3.5 MB).
+# Urmele sunt convertite in Scattergl (WebGL), iar seriile lungi sunt reduse cu LTTB.
+
+REPORT_DIR = "Reports"
+BUNDLE_FILE = "plotly.min.js"
+MAX_POINTS = 1000  # Peste atatea puncte o urma este redusa cu LTTB
+SUMMARY_FILE = "report_summary.csv"
+
+PLOTS = {  # nume -> (functie, are nevoie de data, are nevoie de productie)
+    '10min': (plot.plot_10min_consumption_for_day, True, False),
+    'hourly': (plot.plot_hourly_consumption_for_day, True, False),
+    'daily': (plot.plot_daily_consumption_in_a_year, False, False),
+    'production': (plot.plot_hourly_production_for_day, True, True),
+    'consumption_production': (plot.plot_hourly_consumption_and_production_for_day, True, True),
+}
+
+def numeric_axis(values):  # Axa x ca numere (datele calendaristice devin nanosecunde), pentru calculul ariilor
+    values = np.asarray(values)
+    if np.issubdtype(values.dtype, np.number):
+        return values.astype(np.float64)
+    return pd.to_datetime(pd.Series(values)).to_numpy().astype(np.int64).astype(np.float64)
+
+def lttb(x, y, threshold):  # Largest-Triangle-Three-Buckets: indicii punctelor pastrate
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    bucket = (n - 2) / (threshold - 2)
+    kept = np.empty(threshold, dtype = np.int64)
+    kept[0] = 0
+    kept[-1] = n - 1
+    previous = 0
+
+    for i in range(threshold - 2):
+        start = int(i * bucket) + 1
+        end = int((i + 1) * bucket) + 1
+        next_end = min(int((i + 2) * bucket) + 1, n)
+
+        # Punctul din galeata curenta care formeaza cel mai mare triunghi cu punctul ales anterior
+        # si media galetii urmatoare
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+        area = np.abs((x[previous] - avg_x) * (y[start:end] - y[previous]) - (x[previous] - x[start:end]) * (avg_y - y[previous]))
+
+        previous = start + int(np.argmax(area))
+        kept[i + 1] = previous
+
+    return kept
+
+def to_webgl(fig, max_points = MAX_POINTS):  # Urmele Scatter devin Scattergl, cele lungi reduse la max_points
+    traces = []
+    original_points = 0
+    kept_points = 0
+
+    for trace in fig.data:
+        data = trace.to_plotly_json()
+        if data.get('type') != 'scatter':
+            traces.append(trace)
+            continue
+
+        x = np.asarray(data['x'])
+        y = np.asarray(data['y'], dtype = np.float64)
+        original_points += len(x)
+
+        if len(x) > max_points:
+            kept = lttb(numeric_axis(x), y, max_points)
+            data['x'] = x[kept]
+            data['y'] = y[kept]
+
+        kept_points += len(data['x'])
+        data.pop('type')
+        traces.append(go.Scattergl(data, skip_invalid = True))
+
+    return go.Figure(data = traces, layout = fig.layout), original_points, kept_points
+
+def write_bundle(output_dir):  # plotly.js comun pentru toate fisierele din raport
+    path = os.path.join(output_dir, BUNDLE_FILE)
+    if not os.path.exists(path):
+        with open(path, "w", encoding = "utf-8") as fh:
+            fh.write(get_plotlyjs())
+    return path
+
+def init_worker(cache_bytes):
+    dataset.cache.max_bytes = cache_bytes
+
+@instrument.profiled("report.render_house")
+def render_house(house_id, dates, plots, output_dir = REPORT_DIR, max_points = MAX_POINTS, n = 10):  # Toate graficele cerute pentru o casa
+    house_dir = os.path.join(output_dir, str(house_id))
+    os.makedirs(house_dir, exist_ok = True)
+    rows = []
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        # O eroare la incarcarea casei marcheaza toate graficele ei, nu opreste raportul
+        setup_error = None
+        try:
+            indicator = Indicators(house_id)
+
+            if any(PLOTS[name][2] for name in plots):
+                indicator.get_solar_radiation()
+                indicator.get_power_estimated(n)
+        except Exception as e:
+            setup_error = "error: " + type(e).__name__ + ": " + str(e)
+
+        for name in plots:
+            function, needs_date, _ = PLOTS[name]
+
+            for target_date in (dates if needs_date else [None]):
+                start_time = time.perf_counter()
+                row = {'house_id': house_id, 'plot': name, 'date': target_date or "", 'status': "ok", 'file': "",
+                       'points': 0, 'kept_points': 0, 'bytes': 0, 'seconds': 0.0}
+
+                if setup_error is not None:
+                    row['status'] = setup_error
+                    rows.append(row)
+                    continue
+
+                try:
+                    args = (indicator, target_date) if needs_date else (indicator,)
+                    fig = function(*args, output = None, auto_open = False, show = False)
+
+                    if fig is None:
+                        row['status'] = "no data"
+                    else:
+                        fig, row['points'], row['kept_points'] = to_webgl(fig, max_points)
+                        path = os.path.join(house_dir, name + ("_" + target_date if target_date else "") + ".html")
+                        fig.write_html(path, include_plotlyjs = "../" + BUNDLE_FILE, auto_open = False)
+                        row['file'] = path
+                        row['bytes'] = os.path.getsize(path)
+                except Exception as e:
+                    row['status'] = "error: " + type(e).__name__ + ": " + str(e)
+
+                row['seconds'] = time.perf_counter() - start_time
+                rows.append(row)
+
+    return rows
+
+def run_report(house_ids, dates, plots = tuple(PLOTS), output_dir = REPORT_DIR, workers = None, max_points = MAX_POINTS,
+               n = 10, cache_bytes = 256 * 1024 ** 2):  # Raport pentru mai multe case si zile, in paralel
+    unknown = [name for name in plots if name not in PLOTS]
+    if unknown:
+        raise ValueError("Grafice necunoscute: " + ", ".join(unknown) + ". Disponibile: " + ", ".join(PLOTS))
+
+    os.makedirs(output_dir, exist_ok = True)
+    write_bundle(output_dir)
+
+    start_time = time.perf_counter()
+    rows = []
+
+    with ProcessPoolExecutor(max_workers = workers, initializer = init_worker, initargs = (cache_bytes,)) as executor:
+        futures = {executor.submit(render_house, int(house_id), list(dates), list(plots), output_dir, max_points, n): int(house_id)
+                   for house_id in house_ids}
+
+        for i, future in enumerate(as_completed(futures)):
+            house_rows = future.result()
+            rows.extend(house_rows)
+            print("[" + str(i + 1) + "/" + str(len(futures)) + "] casa " + str(futures[future]) + ": " +
+                  str(sum(r['status'] == "ok" for r in house_rows)) + " grafice, " +
+                  str(round(sum(r['bytes'] for r in house_rows) / 1024, 1)) + " KB, " +
+                  str(round(sum(r['seconds'] for r in house_rows), 2)) + " s")
+
+    summary = pd.DataFrame(rows)
+    summary.to_csv(os.path.join(output_dir, SUMMARY_FILE), index = False)
+
+    ok = summary[summary['status'] == "ok"] if not summary.empty else summary
+    print("Raport: " + str(len(ok)) + " fisiere, " + str(round(ok['bytes'].sum() / 1024 ** 2, 2) if len(ok) else 0) + " MB (+ " +
+          str(round(os.path.getsize(os.path.join(output_dir, BUNDLE_FILE)) / 1024 ** 2, 2)) + " MB plotly.js comun), " +
+          str(round(time.perf_counter() - start_time, 2)) + " s")
+    return summary
@@ -0,0 +1,122 @@
+import os
+import json
+import shutil
+import pandas as pd
+import dataset
+import instrument
+import sqlite_store
+import storage
+from energy_processing import day_bounds
+
+########## Agregari precalculate ale consumului, pe casa ##########
+
+# Dupa curatare, consumul fiecarei case este agregat o singura data pe 10 minute, pe ore, pe zile
+# si pe ore pentru fiecare aparat. Graficele citesc doar aceste tabele mici, deci timpul de plotare
+# nu depinde de dimensiunea tabelului brut.
+# Structura: Database/Store/Rollups/HouseIDREF=<id>/<nivel>.parquet
+# Valorile sunt sumele brute din Consumption (W / 10 min); conversia in kWh ramane la apelant.
+# Epoch-urile sunt in UTC, ca in restul proiectului (pd.to_datetime(..., unit = 's')).
+# Cu baza SQLite activa agregarile sunt calculate direct in SQL (GROUP BY pe indexul casei).
+
+ROLLUP_DIR = "Database/Store/Rollups"
+
+LEVELS = {  # nivel -> (coloana de timp, pasul in secunde)
+    '10min': ('Interval', 600),
+    'hourly': ('Hour', 3600),
+    'daily': ('Day', 86400),
+    'appliance_hourly': ('Hour', 3600),
+}
+
+def house_dir(house_id, root = ROLLUP_DIR):
+    return os.path.join(root, "HouseIDREF=" + str(int(house_id)))
+
+def rollups_available():  # Agregarile exista si sunt construite din Consumption.csv-ul curent
+    marker = os.path.join(ROLLUP_DIR, storage.MARKER_FILE)
+    if not os.path.exists(marker):
+        return False
+
+    with open(marker) as fh:
+        info = json.load(fh)
+    return info.get('source_version') == list(storage.table_version('Consumption') or [])
+
+def compute_rollups(df):  # Toate nivelurile de agregare pentru consumul unei case
+    epochs = df['EpochTime'].astype('int64')
+    values = df['Value'].astype('float64')
+    rollups = {}
+
+    for level, (column, step) in LEVELS.items():
+        keys = [(epochs - epochs % step).rename(column)]  # Prima cheie e timpul, deci fiecare tabel e sortat dupa epoch
+        if level == 'appliance_hourly':
+            keys = keys + [df['ApplianceIDREF'].rename('ApplianceIDREF')]
+        rollups[level] = values.groupby(keys).sum().rename('Value').reset_index()
+
+    return rollups
+
+def sql_rollups(house_id):  # Aceleasi niveluri ca compute_rollups, agregate de SQLite
+    return {level: sqlite_store.consumption_rollup(house_id, column, step, by_appliance = level == 'appliance_hourly')
+            for level, (column, step) in LEVELS.items()}
+
+@instrument.profiled("rollup.build_rollups")
+def build_rollups(house_ids = None):  # Construieste agregarile pentru toate casele (dupa curatare)
+    if house_ids is None:
+        house_ids = dataset.read_table('House')['ID'].tolist()
+
+    tmp_root = ROLLUP_DIR + ".tmp"
+    if os.path.exists(tmp_root):
+        shutil.rmtree(tmp_root)
+    os.makedirs(tmp_root)
+
+    for house_id in house_ids:
+        if sqlite_store.ENABLED:
+            rollups = sql_rollups(house_id)
+        else:
+            rollups = compute_rollups(storage.load_consumption(house_id, columns = ['ApplianceIDREF', 'EpochTime', 'Value']))
+
+        directory = house_dir(house_id, tmp_root)
+        os.makedirs(directory)
+
+        for level, rollup in rollups.items():
+            rollup.to_parquet(os.path.join(directory, level + ".parquet"), index = False)
+
+    with open(os.path.join(tmp_root, storage.MARKER_FILE), "w") as fh:
+        json.dump({'source_version': list(storage.table_version('Consumption') or []),
+                   'houses': sorted(int(h) for h in house_ids)}, fh)
+
+    if os.path.exists(ROLLUP_DIR):
+        shutil.rmtree(ROLLUP_DIR)
+    os.replace(tmp_root, ROLLUP_DIR)
+    dataset.invalidate('Rollup')
+
+    print("Agregari de consum construite pentru " + str(len(house_ids)) + " case.")
+
+def house_rollup(house_id, level):  # Agregarea ceruta pentru o casa, din cache / de pe disc
+    version = storage.table_version('Consumption')
+
+    def loader():
+        path = os.path.join(house_dir(house_id), level + ".parquet")
+        if rollups_available() and os.path.exists(path):
+            return pd.read_parquet(path)
+
+        # Agregarile lipsesc sau sunt mai vechi decat CSV-ul: le calculam doar pentru casa ceruta
+        if sqlite_store.ENABLED:
+            rollups = sql_rollups(house_id)
+        else:
+            rollups = compute_rollups(dataset.house_consumption(house_id, columns = ['ApplianceIDREF', 'EpochTime', 'Value']))
+        for other, rollup in rollups.items():
+            if other != level:
+                dataset.cache.put(('Rollup', int(house_id), other), rollup, version)
+        return rollups[level]
+
+    return dataset.cache.get(('Rollup', int(house_id), level), loader, version)
+
+def query(house_id, level, start_epoch = None, end_epoch = None):  # Randurile unei agregari in intervalul [start, end), prin cautare binara
+    df = house_rollup(house_id, level)
+    epochs = df[LEVELS[level][0]].to_numpy()
+
+    first = 0 if start_epoch is None else int(epochs.searchsorted(start_epoch, side = 'left'))
+    last = len(epochs) if end_epoch is None else int(epochs.searchsorted(end_epoch, side = 'left'))
+    return df.iloc[first:max(first, last)].reset_index(drop = True)
+
+def query_day(house_id, level, target_date):  # Randurile unei agregari dintr-o singura zi (UTC)
+    start, end = day_bounds(target_date)
+    return query(house_id, level, start, end)
@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+
+########## Tipuri compacte pentru tabelele din Database/ ##########
+
+# Epoch-urile si ID-urile incap in int32, variabilele meteo si tipurile de aparate in int8,
+# iar numele / locatiile se repeta, deci sunt categorice.
+# Valorile reale sunt trecute in float32 doar daca conversia e exacta (FLOAT_POLICY = "lossless"),
+# astfel incat rezultatele numerice raman identice; cu FLOAT_POLICY = "float32" se forteaza mereu.
+
+FLOAT_POLICY = "lossless"
+REPORT_MEMORY = False  # Afiseaza memoria inainte / dupa la fiecare incarcare
+
+TABLE_DTYPES = {
+    'House': {'ID': 'int32', 'ZIPcode': 'int32', 'Location': 'category', 'WeatherStationIDREF': 'int32',
+              'StartingEpochTime': 'int32', 'EndingEpochTime': 'int32'},
+    'Appliance': {'ID': 'int32', 'HouseIDREF': 'int32', 'Name': 'category', 'TypeIDREF': 'int8'},
+    'ApplianceType': {'ID': 'int8', 'Name': 'category'},
+    'Consumption': {'HouseIDREF': 'int32', 'ApplianceIDREF': 'int32', 'EpochTime': 'int32', 'Value': 'float32'},
+    'WeatherStation': {'ID': 'int32', 'Location': 'category', 'Longitude': 'float64', 'Latitude': 'float64',
+                       'StartingEpochTime': 'int32', 'EndingEpochTime': 'int32'},
+    'WeatherData': {'WeatherStationIDREF': 'int32', 'WeatherVariableIDREF': 'int8', 'EpochTime': 'int32', 'Value': 'float32'},
+    'WeatherVariable': {'ID': 'int8', 'Name': 'category'},
+    'Record': {'WeatherStationIDREF': 'int32', 'WeatherVariableIDREF': 'int8'},
+}
+
+def table_dtypes(table):
+    return TABLE_DTYPES.get(table, {})
+
+def read_dtypes(table):  # Tipurile care pot fi date direct lui read_csv (intregi si categorice)
+    return {c: t for c, t in table_dtypes(table).items() if not t.startswith('float')}
+
+def memory_bytes(df):
+    return int(df.memory_usage(index = True, deep = True).sum())
+
+def downcast_float(series, policy = None):  # float32 daca nu se pierde nimic (sau daca e fortat)
+    policy = FLOAT_POLICY if policy is None else policy
+    values = series.to_numpy(dtype = np.float64)
+    compact = values.astype(np.float32)
+
+    if policy == "float32" or np.array_equal(compact.astype(np.float64), values, equal_nan = True):
+        return pd.Series(compact, index = series.index, name = series.name)
+    return series.astype('float64')
+
+def apply_schema(df, table, policy = None):  # Aplica tipurile compacte pe coloanele cunoscute ale unui tabel
+    before = memory_bytes(df) if REPORT_MEMORY else 0
+    converted = {}
+
+    for column, dtype in table_dtypes(table).items():
+        if column not in df.columns or str(df[column].dtype) == dtype:
+            continue
+
+        if dtype.startswith('float'):
+            if dtype == 'float32':
+                converted[column] = downcast_float(df[column], policy)
+            else:
+                converted[column] = df[column].astype(dtype)
+        elif dtype.startswith('int') and df[column].isna().any():
+            continue  # Valori lipsa: coloana ramane cum e
+        else:
+            converted[column] = df[column].astype(dtype)
+
+    if converted:
+        df = df.assign(**converted)
+
+    if REPORT_MEMORY:
+        print_memory(table, before, memory_bytes(df))
+    return df
+
+def read_csv(path, table, **kwargs):  # read_csv cu tipurile compacte aplicate inca de la parsare
+    try:
+        df = pd.read_csv(path, dtype = read_dtypes(table), **kwargs)
+    except (ValueError, TypeError):  # De ex. ID-uri lipsa care nu incap in int32
+        df = pd.read_csv(path, **kwargs)
+    return apply_schema(df, table)
+
+def print_memory(table, before, after):
+    print(table + ": " + str(round(before / 1024 ** 2, 2)) + " MB -> " + str(round(after / 1024 ** 2, 2)) + " MB")
+
+def memory_report(table, path):  # Compara memoria cu tipurile implicite si cu schema compacta
+    default_df = pd.read_csv(path)
+    compact_df = read_csv(path, table)
+
+    before = memory_bytes(default_df)
+    after = memory_bytes(compact_df)
+    print_memory(table, before, after)
+
+    return {'table': table, 'default_bytes': before, 'compact_bytes': after,
+            'ratio': after / before if before else 1.0,
+            'dtypes': {c: str(t) for c, t in compact_df.dtypes.items()}}
@@ -0,0 +1,193 @@
+import os
+import sqlite3
+from contextlib import closing
+import pandas as pd
+import instrument
+import schema
+
+########## Baza SQLite (optionala) cu tabelele din Database/ ##########
+
+# Toate tabelele (House, Appliance, ApplianceType, Consumption, WeatherStation, WeatherData, WeatherVariable,
+# Record) sunt importate o data din CSV-uri intr-un singur fisier SQLite, cu indexuri pe cheile folosite la citire:
+#   Consumption (HouseIDREF, EpochTime), Consumption (ApplianceIDREF, EpochTime),
+#   WeatherData (WeatherStationIDREF, WeatherVariableIDREF, EpochTime).
+# Indexurile pe casa / statie contin si Value (index acoperitor): citirea unei partitii si agregarile
+# se fac doar din index, fara cautarea fiecarui rand in tabel (de ~2-3 ori mai rapid).
+# Cu ENABLED = True (enable() sau main.py --sqlite) storage / dataset citesc din baza in locul CSV-urilor:
+# partitia unei case / statii e o interogare pe index, agregarile pe ore / zile sunt facute in SQL,
+# iar curatarea sterge randurile cu DELETE pe index, fara rescrierea fisierelor.
+# Dupa import baza e sursa datelor; CSV-urile si store-ul Parquet nu mai sunt modificate.
+
+SQLITE_PATH = "Database/database.sqlite"
+ENABLED = False
+CHUNK_SIZE = 1_000_000  # Randuri citite odata din CSV la import
+
+PRIMARY_KEYS = {  # ID-ul aparatului e unic doar in casa lui
+    'House': ['ID'], 'Appliance': ['HouseIDREF', 'ID'], 'ApplianceType': ['ID'], 'WeatherStation': ['ID'], 'WeatherVariable': ['ID'],
+}
+
+INDEXES = {  # Tabel -> coloanele fiecarui index
+    'Consumption': [['HouseIDREF', 'EpochTime', 'Value'], ['ApplianceIDREF', 'EpochTime']],
+    'WeatherData': [['WeatherStationIDREF', 'WeatherVariableIDREF', 'EpochTime', 'Value']],
+    'House': [['WeatherStationIDREF']],
+    'Record': [['WeatherStationIDREF', 'WeatherVariableIDREF']],
+}
+
+PARTITION_KEYS = {'Consumption': 'HouseIDREF', 'WeatherData': 'WeatherStationIDREF'}
+
+PARTITION_ORDER = {  # Ordinea randurilor unei partitii, ca in store-ul Parquet
+    'Consumption': ['EpochTime', 'ApplianceIDREF'],
+    'WeatherData': ['WeatherVariableIDREF', 'EpochTime'],
+}
+
+def enable(path = None):  # Citirile si curatarea folosesc baza SQLite
+    global ENABLED, SQLITE_PATH
+    path = path or SQLITE_PATH
+    if not os.path.exists(path):
+        raise ValueError("Baza SQLite " + path + " nu exista (importul se face cu main.py import-sqlite).")
+    SQLITE_PATH = path
+    ENABLED = True
+
+def disable():
+    global ENABLED
+    ENABLED = False
+
+def connect(path = None):  # Conexiune noua la fiecare operatie: sigur si in procesele worker
+    return sqlite3.connect(path or SQLITE_PATH)
+
+def version():  # Versiunea bazei pe disc (mtime, dimensiune), ca pentru CSV-uri
+    if not os.path.exists(SQLITE_PATH):
+        return None
+    stat = os.stat(SQLITE_PATH)
+    return (stat.st_mtime, stat.st_size)
+
+def column_type(dtype):
+    if dtype.startswith('int'):
+        return "INTEGER"
+    if dtype.startswith('float'):
+        return "REAL"
+    return "TEXT"
+
+def index_name(table, columns):
+    return "idx_" + table + "_" + "_".join(columns)
+
+def create_table(con, table, columns):  # Tabelul cu tipurile din schema; coloanele necunoscute raman fara tip
+    dtypes = schema.table_dtypes(table)
+    definitions = ['"' + column + '" ' + column_type(dtypes.get(column, 'object')) for column in columns]
+    if table in PRIMARY_KEYS:
+        definitions.append("PRIMARY KEY (" + ", ".join('"' + c + '"' for c in PRIMARY_KEYS[table]) + ")")
+    con.execute('CREATE TABLE "' + table + '" (' + ", ".join(definitions) + ")")
+
+def create_indexes(con, table):
+    for columns in INDEXES.get(table, []):
+        con.execute('CREATE INDEX IF NOT EXISTS ' + index_name(table, columns) + ' ON "' + table + '" (' +
+                    ", ".join('"' + c + '"' for c in columns) + ")")
+
+@instrument.profiled("sqlite.import_csv")
+def import_csv(database_dir = "Database", path = None, chunksize = CHUNK_SIZE):  # Importul tuturor CSV-urilor intr-o baza noua
+    path = path or SQLITE_PATH
+    tmp_path = path + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    counts = {}
+    with closing(connect(tmp_path)) as con:
+        con.execute("PRAGMA journal_mode = OFF")  # Baza temporara: la eroare e stearsa si importul reluat
+        con.execute("PRAGMA synchronous = OFF")
+
+        for table in schema.TABLE_DTYPES:
+            source = os.path.join(database_dir, table + ".csv")
+            if not os.path.exists(source):
+                print("Fisierul " + source + " nu exista, tabelul " + table + " este sarit.")
+                continue
+
+            create_table(con, table, list(pd.read_csv(source, nrows = 0).columns))
+            rows = 0
+            for chunk in pd.read_csv(source, dtype = schema.read_dtypes(table), chunksize = chunksize):
+                chunk.to_sql(table, con, if_exists = "append", index = False)
+                rows += len(chunk)
+
+            create_indexes(con, table)  # Dupa incarcare: indexul e construit o singura data, sortat
+            con.commit()
+            counts[table] = rows
+            print(str(rows) + " randuri importate din " + source)
+
+        con.execute("ANALYZE")
+        con.commit()
+
+    os.replace(tmp_path, path)
+    print("Baza SQLite scrisa in " + path)
+    return counts
+
+def query(sql, params = (), table = None):  # Rezultatul unei interogari, cu tipurile compacte ale tabelului
+    with closing(connect()) as con:
+        df = pd.read_sql_query(sql, con, params = params)
+    return schema.apply_schema(df, table) if table is not None else df
+
+def execute(sql, params = ()):  # O instructiune de modificare; intoarce numarul de randuri atinse
+    with closing(connect()) as con:
+        with con:
+            return con.execute(sql, params).rowcount
+
+def execute_many(sql, rows):
+    with closing(connect()) as con:
+        with con:
+            return con.executemany(sql, rows).rowcount
+
+def select_list(columns):
+    return "*" if columns is None else ", ".join('"' + c + '"' for c in columns)
+
+def read_table(table, columns = None):  # Tabelul complet
+    return query('SELECT ' + select_list(columns) + ' FROM "' + table + '"', table = table)
+
+def load_partition(table, key_value, columns = None):  # Randurile unei case / statii, prin index
+    key = PARTITION_KEYS[table]
+    order = ", ".join(PARTITION_ORDER[table])
+    return query('SELECT ' + select_list(columns) + ' FROM "' + table + '" WHERE ' + key + ' = ? ORDER BY ' + order,
+                 (int(key_value),), table)
+
+def load_weather(station_id, variable_id, columns = None):  # O singura variabila a unei statii; indexul acopera ambele filtre
+    return query('SELECT ' + select_list(columns) + ' FROM WeatherData WHERE WeatherStationIDREF = ? AND WeatherVariableIDREF = ? '
+                 'ORDER BY EpochTime', (int(station_id), int(variable_id)), 'WeatherData')
+
+def list_partitions(table):  # ID-urile distincte ale cheii de partitionare (citite din index)
+    return distinct(table, PARTITION_KEYS[table])
+
+def distinct(table, column):
+    with closing(connect()) as con:
+        return sorted(int(row[0]) for row in con.execute('SELECT DISTINCT "' + column + '" FROM "' + table + '"'))
+
+@instrument.profiled("sqlite.hourly_consumption")
+def hourly_consumption(house_id):  # Consumul orar (kWh) al unei case, agregat in SQL: HourEpoch, Value
+    return query("SELECT EpochTime - EpochTime % 3600 AS HourEpoch, SUM(Value) / 6000.0 AS Value FROM Consumption "
+                 "WHERE HouseIDREF = ? GROUP BY HourEpoch ORDER BY HourEpoch", (int(house_id),))
+
+def consumption_rollup(house_id, column, step, by_appliance = False):  # Sumele brute (W / 10 min) pe pasi de `step` secunde
+    keys = column + (", ApplianceIDREF" if by_appliance else "")
+    return query("SELECT EpochTime - EpochTime % ? AS " + column + (", ApplianceIDREF" if by_appliance else "") +
+                 ", SUM(Value) AS Value FROM Consumption WHERE HouseIDREF = ? GROUP BY " + keys + " ORDER BY " + keys,
+                 (int(step), int(house_id)))
+
+def write_table(table, df):  # Inlocuieste continutul unui tabel (tabelele mici, la curatare)
+    with closing(connect()) as con:
+        with con:
+            con.execute('DELETE FROM "' + table + '"')
+            df.to_sql(table, con, if_exists = "append", index = False)
+
+def append_rows(table, df):  # Randuri noi (ingestie); indexurile sunt actualizate de SQLite
+    with closing(connect()) as con:
+        header = [row[1] for row in con.execute('PRAGMA table_info("' + table + '")')]
+        missing = [c for c in header if c not in df.columns]
+        if missing:
+            raise ValueError("Lipsesc coloanele " + ", ".join(missing) + " pentru tabelul " + table + ".")
+
+        with con:
+            schema.apply_schema(df[header], table).to_sql(table, con, if_exists = "append", index = False)
+    return len(df)
+
+def delete_rows(table, column, ids):  # DELETE pe index pentru fiecare ID; intoarce numarul de randuri sterse
+    return execute_many('DELETE FROM "' + table + '" WHERE "' + column + '" = ?', [(int(i),) for i in ids])
+
+def update_values(table, row_ids, values):  # Value nou pentru randurile date prin rowid
+    return execute_many('UPDATE "' + table + '" SET Value = ? WHERE rowid = ?',
+                        zip((float(v) for v in values), (int(r) for r in row_ids)))
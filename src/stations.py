@@ -0,0 +1,161 @@
+import numpy as np
+import pandas as pd
+import dataset
+import instrument
+import storage
+
+########## Radiatie pentru statiile fara masuratori: cele mai apropiate statii cu radiatie ##########
+
+# Statiile sunt puse intr-un KD-tree (scipy cKDTree) dupa pozitia pe sfera (x, y, z din Longitude / Latitude),
+# astfel incat cei mai apropiati vecini sunt cei dupa distanta reala, nu dupa diferenta de grade.
+# Pentru o statie fara radiatie, seria se obtine prin ponderare cu inversul distantei (IDW) din cele mai
+# apropiate NEIGHBOURS statii cu radiatie, aflate la cel mult MAX_DISTANCE_KM.
+# Vecinii tuturor statiilor din House.csv se calculeaza o singura data (o singura interogare a arborelui),
+# iar seriile interpolate sunt pastrate in cache-ul de date pe setul de statii si ponderi.
+# Statiile cu radiatie sunt cele care au variabila 4 in WeatherData (nu dupa Record.csv, care poate fi incomplet);
+# lista e calculata o data pe versiunea tabelului.
+
+RADIATION_VARIABLE = 4
+RADIATION_FALLBACK = True  # False: casele fara radiatie la statia lor sunt eliminate, ca inainte
+NEIGHBOURS = 3
+IDW_POWER = 2
+MAX_DISTANCE_KM = 100.0
+EARTH_RADIUS_KM = 6371.0
+
+def to_xyz(longitude, latitude):  # Punctele pe sfera unitate
+    lon = np.radians(np.asarray(longitude, dtype = np.float64))
+    lat = np.radians(np.asarray(latitude, dtype = np.float64))
+    return np.column_stack((np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)))
+
+def chord_to_km(chord):  # Coarda pe sfera unitate -> distanta pe suprafata (km)
+    return 2 * np.arcsin(np.minimum(np.asarray(chord) / 2, 1.0)) * EARTH_RADIUS_KM
+
+def km_to_chord(km):
+    return 2 * np.sin(np.minimum(km / EARTH_RADIUS_KM, np.pi) / 2)
+
+def radiation_stations():  # Statiile care au radiatie in WeatherData
+    version = storage.table_version('WeatherData')
+
+    def loader():
+        # Daca tabelul complet e deja in memorie (curatarea in memorie), nu mai citim nimic de pe disc
+        if dataset.cache.contains(('WeatherData', None), version):
+            df = dataset.read_table('WeatherData', ['WeatherStationIDREF', 'WeatherVariableIDREF'])
+            ids = df.loc[df['WeatherVariableIDREF'] == RADIATION_VARIABLE, 'WeatherStationIDREF'].astype(int).unique()
+        else:
+            ids = storage.stations_with_variable(RADIATION_VARIABLE)
+        return pd.DataFrame({'StationID': np.sort(np.asarray(ids, dtype = np.int64))})
+
+    return set(dataset.cache.get(('WeatherData', 'radiation_stations'), loader, version)['StationID'].astype(int))
+
+def build_lookup(station_ids, df_station, candidates, k = NEIGHBOURS, power = IDW_POWER, max_distance_km = MAX_DISTANCE_KM):
+    # Vecinii cu radiatie pentru toate statiile cerute, dintr-o singura interogare.
+    # Rezultat: un rand pe (statie, vecin) cu distanta si ponderea normalizata.
+    from scipy.spatial import cKDTree  # Importat doar cand e nevoie de interpolare
+
+    columns = ['StationID', 'DonorID', 'Distance', 'Weight']
+    station_ids = np.unique(np.asarray(list(station_ids), dtype = np.int64))
+    positions = df_station.drop_duplicates('ID').set_index('ID')[['Longitude', 'Latitude']].astype(np.float64)
+
+    own = np.isin(station_ids, list(candidates))
+    rows = [pd.DataFrame({'StationID': station_ids[own], 'DonorID': station_ids[own], 'Distance': 0.0, 'Weight': 1.0})]
+
+    donors = positions[positions.index.isin(list(candidates))].dropna()
+    queries = positions.reindex(station_ids[~own]).dropna()  # Statiile fara coordonate nu pot fi interpolate
+
+    if len(donors) and len(queries):
+        tree = cKDTree(to_xyz(donors['Longitude'], donors['Latitude']))
+        k = min(k, len(donors))
+        chords, index = tree.query(to_xyz(queries['Longitude'], queries['Latitude']), k = k,
+                                   distance_upper_bound = km_to_chord(max_distance_km))
+        chords = chords.reshape(len(queries), k)
+        index = index.reshape(len(queries), k)
+
+        found = np.isfinite(chords)  # Vecinii peste distanta maxima lipsesc (distanta inf)
+        distance = chord_to_km(np.where(found, chords, 0.0))
+        weights = np.where(found, 1 / np.maximum(distance, 1e-6) ** power, 0.0)
+        totals = weights.sum(axis = 1, keepdims = True)
+        weights = np.divide(weights, totals, out = np.zeros_like(weights), where = totals > 0)
+
+        station_column = np.repeat(queries.index.to_numpy(np.int64), k)
+        rows.append(pd.DataFrame({
+            'StationID': station_column[found.ravel()],
+            'DonorID': donors.index.to_numpy(np.int64)[np.minimum(index, len(donors) - 1)].ravel()[found.ravel()],
+            'Distance': distance.ravel()[found.ravel()],
+            'Weight': weights.ravel()[found.ravel()],
+        }))
+
+    return pd.concat(rows, ignore_index = True)[columns]
+
+def fleet_lookup(k = NEIGHBOURS, power = IDW_POWER, max_distance_km = MAX_DISTANCE_KM):  # Vecinii statiilor tuturor caselor, o data pe proces
+    version = tuple(storage.table_version(table) for table in ('House', 'WeatherStation', 'WeatherData'))
+
+    def loader():
+        station_ids = dataset.read_table('House')['WeatherStationIDREF'].dropna().astype(int)
+        return build_lookup(station_ids, dataset.read_table('WeatherStation'), radiation_stations(), k, power, max_distance_km)
+
+    return dataset.cache.get(('RadiationLookup', k, power, max_distance_km), loader, version)
+
+def station_donors(station_id, k = NEIGHBOURS, power = IDW_POWER, max_distance_km = MAX_DISTANCE_KM):  # (vecini, ponderi) pentru o statie
+    lookup = fleet_lookup(k, power, max_distance_km)
+    rows = lookup[lookup['StationID'] == station_id]
+
+    if rows.empty and station_id not in set(lookup['StationID']):  # Statie care nu apartine niciunei case
+        rows = build_lookup([station_id], dataset.read_table('WeatherStation'), radiation_stations(), k, power, max_distance_km)
+
+    return tuple(rows['DonorID'].astype(int)), tuple(rows['Weight'].astype(float))
+
+@instrument.profiled("stations.interpolated_radiation")
+def interpolated_radiation(station_id, k = NEIGHBOURS, power = IDW_POWER, max_distance_km = MAX_DISTANCE_KM):
+    # Seria de radiatie (EpochTime, Value) pentru o statie fara masuratori; goala daca nu are vecini.
+    # La fiecare moment se folosesc doar vecinii cu valoare, cu ponderile renormalizate.
+    donors, weights = station_donors(station_id, k, power, max_distance_km)
+    if not donors:
+        return pd.DataFrame({'EpochTime': pd.Series(dtype = 'int64'), 'Value': pd.Series(dtype = 'float64')})
+
+    def loader():
+        parts = []
+        for donor, weight in zip(donors, weights):
+            df = dataset.station_weather(donor, columns = ['EpochTime', 'Value'], variable_id = RADIATION_VARIABLE)
+            parts.append(pd.DataFrame({'EpochTime': df['EpochTime'].to_numpy(np.int64),
+                                       'Weighted': df['Value'].to_numpy(np.float64) * weight, 'Weight': weight}))
+
+        grouped = pd.concat(parts, ignore_index = True).groupby('EpochTime')[['Weighted', 'Weight']].sum()
+        return pd.DataFrame({'EpochTime': grouped.index.to_numpy(np.int64),
+                             'Value': (grouped['Weighted'] / grouped['Weight']).to_numpy()})
+
+    version = storage.table_version('WeatherData')
+    key = ('RadiationIDW', donors, tuple(round(w, 12) for w in weights))
+    return dataset.cache.get(key, loader, version)
+
+########## Radiatia si productia pe panou, o data pe statie ##########
+
+# Casele cu aceeasi statie meteo au aceeasi radiatie, deci seria (inclusiv cea interpolata) e calculata o data
+# pe statie si pastrata in cache-ul de date. La fel productia unui singur panou pentru (Pm, f, GTSTC):
+# productia pentru n panouri e doar aceasta serie inmultita cu n.
+# Cheile incep cu 'WeatherData', deci sunt sterse odata cu datele meteo (append_rows / write_table).
+
+def station_radiation(station_id):  # Radiatia statiei (EpochTime, Value), sumata pe epoch; goala daca nu exista
+    def loader():
+        df = dataset.station_weather(station_id, columns = ['EpochTime', 'Value'], variable_id = RADIATION_VARIABLE)
+
+        if df.empty and RADIATION_FALLBACK:  # Statia nu masoara radiatia: interpolare din statiile apropiate
+            df = interpolated_radiation(station_id)
+            if not df.empty:
+                instrument.log("Statia " + str(station_id) + " nu are radiatie; se foloseste interpolarea din statiile " +
+                               str(list(station_donors(station_id)[0])))
+
+        grouped = df.astype({'EpochTime': 'int64', 'Value': 'float64'}).groupby('EpochTime')['Value'].sum()
+        return pd.DataFrame({'EpochTime': grouped.index.to_numpy(np.int64), 'Value': grouped.to_numpy(np.float64)})
+
+    version = storage.table_version('WeatherData')
+    return dataset.cache.get(('WeatherData', 'radiation', int(station_id), RADIATION_FALLBACK), loader, version)
+
+def panel_production(station_id, Pm = 575, f = 0.8, GTSTC = 1000):  # Productia unui panou (kWh pe pas), pe epoch-urile radiatiei
+    def loader():
+        radiation = station_radiation(station_id)
+        return pd.DataFrame({'EpochTime': radiation['EpochTime'].to_numpy(np.int64),
+                             'Value': Pm * f * radiation['Value'].to_numpy(np.float64) / GTSTC / 6000})  # W*10min -> kWh
+
+    version = storage.table_version('WeatherData')
+    key = ('WeatherData', 'production', int(station_id), RADIATION_FALLBACK, float(Pm), float(f), float(GTSTC))
+    return dataset.cache.get(key, loader, version)
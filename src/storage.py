@@ -0,0 +1,285 @@
+import os
+import json
+import time
+import shutil
+import pandas as pd
+import pyarrow.parquet as pq
+import instrument
+import schema
+import sqlite_store
+
+########## Stocare columnara (Parquet) partitionata pe casa / statie meteo ##########
+
+# Conversia se face o singura data (dupa curatare), apoi fiecare clasa citeste doar
+# partitia si coloanele de care are nevoie, in loc sa parcurga tot CSV-ul.
+# Structura: Database/Store/<Tabel>/<Cheie>=<id>/part-0.parquet
+# Coloana de partitionare nu e scrisa in fisier, se deduce din numele directorului.
+# Cu baza SQLite activa (sqlite_store.ENABLED) citirile si adaugarile merg direct in baza.
+
+DATABASE_DIR = "Database"
+STORE_DIR = "Database/Store"
+MARKER_FILE = "_SUCCESS"
+CHUNK_SIZE = 2_000_000
+
+PARTITION_KEYS = {
+    'Consumption': 'HouseIDREF',
+    'WeatherData': 'WeatherStationIDREF',
+}
+
+SORT_COLUMNS = {
+    'Consumption': ['EpochTime', 'ApplianceIDREF'],
+    'WeatherData': ['WeatherVariableIDREF', 'EpochTime'],
+}
+
+def csv_path(table):
+    return os.path.join(DATABASE_DIR, table + ".csv")
+
+def table_version(table):  # Versiunea sursei unui tabel pe disc: CSV-ul sau baza SQLite (mtime, dimensiune)
+    path = sqlite_store.SQLITE_PATH if sqlite_store.ENABLED else csv_path(table)
+    if not os.path.exists(path):
+        return None
+    stat = os.stat(path)
+    return (stat.st_mtime, stat.st_size)
+
+def table_dir(table):
+    return os.path.join(STORE_DIR, table)
+
+def partition_dir(table, key_value):
+    return os.path.join(table_dir(table), PARTITION_KEYS[table] + "=" + str(int(key_value)))
+
+def cast_columns(df, table):  # Aplica tipurile compacte pe coloanele cunoscute
+    return schema.apply_schema(df, table)
+
+def store_available(table):  # Store-ul exista si nu e mai vechi decat CSV-ul sursa
+    marker = os.path.join(table_dir(table), MARKER_FILE)
+    if not os.path.exists(marker):
+        return False
+
+    source = csv_path(table)
+    if not os.path.exists(source):
+        return True
+
+    with open(marker) as fh:
+        info = json.load(fh)
+
+    stat = os.stat(source)
+    return info.get('source_mtime') == stat.st_mtime and info.get('source_size') == stat.st_size
+
+def begin_store(table):  # Directorul temporar in care se scriu partitiile noi
+    tmp_target = table_dir(table) + ".tmp"
+    if os.path.exists(tmp_target):
+        shutil.rmtree(tmp_target)
+    os.makedirs(tmp_target)
+    return tmp_target
+
+def write_partition(tmp_target, table, key_value, df):  # Scrie o partitie completa, sortata, fara coloana cheie
+    key = PARTITION_KEYS[table]
+    directory = os.path.join(tmp_target, key + "=" + str(int(key_value)))
+    os.makedirs(directory, exist_ok = True)
+
+    df = cast_columns(df, table).drop(columns = [key])
+    df = df.sort_values(by = SORT_COLUMNS[table], kind = 'stable').reset_index(drop = True)
+    df.to_parquet(os.path.join(directory, "part-0.parquet"), index = False)
+
+def commit_store(table, tmp_target, partitions, rows):  # Marcheaza store-ul ca valid pentru CSV-ul curent si il muta la locul lui
+    stat = os.stat(csv_path(table))
+
+    with open(os.path.join(tmp_target, MARKER_FILE), "w") as fh:
+        json.dump({'source_mtime': stat.st_mtime, 'source_size': stat.st_size, 'rows': rows,
+                   'partitions': sorted(int(p) for p in partitions)}, fh)
+
+    target = table_dir(table)
+    if os.path.exists(target):
+        shutil.rmtree(target)
+    os.replace(tmp_target, target)
+
+@instrument.profiled("store.convert_table")
+def convert_table(table, chunksize = CHUNK_SIZE):  # Conversie CSV -> Parquet partitionat, citind CSV-ul pe bucati
+    source = csv_path(table)
+    if not os.path.exists(source):
+        print("Fisierul " + source + " nu exista, conversia este sarita.")
+        return 0
+
+    key = PARTITION_KEYS[table]
+    tmp_target = begin_store(table)
+    rows = 0
+    partitions = set()
+
+    # Pas 1: fiecare bucata din CSV e scrisa ca fisier separat in partitia ei
+    for chunk_index, chunk in enumerate(pd.read_csv(source, dtype = schema.read_dtypes(table), chunksize = chunksize)):
+        chunk = cast_columns(chunk, table)
+        rows += len(chunk)
+
+        for key_value, group in chunk.groupby(key, sort = False):
+            directory = os.path.join(tmp_target, key + "=" + str(int(key_value)))
+            os.makedirs(directory, exist_ok = True)
+            group.drop(columns = [key]).to_parquet(
+                os.path.join(directory, "chunk-" + str(chunk_index).zfill(6) + ".parquet"), index = False
+            )
+            partitions.add(int(key_value))
+
+    # Pas 2: compactare intr-un singur fisier sortat per partitie
+    for key_value in partitions:
+        directory = os.path.join(tmp_target, key + "=" + str(key_value))
+        parts = sorted(f for f in os.listdir(directory) if f.endswith(".parquet"))
+
+        df = pd.concat([pd.read_parquet(os.path.join(directory, f)) for f in parts], ignore_index = True)
+        for f in parts:
+            os.remove(os.path.join(directory, f))
+
+        df[key] = key_value
+        write_partition(tmp_target, table, key_value, df)
+
+    commit_store(table, tmp_target, partitions, rows)
+
+    print(str(rows) + " randuri din " + source + " convertite in " + str(len(partitions)) + " partitii.")
+    return rows
+
+def build_store(chunksize = CHUNK_SIZE):  # Conversia tuturor tabelelor mari
+    for table in PARTITION_KEYS:
+        convert_table(table, chunksize = chunksize)
+
+def list_partitions(table):  # ID-urile (case / statii) disponibile in store
+    if sqlite_store.ENABLED:
+        return sqlite_store.list_partitions(table)
+    if not store_available(table):
+        return []
+    with open(os.path.join(table_dir(table), MARKER_FILE)) as fh:
+        return json.load(fh)['partitions']
+
+@instrument.profiled("store.read_csv_filtered")
+def read_csv_filtered(table, key_value, columns = None, chunksize = CHUNK_SIZE):  # Fallback: citire CSV pe bucati, pastrand doar partitia ceruta
+    key = PARTITION_KEYS[table]
+    usecols = None if columns is None else list(dict.fromkeys([key] + list(columns)))
+
+    pieces = []
+    dtypes = {c: t for c, t in schema.read_dtypes(table).items() if usecols is None or c in usecols}
+    for chunk in pd.read_csv(csv_path(table), usecols = usecols, dtype = dtypes, chunksize = chunksize):
+        pieces.append(chunk[chunk[key] == key_value])
+
+    df = cast_columns(pd.concat(pieces, ignore_index = True), table)
+    if columns is not None:
+        df = df[list(columns)]
+    return df
+
+@instrument.profiled("store.load_partition")
+def load_partition(table, key_value, columns = None):  # Citeste o singura partitie si doar coloanele cerute
+    if sqlite_store.ENABLED:
+        return sqlite_store.load_partition(table, key_value, columns)
+    if not store_available(table):
+        return read_csv_filtered(table, key_value, columns)
+
+    key = PARTITION_KEYS[table]
+    directory = partition_dir(table, key_value)
+    file_columns = None if columns is None else [c for c in columns if c != key]
+
+    if os.path.exists(directory):
+        df = pd.read_parquet(directory, columns = file_columns)
+    else:
+        empty = {c: pd.Series(dtype = t) for c, t in schema.table_dtypes(table).items() if c != key}
+        df = pd.DataFrame(empty)
+        if file_columns is not None:
+            df = df[file_columns]
+
+    if columns is None or key in columns:
+        df[key] = pd.Series(key_value, index = df.index, dtype = schema.table_dtypes(table)[key])
+    if columns is not None:
+        df = df[list(columns)]
+    return df
+
+def append_to_store(table, df):  # Scrie randurile noi ca fisiere separate in partitiile atinse, fara rescrierea celor existente
+    key = PARTITION_KEYS[table]
+    marker = os.path.join(table_dir(table), MARKER_FILE)
+    with open(marker) as fh:
+        info = json.load(fh)
+
+    partitions = set(info['partitions'])
+    file_name = "part-" + str(time.time_ns()) + ".parquet"
+
+    for key_value, group in df.groupby(key, sort = False):
+        directory = partition_dir(table, key_value)
+        os.makedirs(directory, exist_ok = True)
+        group = group.drop(columns = [key]).sort_values(by = SORT_COLUMNS[table], kind = 'stable')
+
+        # Fisierele din aceeasi partitie trebuie sa aiba acelasi schema (ex. Value float32 / float64)
+        existing = sorted(f for f in os.listdir(directory) if f.endswith(".parquet"))
+        if existing:
+            fields = pq.read_schema(os.path.join(directory, existing[0]))
+            group = group.astype({f.name: f.type.to_pandas_dtype() for f in fields if f.name in group.columns})
+
+        group.to_parquet(os.path.join(directory, file_name), index = False)
+        partitions.add(int(key_value))
+
+    stat = os.stat(csv_path(table))
+    info.update({'source_mtime': stat.st_mtime, 'source_size': stat.st_size, 'rows': info['rows'] + len(df),
+                 'partitions': sorted(partitions)})
+    with open(marker, "w") as fh:
+        json.dump(info, fh)
+
+def append_rows(table, df):  # Adauga randuri noi la sfarsitul CSV-ului (si in store, daca era la zi)
+    if sqlite_store.ENABLED:
+        return sqlite_store.append_rows(table, df)
+
+    source = csv_path(table)
+    header = list(pd.read_csv(source, nrows = 0).columns)
+    missing = [c for c in header if c not in df.columns]
+
+    if missing:
+        raise ValueError("Lipsesc coloanele " + ", ".join(missing) + " pentru tabelul " + table + ".")
+
+    store_valid = table in PARTITION_KEYS and store_available(table)  # Verificat inainte ca CSV-ul sa se schimbe
+    df = cast_columns(df[header], table)
+    df.to_csv(source, mode = "a", header = False, index = False)
+
+    if store_valid:
+        append_to_store(table, df)
+    return len(df)
+
+def compact_partition(table, key_value):  # Uneste fisierele adaugate la ingestie intr-un singur fisier sortat
+    directory = partition_dir(table, key_value)
+    parts = sorted(f for f in os.listdir(directory) if f.endswith(".parquet"))
+    if len(parts) < 2:
+        return
+
+    df = pd.read_parquet(directory)
+    df[PARTITION_KEYS[table]] = key_value
+
+    # Partitia noua e scrisa separat si abia apoi o inlocuieste pe cea veche
+    tmp_target = table_dir(table) + ".compact"
+    write_partition(tmp_target, table, key_value, df)
+    shutil.rmtree(directory)
+    os.replace(os.path.join(tmp_target, os.path.basename(directory)), directory)
+    shutil.rmtree(tmp_target)
+
+def load_consumption(house_id, columns = None):  # Consumul unei case
+    return load_partition('Consumption', house_id, columns)
+
+def load_weather(station_id, columns = None, variable_id = None):  # Datele meteo ale unei statii (optional o singura variabila)
+    if variable_id is None:
+        return load_partition('WeatherData', station_id, columns)
+
+    if sqlite_store.ENABLED:  # Filtrul pe variabila e facut de index
+        return sqlite_store.load_weather(station_id, variable_id, columns)
+
+    needed = None if columns is None else list(dict.fromkeys(list(columns) + ['WeatherVariableIDREF']))
+    df = load_partition('WeatherData', station_id, needed)
+    df = df[df['WeatherVariableIDREF'] == variable_id]
+    if columns is not None:
+        df = df[list(columns)]
+    return df.reset_index(drop = True)
+
+@instrument.profiled("store.stations_with_variable")
+def stations_with_variable(variable_id, chunksize = CHUNK_SIZE):  # Statiile care au cel putin un rand pentru variabila data
+    if sqlite_store.ENABLED:  # Citit din indexul (WeatherStationIDREF, WeatherVariableIDREF, ...)
+        df = sqlite_store.query("SELECT DISTINCT WeatherStationIDREF FROM WeatherData WHERE WeatherVariableIDREF = ?", (int(variable_id),))
+        return sorted(df['WeatherStationIDREF'].astype(int))
+
+    if store_available('WeatherData'):  # Doar coloana variabilei din fiecare partitie
+        return [station_id for station_id in list_partitions('WeatherData')
+                if (load_partition('WeatherData', station_id, ['WeatherVariableIDREF'])['WeatherVariableIDREF'] == variable_id).any()]
+
+    found = set()
+    columns = ['WeatherStationIDREF', 'WeatherVariableIDREF']
+    for chunk in pd.read_csv(csv_path('WeatherData'), usecols = columns, dtype = schema.read_dtypes('WeatherData'), chunksize = chunksize):
+        found.update(chunk.loc[chunk['WeatherVariableIDREF'] == variable_id, 'WeatherStationIDREF'].astype(int))
+    return sorted(found)
@@ -0,0 +1,240 @@
+import os
+import shutil
+import numpy as np
+import pandas as pd
+import storage
+
+########## Generator determinist de date sintetice (Consumption / WeatherData) ##########
+
+# Repo-ul contine doar tabelele mici; Consumption.csv si WeatherData.csv sunt generate aici
+# pe baza caselor, aparatelor si statiilor reale (aceleasi ID-uri si scheme de coloane).
+# Fiecare casa / statie are propriul generator aleator (seed, ID), deci rezultatul nu depinde
+# de ordinea sau de numarul caselor alese.
+# Consumption: putere medie (W) pe 10 minute, per aparat, dupa un profil ales din numele aparatului.
+# WeatherData: variabilele din Record.csv; radiatia (4) urmeaza pozitia soarelui si o nebulozitate zilnica.
+# Cu anomalies = True apar si cazurile tratate la curatare: spike-uri, zile fara consum, radiatie negativa.
+
+SMALL_TABLES = ['House', 'Appliance', 'ApplianceType', 'WeatherStation', 'WeatherVariable', 'Record']
+STEP = 600  # 10 minute
+DAY = 86400
+YEAR = 365 * DAY
+ID_OFFSET = 100000  # Pentru casele clonate peste cele existente: ID + k * ID_OFFSET
+OUTPUT_DIR = "Benchmarks/work/data"  # Director de lucru (ignorat de git); Database/ nu e niciodata suprascris
+
+PROFILES = [  # (cuvinte cheie in numele aparatului, profil); primul care se potriveste
+    (('fridge', 'freezer', 'aquarium'), 'cold'),
+    (('washing', 'dish', 'drier'), 'cycle'),
+    (('water heater',), 'night'),
+    (('lamp', 'light'), 'light'),
+    (('tv', 'computer'), 'evening'),
+    (('oven', 'cooker', 'plate', 'frier'), 'meal'),
+    (('heating', 'boiler'), 'seasonal'),
+    (('site',), 'base'),
+]
+
+def appliance_profile(name):
+    name = str(name).lower()
+    for keywords, profile in PROFILES:
+        if any(k in name for k in keywords):
+            return profile
+    return 'base'
+
+def house_rng(seed, key):
+    return np.random.default_rng([seed, int(key)])
+
+def local_hour(epochs):  # Ora din zi (0-24, fractionara)
+    return (epochs % DAY) / 3600.0
+
+def daily_draw(rng, epochs, low, high):  # O valoare aleatoare pe zi, repetata pe pasii zilei
+    days = (epochs - epochs[0]) // DAY
+    return rng.uniform(low, high, int(days[-1]) + 1)[days]
+
+def appliance_values(profile, epochs, rng):  # Puterea medie pe 10 minute (W) pentru un aparat
+    n = len(epochs)
+    hour = local_hour(epochs)
+    day_of_year = (epochs // DAY) % 365
+
+    if profile == 'cold':  # Compresor: cicluri on/off tot timpul
+        power = rng.uniform(70, 150)
+        on = rng.random(n) < rng.uniform(0.3, 0.5)
+        values = np.where(on, power * rng.uniform(0.8, 1.2, n), rng.uniform(0, 5, n))
+    elif profile == 'cycle':  # Masina de spalat / uscator: cicluri de 1-2 ore, de cateva ori pe saptamana
+        values = rng.uniform(0, 3, n)
+        days = int((epochs[-1] - epochs[0]) // DAY) + 1
+        power = rng.uniform(500, 2000)
+        for day in np.flatnonzero(rng.random(days) < rng.uniform(0.2, 0.6)):
+            start = day * (DAY // STEP) + int(rng.uniform(8, 21) * 6)
+            length = int(rng.integers(6, 13))
+            values[start:start + length] = power * rng.uniform(0.3, 1.0, len(values[start:start + length]))
+    elif profile == 'night':  # Boiler: incalzire noaptea
+        on = ((hour >= 22) | (hour < 6)) & (rng.random(n) < 0.5)
+        values = np.where(on, rng.uniform(1500, 3000), 0.0)
+    elif profile == 'light':
+        on = ((hour >= 18) & (hour < 23.5)) | ((hour >= 6) & (hour < 8))
+        values = np.where(on, rng.uniform(40, 300) * rng.uniform(0.5, 1.0, n), 0.0)
+    elif profile == 'evening':
+        on = ((hour >= 19) & (hour < 23.5) & (rng.random(n) < 0.8)) | (rng.random(n) < 0.05)
+        values = np.where(on, rng.uniform(60, 200), rng.uniform(0, 5, n))
+    elif profile == 'meal':
+        meal = ((hour >= 11.5) & (hour < 13)) | ((hour >= 18.5) & (hour < 20))
+        values = np.where(meal & (rng.random(n) < 0.4), rng.uniform(800, 2500) * rng.uniform(0.5, 1.0, n), 0.0)
+    elif profile == 'seasonal':  # Incalzire: mai mult iarna
+        winter = 0.5 * (1 + np.cos(2 * np.pi * (day_of_year - 15) / 365))
+        values = rng.uniform(500, 2000) * winter * (rng.random(n) < 0.6 * winter)
+    else:  # Consum de baza al casei
+        base = rng.uniform(150, 400)
+        evening = np.where((hour >= 18) & (hour < 23), rng.uniform(100, 400), 0.0)
+        values = (base + evening) * rng.uniform(0.7, 1.3, n)
+
+    return values
+
+def house_consumption(house, appliances, years, seed, anomalies = True):  # Consumul unei case, toate aparatele
+    rng = house_rng(seed, house['ID'])
+    start = int(house['StartingEpochTime']) // STEP * STEP
+    epochs = np.arange(start, start + int(years * YEAR), STEP, dtype = np.int64)
+
+    zero_start = None
+    if anomalies and rng.random() < 0.1:  # Aproximativ una din zece case are o luna fara consum
+        zero_start = epochs[0] + int(rng.integers(30, max(31, int(years * 365) - 40))) * DAY
+
+    pieces = []
+    for _, appliance in appliances.iterrows():
+        values = appliance_values(appliance_profile(appliance['Name']), epochs, rng)
+
+        if anomalies:
+            spikes = rng.random(len(values)) < 0.0005
+            values[spikes] *= rng.uniform(8, 20, int(spikes.sum()))
+        if zero_start is not None:
+            values[(epochs >= zero_start) & (epochs < zero_start + 35 * DAY)] = 0
+
+        pieces.append(pd.DataFrame({
+            'HouseIDREF': np.int32(house['ID']),
+            'ApplianceIDREF': np.int32(appliance['ID']),
+            'EpochTime': epochs.astype(np.int32),
+            'Value': np.round(values),
+        }))
+
+    if not pieces:
+        return pd.DataFrame(columns = ['HouseIDREF', 'ApplianceIDREF', 'EpochTime', 'Value'])
+    return pd.concat(pieces, ignore_index = True)
+
+def solar_radiation(epochs, longitude, latitude, rng):  # Radiatia globala (W/m2) pe pasi de 10 minute
+    day_of_year = (epochs // DAY) % 365
+    declination = np.radians(23.44) * np.sin(2 * np.pi * (284 + day_of_year) / 365)
+    solar_hour = local_hour(epochs) + longitude / 15.0
+    hour_angle = np.radians(15.0 * (solar_hour - 12))
+    lat = np.radians(latitude)
+
+    elevation = np.sin(lat) * np.sin(declination) + np.cos(lat) * np.cos(declination) * np.cos(hour_angle)
+    clear_sky = 1000.0 * np.clip(elevation, 0, None) ** 1.2
+    clouds = daily_draw(rng, epochs, 0.2, 1.0) * rng.uniform(0.85, 1.0, len(epochs))
+    return clear_sky * clouds
+
+def station_weather(station, variables, start, end, seed, anomalies = True):  # Toate variabilele unei statii
+    rng = house_rng(seed, station['ID'])
+    epochs = np.arange(start // STEP * STEP, end, STEP, dtype = np.int64)
+    n = len(epochs)
+    day_of_year = (epochs // DAY) % 365
+    hour = local_hour(epochs)
+
+    pieces = []
+    for variable in variables:
+        if variable == 0:  # Temperatura
+            values = 12 - 9 * np.cos(2 * np.pi * (day_of_year - 15) / 365) - 4 * np.cos(2 * np.pi * (hour - 3) / 24)
+            values = values + daily_draw(rng, epochs, -3, 3) + rng.normal(0, 0.5, n)
+        elif variable == 1:  # Viteza vantului
+            values = np.abs(daily_draw(rng, epochs, 1, 8) + rng.normal(0, 1.5, n))
+        elif variable == 2:  # Directia vantului
+            values = (daily_draw(rng, epochs, 0, 360) + rng.normal(0, 20, n)) % 360
+        elif variable == 3:  # Umiditate
+            values = np.clip(70 + 15 * np.cos(2 * np.pi * (hour - 4) / 24) + daily_draw(rng, epochs, -15, 15), 10, 100)
+        elif variable == 4:  # Radiatie
+            values = solar_radiation(epochs, float(station['Longitude']), float(station['Latitude']), rng)
+            if anomalies:  # Senzorul raporteaza uneori valori mici negative noaptea
+                night = values == 0
+                values[night] = np.where(rng.random(int(night.sum())) < 0.05, -rng.uniform(0, 3, int(night.sum())), 0.0)
+        else:
+            values = rng.normal(0, 1, n)
+
+        pieces.append(pd.DataFrame({
+            'WeatherStationIDREF': np.int32(station['ID']),
+            'WeatherVariableIDREF': np.int8(variable),
+            'EpochTime': epochs.astype(np.int32),
+            'Value': np.round(values, 1),
+        }))
+
+    return pd.concat(pieces, ignore_index = True)
+
+def scaled_tables(source_dir, houses):  # House / Appliance cu `houses` case; peste cele reale se cloneaza cu ID-uri noi
+    df_house = pd.read_csv(os.path.join(source_dir, 'House.csv'))
+    df_appliance = pd.read_csv(os.path.join(source_dir, 'Appliance.csv'))
+
+    if houses is None or houses <= len(df_house):
+        df_house = df_house.head(houses) if houses is not None else df_house
+        return df_house, df_appliance[df_appliance['HouseIDREF'].isin(df_house['ID'])]
+
+    # ID-urile aparatelor sunt numerotate in cadrul fiecarei case, deci raman aceleasi
+    house_parts = []
+    appliance_parts = []
+
+    for copy in range(-(-houses // len(df_house))):
+        house_parts.append(df_house.assign(ID = df_house['ID'] + copy * ID_OFFSET))
+        appliance_parts.append(df_appliance.assign(HouseIDREF = df_appliance['HouseIDREF'] + copy * ID_OFFSET))
+
+    df_house = pd.concat(house_parts, ignore_index = True).head(houses)
+    df_appliance = pd.concat(appliance_parts, ignore_index = True)
+    return df_house, df_appliance[df_appliance['HouseIDREF'].isin(df_house['ID'])]
+
+def generate(output_dir = OUTPUT_DIR, houses = None, appliances_per_house = None, years = 1.0, seed = 0,
+             anomalies = True, source_dir = storage.DATABASE_DIR):  # Scrie Consumption.csv si WeatherData.csv (si tabelele mici) in output_dir
+    if os.path.abspath(output_dir) == os.path.abspath(source_dir):
+        raise ValueError("Datele sintetice nu pot fi scrise peste tabelele sursa din " + source_dir + ".")
+
+    os.makedirs(output_dir, exist_ok = True)
+    df_house, df_appliance = scaled_tables(source_dir, houses)
+
+    if appliances_per_house is not None:
+        df_appliance = df_appliance.groupby('HouseIDREF', sort = False).head(appliances_per_house)
+
+    # Intervalul din House.csv descrie datele generate
+    df_house = df_house.assign(EndingEpochTime = df_house['StartingEpochTime'] + int(years * YEAR))
+
+    # Tabelele mici: copiate, iar House / Appliance restranse (sau extinse) la casele generate
+    for table in SMALL_TABLES:
+        shutil.copyfile(os.path.join(source_dir, table + ".csv"), os.path.join(output_dir, table + ".csv"))
+    df_house.to_csv(os.path.join(output_dir, 'House.csv'), index = False)
+    df_appliance.to_csv(os.path.join(output_dir, 'Appliance.csv'), index = False)
+
+    # Consumul, casa cu casa, direct in fisier
+    consumption_path = os.path.join(output_dir, 'Consumption.csv')
+    consumption_rows = 0
+    appliances_by_house = dict(tuple(df_appliance.groupby('HouseIDREF')))
+
+    for i, (_, house) in enumerate(df_house.iterrows()):
+        df = house_consumption(house, appliances_by_house.get(house['ID'], df_appliance.iloc[:0]), years, seed, anomalies)
+        df.to_csv(consumption_path, mode = "w" if i == 0 else "a", header = i == 0, index = False)
+        consumption_rows += len(df)
+
+    # Datele meteo pentru statiile folosite, pe intervalul acoperit de case
+    df_station = pd.read_csv(os.path.join(source_dir, 'WeatherStation.csv'))
+    df_record = pd.read_csv(os.path.join(source_dir, 'Record.csv'))
+    start = int(df_house['StartingEpochTime'].min())
+    end = start + int(years * YEAR) + int((df_house['StartingEpochTime'].max() - start))
+
+    weather_path = os.path.join(output_dir, 'WeatherData.csv')
+    weather_rows = 0
+    stations = df_station[df_station['ID'].isin(df_house['WeatherStationIDREF'])]
+
+    for i, (_, station) in enumerate(stations.iterrows()):
+        variables = sorted(df_record.loc[df_record['WeatherStationIDREF'] == station['ID'], 'WeatherVariableIDREF'])
+        df = station_weather(station, variables, start, end, seed, anomalies)
+        df.to_csv(weather_path, mode = "w" if i == 0 else "a", header = i == 0, index = False)
+        weather_rows += len(df)
+
+    print("Date sintetice in " + output_dir + ": " + str(len(df_house)) + " case, " + str(consumption_rows) +
+          " randuri de consum, " + str(weather_rows) + " randuri meteo.")
+    return {'houses': len(df_house), 'appliances': len(df_appliance), 'consumption_rows': consumption_rows,
+            'weather_rows': weather_rows}
+
+if __name__ == "__main__":
+    generate()